@@ -0,0 +1,579 @@
+"""Precompute belief-engine stats (posteriors, deltas, pivotal frames) for every play.
+
+Usage: python scripts/belief_precompute.py [--workers N] [--seed S] [--game-id G --play-id P]
+       python scripts/belief_precompute.py --parity 7 < play.json
+
+A vectorized NumPy port of src/services/stats/beliefEngine.ts running
+src/services/forward-sim/mock.ts: for every start frame of a play it jitters
+the tracked state NUM_SIMS times, rolls the mock simulator HORIZON frames
+forward, classifies the last frame into an outcome bucket and derives the
+per-frame posterior, the KL belief deltas and the top pivotal frames.
+Instead of 20 sequential simulator calls per frame, all sims and all start
+frames of a play advance together as (sims, frames, entities) arrays, so a
+play costs HORIZON array steps.
+
+Plays are read as the canonical payload (play_payloads.build_payload, the
+same JSON the server hands to computePlayStats), spread over a process pool
+in groups of UNIT_PLAYS (see play_pool.py), and written by the parent to:
+
+  belief_posteriors  (game_id, play_id, frame_id, p_goal, p_turnover, expected_xg,
+                      turnover, retention, progression, opportunity, goal)
+  belief_deltas      (game_id, play_id, frame_id, delta_p_goal, kl_divergence, is_pivotal)
+  belief_pivotal     (game_id, play_id, rank, frame_id)
+
+which GET /api/stats/:gameId/:playId serves as PlayStats. Each play gets
+its own generator seeded from (--seed, game_id, play_id), so results do
+not depend on the worker count. As in frame_features.py, the tables are
+written on a staging copy that is published over the DB when done.
+
+--parity SEED reads a canonical play JSON on stdin and prints its PlayStats
+JSON with every uniform taken from keyed streams (KeyedDraws): draw n of
+stream k is a hash of (SEED, k, n), so the vectorized code can look up the
+value the engine's sequential calls would get. computePlayStats fed the
+same streams produces the same numbers (see
+src/services/__tests__/belief-parity.test.ts).
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+import play_pool
+import publish
+from play_payloads import build_payload, frame_rows
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+UNIT_PLAYS = 20
+BLOCK_FRAMES = 256  # start frames simulated together; bounds the (sims, frames, entities) arrays
+
+# beliefEngine.ts
+NUM_SIMS = 20
+HORIZON = 30
+KL_PIVOT_THRESHOLD = 0.05
+TOP_PIVOTAL = 5
+POS_NOISE = 0.3
+BUCKETS = ("turnover", "retention", "progression", "opportunity", "goal")
+TURNOVER, RETENTION, PROGRESSION, OPPORTUNITY, GOAL = range(5)
+BUCKET_XG = np.array([0.0, 0.01, 0.05, 0.15, 1.0])
+
+# constants.ts / mock.ts
+FIELD_LENGTH = 105.0
+FIELD_WIDTH = 68.0
+GOAL_HALF_WIDTH = 7.32 / 2
+FIELD_HALF_WIDTH = FIELD_WIDTH / 2
+FRICTION = 0.95
+DT = 0.1
+DRIFT_STRENGTH = 0.5
+NOISE_VELOCITY = 0.8
+NOISE_FRICTION = 0.03
+BALL_OFFSET = 0.5
+POSSESSION_RADIUS = 2.0
+BALL_STEP = 15.0 * DT
+
+# distribution[bucket] += 1 / NUM_SIMS, accumulated the way the engine does it
+SHARE = np.zeros(NUM_SIMS + 1)
+for _k in range(1, NUM_SIMS + 1):
+    SHARE[_k] = SHARE[_k - 1] + 1 / NUM_SIMS
+
+_conn = None
+
+
+# --- JS arithmetic ---------------------------------------------------------
+
+def js_round(v):
+    """Math.round: nearest integer, halves towards +inf."""
+    r = np.floor(v)
+    return r + (v - r >= 0.5)
+
+
+def round2(v):
+    return js_round(v * 100) / 100
+
+
+def js_hypot(a, b):
+    """Math.hypot(a, b) as V8 computes it: normalized by the larger magnitude."""
+    a, b = np.abs(a), np.abs(b)
+    top = np.maximum(a, b)
+    scale = np.where(top == 0, 1.0, top)
+    na, nb = a / scale, b / scale
+    return np.sqrt(na * na + nb * nb) * top
+
+
+def hash_id(pid: str) -> float:
+    """mock.ts hashId: 32-bit string hash mapped to [0, 1)."""
+    h = 0
+    for ch in pid:
+        h = ((h << 5) - h + ord(ch)) & 0xFFFFFFFF
+    if h >= 1 << 31:
+        h -= 1 << 32
+    return (abs(h) % 10000) / 10000
+
+
+def js_key_order(keys) -> list:
+    """Object.keys order: array-index keys ascending, then the rest as inserted."""
+    index_keys = [k for k in keys if k.isdigit() and str(int(k)) == k and int(k) < 2 ** 32 - 1]
+    rest = [k for k in keys if k not in set(index_keys)]
+    return sorted(index_keys, key=int) + rest
+
+
+def gaussian(u1, u2, eps_or: bool):
+    """Box-Muller; jitter() guards log with u1 + 1e-10, randn() with u1 || 1e-10."""
+    u1 = np.where(u1 == 0, 1e-10, u1) if eps_or else u1 + 1e-10
+    return np.sqrt(-2 * np.log(u1)) * np.cos(2 * np.pi * u2)
+
+
+# --- random draws ---------------------------------------------------------
+
+class Draws:
+    """Uniform draws for simulate_block, a fresh array from `random` per use."""
+
+    def __init__(self, random):
+        self.random = random
+
+    def jitter(self, arr: dict, lo: int, shape: tuple):
+        """buildSimInput: (u1, u2) for x, y, vx, vy of every (sim, frame, entity)."""
+        return self.random(shape + (4, 2))
+
+    def drift(self, arr: dict, lo: int, shape: tuple):
+        """MockForwardSimulator drift parameters: phase, freq, friction."""
+        return self.random(shape + (3,))
+
+    def noise(self, drifting: np.ndarray):
+        """One step's velocity noise: (u1, u2) for vx and vy."""
+        return self.random(drifting.shape + (2, 2))
+
+
+def mix32(x):
+    """lowbias32 integer hash (the parity test has the same in TypeScript)."""
+    x = np.asarray(x, dtype=np.uint64) & 0xFFFFFFFF
+    x ^= x >> 16
+    x = (x * 0x7FEB352D) & 0xFFFFFFFF
+    x ^= x >> 15
+    x = (x * 0x846CA68B) & 0xFFFFFFFF
+    x ^= x >> 16
+    return x
+
+
+def keyed_uniform(seed: int, key, n):
+    """Draw n of stream key: mix32(mix32(mix32(seed) ^ key) ^ n) / 2**32."""
+    return mix32(mix32(mix32(seed) ^ np.asarray(key, dtype=np.uint64)) ^ np.asarray(n, dtype=np.uint64)) / 2.0 ** 32
+
+
+class KeyedDraws:
+    """The engine's own draw order, read from keyed streams, for --parity.
+
+    computePlayStats draws every jitter from stream 0 in order frame, sim,
+    present entity (JS key order), x/y/vx/vy, u1/u2. Predict call k (frame
+    * NUM_SIMS + sim) reads stream k + 1: three drift draws per present
+    non-ball entity, then per step four per entity that drifts. Slots the
+    engine never draws (absent or resting entities) are filled but unused.
+    """
+
+    def __init__(self, seed: int):
+        self.seed = seed
+
+    def jitter(self, arr: dict, lo: int, shape: tuple):
+        present = arr["present"]
+        counts = present.sum(axis=1)
+        base = 8 * NUM_SIMS * np.concatenate([[0], np.cumsum(counts)[:-1]])
+        hi = lo + shape[1]
+        rank = np.cumsum(present[lo:hi], axis=1) - 1
+        sims = np.arange(NUM_SIMS)[:, None, None]
+        first = base[lo:hi, None] + sims * 8 * counts[lo:hi, None] + 8 * rank
+        return keyed_uniform(self.seed, 0, first[..., None, None] + np.arange(8).reshape(4, 2))
+
+    def drift(self, arr: dict, lo: int, shape: tuple):
+        movers = arr["present"][lo:lo + shape[1]].copy()
+        if arr["ball"] is not None:
+            movers[:, arr["ball"]] = False
+        calls = (lo + np.arange(shape[1]))[None, :] * NUM_SIMS + np.arange(NUM_SIMS)[:, None]
+        self.key = calls + 1
+        self.used = np.broadcast_to(3 * movers.sum(axis=1), calls.shape).copy()
+        rank = np.cumsum(movers, axis=1) - 1
+        return keyed_uniform(self.seed, self.key[..., None, None], 3 * rank[..., None] + np.arange(3))
+
+    def noise(self, drifting: np.ndarray):
+        rank = np.cumsum(drifting, axis=-1) - 1
+        n = (self.used[..., None] + 4 * rank)[..., None, None] + np.arange(4).reshape(2, 2)
+        self.used += 4 * drifting.sum(axis=-1)
+        return keyed_uniform(self.seed, self.key[..., None, None, None], n)
+
+
+# --- engine ---------------------------------------------------------------
+
+def play_arrays(play: dict) -> dict:
+    """Dense (frames, entities) arrays of a canonical play, entities in JS key order."""
+    ids = js_key_order(list(play["players"]))
+    frames = play["frames"]
+    n_frames, n_ent = len(frames), len(ids)
+    present = np.zeros((n_frames, n_ent), dtype=bool)
+    pos = np.zeros((n_frames, n_ent, 2))
+    vel = np.zeros((n_frames, n_ent, 2))
+    for fi, frame in enumerate(frames):
+        positions, velocities = frame["positions"], frame["velocities"]
+        prev = frames[fi - 1]["positions"] if fi > 0 else None
+        for e, pid in enumerate(ids):
+            p = positions.get(pid)
+            if p is None:
+                continue
+            present[fi, e] = True
+            pos[fi, e] = p
+            v = velocities.get(pid)
+            if v is not None:
+                vel[fi, e] = v
+            elif prev is not None and pid in prev:
+                q = prev[pid]
+                vel[fi, e] = ((p[0] - q[0]) / DT, (p[1] - q[1]) / DT)
+    teams = [play["players"][pid].get("team") for pid in ids]
+    return {
+        "ids": ids,
+        "frame_ids": [f["id"] for f in frames],
+        "present": present,
+        "pos": pos,
+        "vel": vel,
+        "home": np.array([t == "home" for t in teams]),
+        "team": teams,
+        "ball": ids.index("ball") if "ball" in ids else None,
+        "hash": np.array([hash_id(pid) for pid in ids]),
+    }
+
+
+def find_closest(bx, by, x, y, candidate, home):
+    """findClosestPlayer for every (sim, frame): entity index, or -1."""
+    dx = x - bx[..., None]
+    dy = y - by[..., None]
+    dist = np.sqrt(dx * dx + dy * dy)
+    eff = np.where(home, dist, dist * 1.5)
+    ok = candidate & (dist < POSSESSION_RADIUS * 3)
+    idx = np.where(ok, eff, np.inf).argmin(axis=-1)
+    return np.where(ok.any(axis=-1), idx, -1)
+
+
+def simulate_block(arr: dict, lo: int, hi: int, draws, attacking: str) -> tuple:
+    """Outcome bucket and xG of every (sim, start frame) in [lo, hi)."""
+    shape = (NUM_SIMS, hi - lo, len(arr["ids"]))
+    present = np.broadcast_to(arr["present"][lo:hi], shape)
+    pos, vel = arr["pos"][lo:hi], arr["vel"][lo:hi]
+    b = arr["ball"]
+
+    # buildSimInput: jitter position and velocity of every tracked entity
+    u = draws.jitter(arr, lo, shape)
+    z = gaussian(u[..., 0], u[..., 1], eps_or=False)
+    x = pos[..., 0] + z[..., 0] * POS_NOISE
+    y = pos[..., 1] + z[..., 1] * POS_NOISE
+    vx = vel[..., 0] + z[..., 2] * (POS_NOISE * 0.5)
+    vy = vel[..., 1] + z[..., 3] * (POS_NOISE * 0.5)
+
+    mover = present.copy()
+    candidate = present & np.array([t != "ball" for t in arr["team"]])
+    if b is not None:
+        mover[..., b] = False
+        candidate[..., b] = False
+        has_ball = present[..., b]
+        bx, by, bvx, bvy = x[..., b].copy(), y[..., b].copy(), vx[..., b].copy(), vy[..., b].copy()
+        possessor = np.where(has_ball, find_closest(bx, by, x, y, candidate, arr["home"]), -1)
+
+    # Per-player drift parameters
+    u = draws.drift(arr, lo, shape)
+    h = arr["hash"]
+    phase = h * np.pi * 2 + u[..., 0] * np.pi
+    freq = 1.5 + h * 2.0 + (u[..., 1] - 0.5) * 1.0
+    friction = FRICTION + (u[..., 2] - 0.5) * 2 * NOISE_FRICTION
+
+    for i in range(1, HORIZON + 1):
+        speed = np.sqrt(vx * vx + vy * vy)
+        at_boundary = (x <= 0.5) | (x >= FIELD_LENGTH - 0.5) | (y <= 0.5) | (y >= FIELD_WIDTH - 0.5)
+        drifting = mover & (speed > 0.5) & ~at_boundary
+        lateral = np.sin(freq * (i * DT) + phase) * DRIFT_STRENGTH
+        safe = np.where(drifting, speed, 1.0)
+        nx, ny = -vy / safe, vx / safe
+        u = draws.noise(drifting)
+        noise = gaussian(u[..., 0], u[..., 1], eps_or=True)
+        vx = np.where(drifting, vx + nx * lateral * DT + noise[..., 0] * NOISE_VELOCITY * DT, vx)
+        vy = np.where(drifting, vy + ny * lateral * DT + noise[..., 1] * NOISE_VELOCITY * DT, vy)
+        stopped = mover & at_boundary
+        vx = np.where(stopped, 0.0, vx)
+        vy = np.where(stopped, 0.0, vy)
+        x = np.where(mover, np.clip(x + vx * DT, 0, FIELD_LENGTH), x)
+        y = np.where(mover, np.clip(y + vy * DT, 0, FIELD_WIDTH), y)
+        vx = np.where(mover, vx * friction, vx)
+        vy = np.where(mover, vy * friction, vy)
+
+        if b is None:
+            continue
+        held = has_ball & (possessor >= 0)
+        p = np.maximum(possessor, 0)[..., None]
+        px, py = np.take_along_axis(x, p, -1)[..., 0], np.take_along_axis(y, p, -1)[..., 0]
+        pvx, pvy = np.take_along_axis(vx, p, -1)[..., 0], np.take_along_axis(vy, p, -1)[..., 0]
+        p_speed = np.sqrt(pvx * pvx + pvy * pvy)
+        moving = p_speed > 0.5
+        p_safe = np.where(moving, p_speed, 1.0)
+        tx = px + np.where(moving, pvx / p_safe * BALL_OFFSET, 0.0)
+        ty = py + np.where(moving, pvy / p_safe * BALL_OFFSET, BALL_OFFSET)
+        dx, dy = tx - bx, ty - by
+        dist = np.sqrt(dx * dx + dy * dy)
+        far = dist > 0.1
+        d_safe = np.where(far, dist, 1.0)
+        step = np.minimum(BALL_STEP, dist)
+        sx, sy = dx / d_safe * step, dy / d_safe * step
+        chase_x, chase_y = np.where(far, bx + sx, tx), np.where(far, by + sy, ty)
+        chase_vx, chase_vy = np.where(far, sx / DT, pvx), np.where(far, sy / DT, pvy)
+
+        loose = has_ball & ~held
+        roll_x = np.clip(bx + bvx * DT, 0, FIELD_LENGTH)
+        roll_y = np.clip(by + bvy * DT, 0, FIELD_WIDTH)
+        bx = np.clip(np.where(held, chase_x, np.where(loose, roll_x, bx)), 0, FIELD_LENGTH)
+        by = np.clip(np.where(held, chase_y, np.where(loose, roll_y, by)), 0, FIELD_WIDTH)
+        bvx = np.where(held, chase_vx, np.where(loose, bvx * 0.9, bvx))
+        bvy = np.where(held, chase_vy, np.where(loose, bvy * 0.9, bvy))
+        if loose.any():
+            picked = find_closest(bx, by, x, y, candidate, arr["home"])
+            possessor = np.where(loose, picked, possessor)
+
+    # classifyOutcome on the rounded last frame
+    bucket = np.full(shape[:2], RETENTION)
+    xg = np.zeros(shape[:2])
+    if b is None:
+        return bucket, xg
+    home_attacking = attacking == "home"
+    start_x = np.where(arr["present"][lo:hi, b], pos[:, b, 0], 52.5)
+    fx, fy, ball_x, ball_y = round2(x), round2(y), round2(bx), round2(by)
+    target_x = FIELD_LENGTH if home_attacking else 0.0
+    dy = np.abs(ball_y - FIELD_HALF_WIDTH)
+    goal = (ball_x >= 105 if home_attacking else ball_x <= 0) & (dy < GOAL_HALF_WIDTH)
+
+    scored = mover & np.array([bool(t) for t in arr["team"]])
+    d = np.where(scored, js_hypot(fx - ball_x[..., None], fy - ball_y[..., None]), np.inf)
+    nearest = d.argmin(axis=-1)
+    nearest_dist = np.take_along_axis(d, nearest[..., None], -1)[..., 0]
+    opponent = np.array([bool(t) and t != attacking for t in arr["team"]])
+    turnover = opponent[nearest] & (nearest_dist < 2.0)
+    opportunity = js_hypot(target_x - ball_x, dy) < 20
+    forward = ball_x - start_x if home_attacking else start_x - ball_x
+    progression = forward > 10
+
+    bucket = np.select([goal, turnover, opportunity, progression], [GOAL, TURNOVER, OPPORTUNITY, PROGRESSION],
+                       RETENTION)
+    bucket = np.where(has_ball, bucket, RETENTION)
+    xg = np.where(has_ball, BUCKET_XG[bucket], 0.0)
+    return bucket, xg
+
+
+def play_stats(play: dict, draws) -> dict:
+    """computePlayStats (without pause-frame trajectories) for one canonical play."""
+    arr = play_arrays(play)
+    attacking = "away" if (play.get("meta") or {}).get("offense") == "away" else "home"
+    n_frames = len(arr["frame_ids"])
+    counts = np.zeros((n_frames, len(BUCKETS)), dtype=np.int64)
+    total_xg = np.zeros(n_frames)
+    for lo in range(0, n_frames, BLOCK_FRAMES):
+        hi = min(lo + BLOCK_FRAMES, n_frames)
+        bucket, xg = simulate_block(arr, lo, hi, draws, attacking)
+        for k in range(len(BUCKETS)):
+            counts[lo:hi, k] = (bucket == k).sum(axis=0)
+        for s in range(NUM_SIMS):  # sequential, as totalXG += outcome.xG
+            total_xg[lo:hi] += xg[s]
+
+    dist = SHARE[counts]
+    p_goal = dist[:, GOAL] + dist[:, OPPORTUNITY] * 0.3
+    expected_xg = js_round(total_xg / NUM_SIMS * 100) / 100
+
+    p = np.maximum(dist[1:], 1e-6)
+    q = np.maximum(dist[:-1], 1e-6)
+    kl = np.zeros(max(n_frames - 1, 0))
+    for k in range(len(BUCKETS)):
+        kl = kl + p[:, k] * np.log(p[:, k] / q[:, k])
+    kl = np.maximum(0, kl)
+    kl_rounded = js_round(kl * 10000) / 10000
+    order = np.argsort(-kl_rounded, kind="stable")[:TOP_PIVOTAL]
+
+    return {
+        "frame_ids": arr["frame_ids"],
+        "distribution": dist,
+        "p_goal": p_goal,
+        "p_turnover": dist[:, TURNOVER],
+        "expected_xg": expected_xg,
+        "delta_p_goal": p_goal[1:] - p_goal[:-1],
+        "kl_divergence": kl_rounded,
+        "is_pivotal": kl > KL_PIVOT_THRESHOLD,
+        "pivotal_frames": [arr["frame_ids"][i + 1] for i in order],
+    }
+
+
+def to_play_stats_json(stats: dict) -> dict:
+    """PlayStats as computePlayStats returns it (no attributions/player stats yet)."""
+    frame_ids = stats["frame_ids"]
+    return {
+        "posteriors": [{
+            "frameId": fid,
+            "pGoal": float(stats["p_goal"][i]),
+            "pTurnover": float(stats["p_turnover"][i]),
+            "expectedXG": float(stats["expected_xg"][i]),
+            "distribution": {k: float(stats["distribution"][i, j]) for j, k in enumerate(BUCKETS)},
+        } for i, fid in enumerate(frame_ids)],
+        "deltas": [{
+            "frameId": fid,
+            "deltaPGoal": float(stats["delta_p_goal"][i]),
+            "klDivergence": float(stats["kl_divergence"][i]),
+            "isPivotal": bool(stats["is_pivotal"][i]),
+        } for i, fid in enumerate(frame_ids[1:])],
+        "attributions": [],
+        "playerStats": [],
+        "pivotalFrames": stats["pivotal_frames"],
+    }
+
+
+# --- batch ----------------------------------------------------------------
+
+def create_belief_tables(conn: sqlite3.Connection, replace: bool = True):
+    """Create the belief tables; replace=False keeps existing ones (a single-play run)."""
+    if replace:
+        conn.executescript("""
+            DROP TABLE IF EXISTS belief_posteriors;
+            DROP TABLE IF EXISTS belief_deltas;
+            DROP TABLE IF EXISTS belief_pivotal;
+        """)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS belief_posteriors (
+            game_id INTEGER NOT NULL,
+            play_id INTEGER NOT NULL,
+            frame_id INTEGER NOT NULL,
+            p_goal REAL NOT NULL,
+            p_turnover REAL NOT NULL,
+            expected_xg REAL NOT NULL,
+            turnover REAL NOT NULL,
+            retention REAL NOT NULL,
+            progression REAL NOT NULL,
+            opportunity REAL NOT NULL,
+            goal REAL NOT NULL,
+            PRIMARY KEY (game_id, play_id, frame_id)
+        );
+        CREATE TABLE IF NOT EXISTS belief_deltas (
+            game_id INTEGER NOT NULL,
+            play_id INTEGER NOT NULL,
+            frame_id INTEGER NOT NULL,
+            delta_p_goal REAL NOT NULL,
+            kl_divergence REAL NOT NULL,
+            is_pivotal INTEGER NOT NULL,
+            PRIMARY KEY (game_id, play_id, frame_id)
+        );
+        CREATE TABLE IF NOT EXISTS belief_pivotal (
+            game_id INTEGER NOT NULL,
+            play_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            frame_id INTEGER NOT NULL,
+            PRIMARY KEY (game_id, play_id, rank)
+        );
+    """)
+
+
+def _init_worker(db_path: str):
+    global _conn
+    _conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def unit_stats(unit: tuple, seed: int) -> list:
+    """Worker: [(game_id, play_id, stats)] for one (game, play range)."""
+    out = []
+    plays = _conn.execute(
+        "SELECT play_id, description FROM plays WHERE game_id = ? AND play_id BETWEEN ? AND ? "
+        "AND frame_count > 0 ORDER BY play_id", unit
+    ).fetchall()
+    game_id = unit[0]
+    for play_id, description in plays:
+        play = build_payload(game_id, play_id, description, frame_rows(_conn, game_id, play_id))
+        if not play["frames"]:
+            continue
+        rng = np.random.default_rng([seed, game_id, play_id])
+        out.append((game_id, play_id, play_stats(play, Draws(rng.random))))
+    return out
+
+
+def write_stats(conn: sqlite3.Connection, game_id: int, play_id: int, stats: dict) -> int:
+    frame_ids = stats["frame_ids"]
+    dist = stats["distribution"].tolist()
+    conn.executemany(
+        "INSERT INTO belief_posteriors VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(game_id, play_id, fid, pg, pt, xg, *d) for fid, pg, pt, xg, d in zip(
+            frame_ids, stats["p_goal"].tolist(), stats["p_turnover"].tolist(),
+            stats["expected_xg"].tolist(), dist)],
+    )
+    conn.executemany(
+        "INSERT INTO belief_deltas VALUES (?, ?, ?, ?, ?, ?)",
+        zip([game_id] * (len(frame_ids) - 1), [play_id] * (len(frame_ids) - 1), frame_ids[1:],
+            stats["delta_p_goal"].tolist(), stats["kl_divergence"].tolist(),
+            stats["is_pivotal"].astype(int).tolist()),
+    )
+    conn.executemany(
+        "INSERT INTO belief_pivotal VALUES (?, ?, ?, ?)",
+        [(game_id, play_id, rank, fid) for rank, fid in enumerate(stats["pivotal_frames"], 1)],
+    )
+    return len(frame_ids)
+
+
+def build_beliefs(conn: sqlite3.Connection, db_path: str, workers: int, seed: int,
+                  game_id: int = None, play_id: int = None) -> tuple:
+    """Fill the belief tables; returns (plays, frames)."""
+    create_belief_tables(conn, replace=game_id is None)
+    if game_id is not None:
+        for table in ("belief_posteriors", "belief_deltas", "belief_pivotal"):
+            conn.execute(f"DELETE FROM {table} WHERE game_id = ? AND play_id = ?", (game_id, play_id))
+    units = play_pool.play_ranges(conn, UNIT_PLAYS, game_id, play_id)
+    plays = frames = 0
+    t0 = time.perf_counter()
+    results = play_pool.imap_units(units, unit_stats, workers, _init_worker, (db_path,), args=(seed,))
+    for done, unit in enumerate(results, 1):
+        for g, p, stats in unit:
+            frames += write_stats(conn, g, p, stats)
+            plays += 1
+        if done % 50 == 0 or done == len(units):
+            conn.commit()
+            print(f"  {done:,}/{len(units):,} units, {plays:,} plays, {frames:,} frames "
+                  f"({frames / (time.perf_counter() - t0):,.0f} frames/s)")
+    conn.commit()
+    return plays, frames
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--game-id", type=int)
+    parser.add_argument("--play-id", type=int)
+    parser.add_argument("--parity", type=int, metavar="SEED",
+                        help="read a play JSON on stdin, draw from the keyed streams of SEED, print PlayStats")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.parity is not None:
+        play = json.load(sys.stdin)
+        stats = play_stats(play, KeyedDraws(args.parity))
+        json.dump(to_play_stats_json(stats), sys.stdout)
+        return
+    if (args.game_id is None) != (args.play_id is None):
+        raise SystemExit("--game-id and --play-id go together")
+
+    staging = publish.start_build(DB_PATH)
+    conn = sqlite3.connect(staging)
+    conn.execute("PRAGMA journal_mode=WAL")  # the workers read it while the parent writes
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        print("Precomputing belief stats...")
+        t0 = time.perf_counter()
+        plays, frames = build_beliefs(conn, staging, args.workers, args.seed, args.game_id, args.play_id)
+        print(f"  {plays:,} plays, {frames:,} frames in {time.perf_counter() - t0:.1f}s")
+    finally:
+        conn.close()
+    publish.publish(staging, DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
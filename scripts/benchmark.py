@@ -0,0 +1,372 @@
+"""Benchmark ingest throughput, DB size and server query latency.
+
+Usage: python scripts/benchmark.py [--scales 1k,100k] [--sources bdb,metrica,mock]
+                                   [--save-baseline] [--tolerance 0.25]
+
+For every scale (approximate frame rows: 1k, 100k, 1m, 10m) and source it
+generates input data in a scratch directory, runs the real ingest script
+(ingest.py on BDB-shaped CSVs, ingest_metrica.py on Metrica-shaped CSVs,
+mock_soccer.py --games) in a child process, and records:
+
+  - ingest wall time and frame rows/s;
+  - final DB size (including WAL);
+  - peak RSS of the ingest process;
+  - p50/p95/p99 latency of the SQL that server/src/db.ts runs for
+    getGames, getPlaysForGame and getPlayData (plays row + frames query),
+    against random games/plays, on a read-only connection like the server.
+
+Results go to data/benchmark.json. If data/benchmark_baseline.json exists
+every metric is compared against it and the run exits 1 when any metric is
+worse by more than --tolerance (relative); --save-baseline stores this run
+as the new baseline instead.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_ROOT = os.path.join(SCRIPTS_DIR, "..", "data")
+RESULTS_PATH = os.path.join(DATA_ROOT, "benchmark.json")
+BASELINE_PATH = os.path.join(DATA_ROOT, "benchmark_baseline.json")
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+SOURCES = ["bdb", "metrica", "mock"]
+
+# Exact statements from server/src/db.ts
+SERVER_QUERIES = {
+    "getGames": "SELECT game_id, game_date, home_team, away_team, stadium FROM games ORDER BY game_date DESC",
+    "getPlaysForGame": "SELECT play_id, description, frame_count FROM plays WHERE game_id = ? ORDER BY play_id",
+    "getPlayData.play": "SELECT * FROM plays WHERE game_id = ? AND play_id = ?",
+    "getPlayData.frames": "SELECT * FROM frames WHERE game_id = ? AND play_id = ? ORDER BY frame_id, nfl_id",
+}
+
+# Metrics where a larger value is better; everything else regresses upwards
+HIGHER_IS_BETTER = {"rows_per_s"}
+# Sub-millisecond queries jitter by more than any sane tolerance; ignore smaller moves
+MIN_LATENCY_DELTA_MS = 0.5
+
+BDB_FRAMES_PER_PLAY = 50
+BDB_PLAYS_PER_GAME = 20
+MOCK_MAX_FRAMES = 300
+MOCK_PLAYS_PER_GAME = 20
+METRICA_PLAYERS = 14  # per team; home file also carries the ball
+
+CHILD = """
+import sys
+sys.path.insert(0, {scripts!r})
+import {module} as m
+{overrides}
+sys.argv = [{module!r}] + {argv!r}
+m.main()
+"""
+
+
+# --- Input data generators ---
+
+def write_bdb(data_dir: str, rows: int, seed: int = 0):
+    """games/players/plays.csv and tracking_week_N.csv with ~rows tracking rows."""
+    rng = np.random.default_rng(seed)
+    per_play = 23 * BDB_FRAMES_PER_PLAY
+    n_plays = max(1, -(-rows // per_play))
+    n_games = -(-n_plays // BDB_PLAYS_PER_GAME)
+    n_weeks = min(9, n_games)
+
+    game_ids = 2022090800 + np.arange(1, n_games + 1)
+    weeks = np.arange(n_games) % n_weeks + 1
+    pd.DataFrame({
+        "gameId": game_ids, "season": 2022, "week": weeks, "gameDate": "09/08/2022",
+        "gameTimeEastern": "20:20:00", "homeTeamAbbr": "LA", "visitorTeamAbbr": "BUF",
+        "homeFinalScore": 10, "visitorFinalScore": 31,
+    }).to_csv(os.path.join(data_dir, "games.csv"), index=False)
+
+    nfl_ids = 1000 + np.arange(22)
+    pd.DataFrame({
+        "nflId": nfl_ids, "height": "6-2", "weight": 200, "birthDate": "1990-01-01",
+        "collegeName": "X", "position": "WR", "displayName": [f"Player {i}" for i in nfl_ids],
+    }).to_csv(os.path.join(data_dir, "players.csv"), index=False)
+
+    play_game = np.repeat(game_ids, BDB_PLAYS_PER_GAME)[:n_plays]
+    play_ids = (np.arange(n_plays) % BDB_PLAYS_PER_GAME + 1) * 50
+    pd.DataFrame({
+        "gameId": play_game, "playId": play_ids, "playDescription": "synthetic play",
+        "quarter": 1, "down": 1, "yardsToGo": 10, "possessionTeam": "BUF", "defensiveTeam": "LA",
+        "yardlineSide": "LA", "yardlineNumber": 25, "yardsGained": 5,
+    }).to_csv(os.path.join(data_dir, "plays.csv"), index=False)
+
+    play_week = weeks[np.searchsorted(game_ids, play_game)]
+    for week in range(1, n_weeks + 1):
+        idx = np.flatnonzero(play_week == week)
+        # (play, frame, entity) grid flattened; entity 22 is the football
+        shape = (len(idx), BDB_FRAMES_PER_PLAY, 23)
+        p = np.broadcast_to(idx[:, None, None], shape).ravel()
+        f = np.broadcast_to(np.arange(1, BDB_FRAMES_PER_PLAY + 1)[None, :, None], shape).ravel()
+        k = np.broadcast_to(np.arange(23)[None, None, :], shape).ravel()
+        ball = k == 22
+        n = len(k)
+        pd.DataFrame({
+            "gameId": play_game[p], "playId": play_ids[p],
+            "nflId": np.where(ball, np.nan, 1000 + k),
+            "displayName": np.where(ball, "football", np.char.add("Player ", (1000 + k).astype(str))),
+            "frameId": f, "frameType": "SNAP", "time": "2022-09-08 20:24:05.2",
+            "jerseyNumber": np.where(ball, np.nan, k + 1),
+            "club": np.where(ball, "football", np.where(k < 11, "LA", "BUF")),
+            "playDirection": np.where(p % 2, "left", "right"),
+            "x": (20 + k * 3 + f * 0.3 + rng.normal(0, 0.1, n)).round(2),
+            "y": (5 + k * 2 + rng.normal(0, 0.1, n)).round(2),
+            "s": np.abs(rng.normal(3, 1, n)).round(2), "a": np.abs(rng.normal(1, 0.5, n)).round(2),
+            "dis": 0.3, "o": rng.uniform(0, 360, n).round(2), "dir": rng.uniform(0, 360, n).round(2),
+            "event": np.where(~ball & (k == 0) & (f == 5), "ball_snap", None),
+        }).to_csv(os.path.join(data_dir, f"tracking_week_{week}.csv"), index=False)
+
+
+def write_metrica_team(path: str, team: str, jerseys, ball: bool, n_frames: int, rng):
+    """One Metrica RawTrackingData CSV: 3 header rows, then x,y (0-1) per entity per frame."""
+    names = [f"Player{j}" for j in jerseys] + (["Ball"] if ball else [])
+    t = np.arange(n_frames) / 25.0
+    base = rng.uniform(0.1, 0.9, (len(names), 2))
+    phase = rng.uniform(0, 2 * np.pi, len(names))
+    xy = np.empty((n_frames, len(names) * 2))
+    xy[:, 0::2] = base[:, 0] + 0.05 * np.sin(t[:, None] / 5 + phase)
+    xy[:, 1::2] = base[:, 1] + 0.05 * np.cos(t[:, None] / 7 + phase)
+
+    period = np.where(np.arange(n_frames) < n_frames // 2, 1, 2)
+    with open(path, "w") as f:
+        f.write(",,," + ",,".join(team for _ in jerseys) + ("," if ball else "") + "\n")
+        f.write(",,," + ",,".join(str(j) for j in jerseys) + ("," if ball else "") + "\n")
+        f.write("Period,Frame,Time [s]," + ",".join(f"{n}," for n in names) + "\n")
+    body = pd.DataFrame(xy.round(5))
+    body.insert(0, "time", t.round(2))
+    body.insert(0, "frame", np.arange(1, n_frames + 1))
+    body.insert(0, "period", period)
+    body.to_csv(path, mode="a", header=False, index=False)
+
+
+def write_metrica(data_dir: str, rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    n_frames = max(100, -(-rows // (2 * METRICA_PLAYERS + 1)))
+    write_metrica_team(os.path.join(data_dir, "Sample_Game_2_RawTrackingData_Home_Team.csv"),
+                       "Home", range(1, METRICA_PLAYERS + 1), True, n_frames, rng)
+    write_metrica_team(os.path.join(data_dir, "Sample_Game_2_RawTrackingData_Away_Team.csv"),
+                       "Away", range(METRICA_PLAYERS + 1, 2 * METRICA_PLAYERS + 1), True, n_frames, rng)
+
+
+def mock_args(rows: int) -> list:
+    """mock_soccer.py --games arguments producing ~rows frame rows."""
+    frames = min(MOCK_MAX_FRAMES, max(10, -(-rows // 23)))
+    plays = max(1, -(-rows // (23 * frames)))
+    per_game = min(MOCK_PLAYS_PER_GAME, plays)
+    games = -(-plays // per_game)
+    return ["--games", str(games), "--plays-per-game", str(per_game), "--frames", str(frames)]
+
+
+# --- Measurements ---
+
+def run_ingest(module: str, overrides: dict, argv: list, verbose: bool) -> tuple:
+    """Run `module`.main() in a child process; returns (wall seconds, peak RSS bytes)."""
+    code = CHILD.format(
+        scripts=SCRIPTS_DIR, module=module, argv=argv,
+        overrides="\n".join(f"m.{k} = {v!r}" for k, v in overrides.items()),
+    )
+    out = None if verbose else subprocess.DEVNULL
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", code], stdout=out, cwd=SCRIPTS_DIR)
+    _, status, usage = os.wait4(proc.pid, 0)
+    secs = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"{module} exited with {proc.returncode}")
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return secs, peak
+
+
+def db_size(db_path: str) -> int:
+    return sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+
+
+def percentiles(samples: list) -> dict:
+    ms = np.asarray(samples) * 1000.0
+    return {f"p{q}_ms": round(float(np.percentile(ms, q)), 3) for q in (50, 95, 99)}
+
+
+def time_queries(db_path: str, iterations: int, seed: int = 0) -> dict:
+    """Latency of the server's statements on random games / plays."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.execute("PRAGMA cache_size = -500000")  # as in db.ts
+    try:
+        rng = random.Random(seed)
+        games = [r[0] for r in conn.execute("SELECT game_id FROM games")]
+        plays = conn.execute("SELECT game_id, play_id FROM plays").fetchall()
+        params = {
+            "getGames": lambda: (),
+            "getPlaysForGame": lambda: (rng.choice(games),),
+            "getPlayData.play": lambda: rng.choice(plays),
+            "getPlayData.frames": lambda: rng.choice(plays),
+        }
+        results = {}
+        for name, sql in SERVER_QUERIES.items():
+            stmt_params = [params[name]() for _ in range(iterations + 5)]
+            samples = []
+            for i, p in enumerate(stmt_params):
+                t0 = time.perf_counter()
+                conn.execute(sql, p).fetchall()
+                if i >= 5:  # warm-up
+                    samples.append(time.perf_counter() - t0)
+            results[name] = percentiles(samples)
+        return results
+    finally:
+        conn.close()
+
+
+def bench_source(source: str, rows: int, workdir: str, iterations: int, verbose: bool) -> dict:
+    data_dir = os.path.join(workdir, source)
+    os.makedirs(data_dir, exist_ok=True)
+    db_path = os.path.join(workdir, f"{source}.db")
+
+    if source == "bdb":
+        write_bdb(data_dir, rows)
+        secs, peak = run_ingest("ingest", {"DB_PATH": db_path, "DATA_DIR": data_dir}, ["--full"], verbose)
+    elif source == "metrica":
+        write_metrica(data_dir, rows)
+        secs, peak = run_ingest("ingest_metrica", {"DB_PATH": db_path, "METRICA_DIR": data_dir}, [], verbose)
+    else:
+        secs, peak = run_ingest("mock_soccer", {"DB_PATH": db_path}, mock_args(rows), verbose)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        n = conn.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+    finally:
+        conn.close()
+
+    return {
+        "rows": n,
+        "ingest_s": round(secs, 3),
+        "rows_per_s": round(n / secs, 1),
+        "db_bytes": db_size(db_path),
+        "peak_rss_bytes": peak,
+        "queries": time_queries(db_path, iterations),
+    }
+
+
+# --- Baseline comparison ---
+
+def flatten(tree: dict, prefix: str = "") -> dict:
+    out = {}
+    for key, value in tree.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(flatten(value, name + "."))
+        else:
+            out[name] = value
+    return out
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """[(metric, baseline, current, relative change)] for metrics worse than tolerance."""
+    current = flatten(results)
+    regressions = []
+    for name, old in flatten(baseline).items():
+        new = current.get(name)
+        metric = name.rsplit(".", 1)[-1]
+        if new is None or not old or metric == "rows":
+            continue
+        if metric.endswith("_ms") and abs(new - old) < MIN_LATENCY_DELTA_MS:
+            continue
+        change = (new - old) / old
+        worse = -change if metric in HIGHER_IS_BETTER else change
+        if worse > tolerance:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1k,100k", help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument("--sources", default=",".join(SOURCES))
+    parser.add_argument("--queries", type=int, default=200, help="timed executions per statement")
+    parser.add_argument("--out", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--workdir", help="keep generated inputs and DBs here instead of a temp dir")
+    parser.add_argument("--verbose", action="store_true", help="show ingest script output")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    scales = args.scales.split(",")
+    sources = args.sources.split(",")
+    for name in scales:
+        if name not in SCALES:
+            raise SystemExit(f"unknown scale {name!r}")
+    for name in sources:
+        if name not in SOURCES:
+            raise SystemExit(f"unknown source {name!r}")
+
+    results = {}
+    for scale in scales:
+        workdir = args.workdir and os.path.join(args.workdir, scale)
+        tmp = None if workdir else tempfile.mkdtemp(prefix=f"metapitch-bench-{scale}-")
+        workdir = workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        try:
+            results[scale] = {}
+            for source in sources:
+                print(f"Benchmarking {source} @ {scale}...")
+                r = bench_source(source, SCALES[scale], workdir, args.queries, args.verbose)
+                results[scale][source] = r
+                frames = r["queries"]["getPlayData.frames"]
+                print(f"  {r['rows']:,} rows in {r['ingest_s']:.1f}s ({r['rows_per_s']:,.0f} rows/s), "
+                      f"{r['db_bytes'] / 1e6:.1f} MB, peak RSS {r['peak_rss_bytes'] / 1e6:.0f} MB, "
+                      f"frames query p50/p95/p99 {frames['p50_ms']}/{frames['p95_ms']}/{frames['p99_ms']} ms")
+        finally:
+            if tmp:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.save_baseline:
+        shutil.copyfile(args.out, args.baseline)
+        print(f"Saved baseline {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("No baseline yet (run with --save-baseline to store one).")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+        return
+    print(f"{len(regressions)} regressions against {args.baseline}:")
+    for name, old, new, change in regressions:
+        print(f"  {name}: {old} -> {new} ({change:+.0%})")
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Events extracted from frames into their own small, indexed table.
+
+Usage: python scripts/event_index.py [--build]
+       python scripts/event_index.py --event pass_forward [--week 3] [--season 2022] [--game-id G]
+
+frames repeats a frame's event on every entity row of that frame, so
+finding events there is a scan of the whole table. events holds each one
+once, keyed by (game_id, play_id, frame_id, event): the key serves
+per-game and per-play lookups, idx_events_type serves lookups by event
+name, and games supplies week/season.
+
+ingest.py fills events for each week as the rows stream in (next to
+play_catalog); --build here rebuilds it from frames for DBs written by
+other scripts, on a staging copy that is published over the DB (see
+publish.py), and ingest_metrica.py rebuilds it once the table exists.
+Queries only read the DB.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import publish
+from play_payloads import frames_layout
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+EVENTS_DDL = """
+    CREATE TABLE IF NOT EXISTS events (
+        game_id INTEGER NOT NULL,
+        play_id INTEGER NOT NULL,
+        frame_id INTEGER NOT NULL,
+        event TEXT NOT NULL,
+        PRIMARY KEY (game_id, play_id, frame_id, event)
+    );
+    CREATE INDEX IF NOT EXISTS idx_events_type ON events(event, game_id);
+"""
+
+FRAME_EVENTS = {
+    "text": "SELECT DISTINCT game_id, play_id, frame_id, event FROM frames WHERE event IS NOT NULL",
+    "compact": """
+        SELECT DISTINCT f.game_id, f.play_id, f.frame_id, e.name FROM frames f
+        JOIN lookup_events e ON e.id = f.event_id
+    """,
+}
+
+
+def build_event_index(conn: sqlite3.Connection) -> int:
+    """(Re)build events from frames in one scan. Returns the number of events."""
+    print("Building event index...")
+    t0 = time.perf_counter()
+    conn.execute("DROP TABLE IF EXISTS events")
+    conn.executescript(EVENTS_DDL)
+    count = conn.execute(f"INSERT INTO events {FRAME_EVENTS[frames_layout(conn)]}").rowcount
+    conn.commit()
+    print(f"  {count:,} events in {time.perf_counter() - t0:.1f}s")
+    return count
+
+
+def has_events(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events'"
+    ).fetchone() is not None
+
+
+def find_events(conn: sqlite3.Connection, event: str = None, game_id: int = None,
+                play_id: int = None, week: int = None, season: int = None) -> list:
+    """(game_id, play_id, frame_id, event) rows matching every given filter.
+
+    week and season need the BDB games table; the soccer sources have neither.
+    """
+    conds = []
+    params = []
+    for column, value in (("v.event", event), ("v.game_id", game_id), ("v.play_id", play_id),
+                          ("g.week", week), ("g.season", season)):
+        if value is not None:
+            conds.append(f"{column} = ?")
+            params.append(value)
+    join = "JOIN games g ON g.game_id = v.game_id" if week is not None or season is not None else ""
+    where = f"WHERE {' AND '.join(conds)}" if conds else ""
+    return conn.execute(
+        f"""SELECT v.game_id, v.play_id, v.frame_id, v.event FROM events v {join} {where}
+            ORDER BY v.game_id, v.play_id, v.frame_id""",
+        params,
+    ).fetchall()
+
+
+def event_counts(conn: sqlite3.Connection, game_id: int = None) -> list:
+    """(event, count) over all games or one, most frequent first."""
+    where, params = ("WHERE game_id = ?", (game_id,)) if game_id is not None else ("", ())
+    return conn.execute(
+        f"SELECT event, COUNT(*) FROM events {where} GROUP BY event ORDER BY 2 DESC, 1", params
+    ).fetchall()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--build", action="store_true", help="(re)build events from frames")
+    parser.add_argument("--event")
+    parser.add_argument("--game-id", type=int)
+    parser.add_argument("--play-id", type=int)
+    parser.add_argument("--week", type=int)
+    parser.add_argument("--season", type=int)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.build:
+        staging = publish.start_build(DB_PATH)
+        conn = sqlite3.connect(staging)
+        try:
+            build_event_index(conn)
+        finally:
+            conn.close()
+        publish.publish(staging, DB_PATH)
+
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        if not has_events(conn):
+            raise SystemExit(f"{DB_PATH} has no events table; run with --build first")
+        if args.event is None and args.week is None and args.season is None and args.play_id is None:
+            for event, count in event_counts(conn, args.game_id):
+                print(f"  {event:<28}{count:>10,}")
+            return
+
+        t0 = time.perf_counter()
+        rows = find_events(conn, args.event, args.game_id, args.play_id, args.week, args.season)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"{len(rows):,} events in {ms:.1f} ms")
+        for row in rows[:20]:
+            print(f"  {row}")
+        if len(rows) > 20:
+            print(f"  ... {len(rows) - 20:,} more")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Precompute per-player relational features for every frame.
+
+Usage: python scripts/frame_features.py [--workers N]
+
+For each player row in frames this stores, in frame_features (keyed like
+frames):
+
+  ball_dist                distance to the ball (NULL if the frame has none)
+  nearest_opponent_id      nfl_id of the closest opponent
+  nearest_opponent_dist
+  nearest_teammate_dist
+  opponents_within         opponents within PRESSURE_RADIUS
+
+Distances are in the source's field units (yards for BDB, metres for the
+soccer sources). With at most ~30 entities on the field a dense pairwise
+distance block per frame, (frames, entities, entities) in NumPy, beats
+building a KD-tree per frame, so that is what each worker computes.
+
+Plays are handed to a process pool in groups of UNIT_PLAYS (see
+play_pool.py); each worker reads its group over its own read-only
+connection and returns the feature columns, and the parent is the only
+writer. The table is rebuilt in one pass over the whole DB, on a staging
+copy that is published over it when done (see publish.py).
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+import play_pool
+import publish
+from play_payloads import frames_layout
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+PRESSURE_RADIUS = 5.0
+UNIT_PLAYS = 20
+BLOCK_FRAMES = 4096  # frames per distance block; bounds the (B, E, E) arrays
+
+HOME, AWAY, BALL, OTHER = 0, 1, 2, -1
+TEAM_CODES = {"home": HOME, "away": AWAY, "ball": BALL}
+
+FEATURE_SELECT = {
+    "text": """
+        SELECT play_id, frame_id, nfl_id, x, y, team FROM frames
+        WHERE game_id = ? AND play_id BETWEEN ? AND ?
+        ORDER BY play_id, frame_id, nfl_id
+    """,
+    "compact": """
+        SELECT f.play_id, f.frame_id, f.nfl_id, f.x, f.y, t.name FROM frames f
+        LEFT JOIN lookup_teams t ON t.id = f.team_id
+        WHERE f.game_id = ? AND f.play_id BETWEEN ? AND ?
+        ORDER BY f.play_id, f.frame_id, f.nfl_id
+    """,
+}
+
+_conn = None
+_layout = None
+
+
+def create_feature_table(conn: sqlite3.Connection):
+    conn.executescript("""
+        DROP TABLE IF EXISTS frame_features;
+        CREATE TABLE frame_features (
+            game_id INTEGER NOT NULL,
+            play_id INTEGER NOT NULL,
+            frame_id INTEGER NOT NULL,
+            nfl_id INTEGER NOT NULL,
+            ball_dist REAL,
+            nearest_opponent_id INTEGER,
+            nearest_opponent_dist REAL,
+            nearest_teammate_dist REAL,
+            opponents_within INTEGER NOT NULL,
+            PRIMARY KEY (game_id, play_id, frame_id, nfl_id)
+        );
+    """)
+
+
+def compute_features(play_id, frame_id, nfl_id, x, y, team) -> dict:
+    """Features for rows sorted by (play, frame); returns columns for the player rows only."""
+    n = len(play_id)
+    brk = np.ones(n, dtype=bool)
+    brk[1:] = (play_id[1:] != play_id[:-1]) | (frame_id[1:] != frame_id[:-1])
+    fidx = np.cumsum(brk) - 1
+    starts = np.flatnonzero(brk)
+    slot = np.arange(n) - starts[fidx]
+    n_frames, n_ent = len(starts), int(slot.max()) + 1
+
+    # Pad to (frames, entities): one slot per row of the frame
+    pos = np.full((n_frames, n_ent, 2), np.nan)
+    pos[fidx, slot, 0] = x
+    pos[fidx, slot, 1] = y
+    code = np.full((n_frames, n_ent), OTHER)
+    code[fidx, slot] = team
+    ids = np.zeros((n_frames, n_ent), dtype=np.int64)
+    ids[fidx, slot] = nfl_id
+
+    ball_dist = np.full((n_frames, n_ent), np.nan)
+    opp_id = np.full((n_frames, n_ent), -1, dtype=np.int64)
+    opp_dist = np.full((n_frames, n_ent), np.nan)
+    mate_dist = np.full((n_frames, n_ent), np.nan)
+    within = np.zeros((n_frames, n_ent), dtype=np.int64)
+    not_self = ~np.eye(n_ent, dtype=bool)
+
+    for lo in range(0, n_frames, BLOCK_FRAMES):
+        hi = min(lo + BLOCK_FRAMES, n_frames)
+        p, c = pos[lo:hi], code[lo:hi]
+        d = np.hypot(p[:, :, None, 0] - p[:, None, :, 0], p[:, :, None, 1] - p[:, None, :, 1])
+        player = (c == HOME) | (c == AWAY)
+        valid = player[:, :, None] & player[:, None, :] & np.isfinite(d)
+        same = c[:, :, None] == c[:, None, :]
+        opp = valid & ~same
+        mate = valid & same & not_self
+
+        d_opp = np.where(opp, d, np.inf)
+        j = d_opp.argmin(axis=2)
+        nearest = np.take_along_axis(d_opp, j[:, :, None], axis=2)[:, :, 0]
+        found = np.isfinite(nearest)
+        opp_dist[lo:hi] = np.where(found, nearest, np.nan)
+        opp_id[lo:hi] = np.where(found, np.take_along_axis(ids[lo:hi], j, axis=1), -1)
+        within[lo:hi] = (opp & (d <= PRESSURE_RADIUS)).sum(axis=2)
+        nearest_mate = np.where(mate, d, np.inf).min(axis=2)
+        mate_dist[lo:hi] = np.where(np.isfinite(nearest_mate), nearest_mate, np.nan)
+
+        is_ball = c == BALL
+        has_ball = is_ball.any(axis=1)
+        ball_pos = p[np.arange(hi - lo), is_ball.argmax(axis=1)]
+        bd = np.hypot(p[:, :, 0] - ball_pos[:, None, 0], p[:, :, 1] - ball_pos[:, None, 1])
+        ball_dist[lo:hi] = np.where(has_ball[:, None], bd, np.nan)
+
+    keep = (team == HOME) | (team == AWAY)
+    f, s = fidx[keep], slot[keep]
+    return {
+        "play_id": play_id[keep],
+        "frame_id": frame_id[keep],
+        "nfl_id": nfl_id[keep],
+        "ball_dist": ball_dist[f, s].round(2),
+        "nearest_opponent_id": opp_id[f, s],
+        "nearest_opponent_dist": opp_dist[f, s].round(2),
+        "nearest_teammate_dist": mate_dist[f, s].round(2),
+        "opponents_within": within[f, s],
+    }
+
+
+def _init_worker(db_path: str):
+    global _conn, _layout
+    _conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    _layout = frames_layout(_conn)
+
+
+def unit_features(unit):
+    """Worker: read one (game, play range) and compute its features."""
+    game_id, first, last = unit
+    rows = _conn.execute(FEATURE_SELECT[_layout], unit).fetchall()
+    if not rows:
+        return game_id, None
+    play_id, frame_id, nfl_id, x, y, team = zip(*rows)
+    team = np.array([TEAM_CODES.get(t, OTHER) for t in team])
+    nfl = np.array([-1 if i is None else i for i in nfl_id], dtype=np.int64)
+    return game_id, compute_features(np.array(play_id), np.array(frame_id), nfl,
+                                     np.array(x, dtype=np.float64), np.array(y, dtype=np.float64), team)
+
+
+def write_features(conn: sqlite3.Connection, game_id: int, cols: dict) -> int:
+    n = len(cols["play_id"])
+
+    def nullable(values, missing):
+        return [None if m else v for v, m in zip(values.tolist(), missing.tolist())]
+
+    conn.executemany(
+        "INSERT INTO frame_features VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        zip([game_id] * n, cols["play_id"].tolist(), cols["frame_id"].tolist(), cols["nfl_id"].tolist(),
+            nullable(cols["ball_dist"], np.isnan(cols["ball_dist"])),
+            nullable(cols["nearest_opponent_id"], cols["nearest_opponent_id"] == -1),
+            nullable(cols["nearest_opponent_dist"], np.isnan(cols["nearest_opponent_dist"])),
+            nullable(cols["nearest_teammate_dist"], np.isnan(cols["nearest_teammate_dist"])),
+            cols["opponents_within"].tolist()),
+    )
+    return n
+
+
+def build_features(conn: sqlite3.Connection, db_path: str, workers: int) -> int:
+    create_feature_table(conn)
+    units = play_pool.play_ranges(conn, UNIT_PLAYS)
+    total = 0
+    t0 = time.perf_counter()
+    results = play_pool.imap_units(units, unit_features, workers, _init_worker, (db_path,))
+    for done, (game_id, cols) in enumerate(results, 1):
+        if cols is not None:
+            total += write_features(conn, game_id, cols)
+        if done % 100 == 0 or done == len(units):
+            conn.commit()
+            print(f"  {done:,}/{len(units):,} units, {total:,} rows "
+                  f"({total / (time.perf_counter() - t0):,.0f} rows/s)")
+    conn.commit()
+    return total
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    staging = publish.start_build(DB_PATH)
+    conn = sqlite3.connect(staging)
+    conn.execute("PRAGMA journal_mode=WAL")  # the workers read it while the parent writes
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        print("Building frame features...")
+        t0 = time.perf_counter()
+        rows = build_features(conn, staging, args.workers)
+        print(f"  {rows:,} rows in {time.perf_counter() - t0:.1f}s")
+    finally:
+        conn.close()
+    publish.publish(staging, DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
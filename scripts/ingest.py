@@ -1,21 +1,218 @@
 """Ingest BDB 2025 CSVs into SQLite (data/metapitch.db).
 
-Usage: python scripts/ingest.py
+Usage: python scripts/ingest.py [--workers N] [--loader bulk|to_sql] [--full] [--compact] [--spatial] [--lod]
+                               [--max-memory MB]
+
+Runs are incremental: every input CSV is recorded in the ingest_manifest
+table (size, mtime, sha256, status). Files that are unchanged since the
+last successful run are skipped, a changed tracking week replaces only
+the plays of its games (games.week), including plays no longer in the
+file, and a week left 'pending' by a crashed run is redone on the next
+run. --full rebuilds from scratch.
+
+The only write to data/metapitch.db itself is the manifest refresh below:
+a run works on a staging copy (empty for a rebuild, else a snapshot) and
+publish.py clusters, compacts and renames it into place once it succeeds,
+so the server never sees a half-built DB. A crashed run's staging file, with its finished
+weeks, is picked up again by the next run (see resumable_staging). A run
+that changes nothing publishes nothing and only saves the manifest's
+refreshed file mtimes into the DB (save_manifest).
+
+With --workers > 1 each tracking_week_N.csv is parsed by its own worker
+process into a shard DB, and the shards are merged into the staging DB in
+a single transaction at the end.
+
+The default bulk loader creates frames without its primary key, streams
+rows with executemany inside one transaction per week, and builds the
+unique (game_id, play_id, frame_id, nfl_id) index once at the end.
+--loader to_sql keeps the old pandas path for comparison.
+
+--compact stores the repeated frame strings as integer codes: team_id,
+event_id and source_id point at lookup_teams/lookup_events/lookup_sources,
+and display_name moves to lookup_players keyed by nfl_id.
+
+While the rows stream past, each play's summary (frame and player counts,
+start/end time, ball bounding box and distance, events) is accumulated
+into play_catalog, and plays.frame_count is filled from it instead of a
+scan of frames. Each distinct (frame, event) goes to the events table
+(see event_index.py) the same way. A DB from before either table gets it
+built from frames once.
+
+--max-memory MB reads the tracking CSVs with a declared schema (usecols,
+categorical club/event/playDirection/names), normalizes
+each chunk in place on NumPy arrays, sizes chunks from the measured bytes
+per row so a chunk and its writes fit the RSS budget, and writes frames
+WRITE_ROWS at a time; the SQLite page cache is capped at a quarter of the
+budget. Each week's peak RSS is printed and reported.
+
+--spatial builds the frames_rtree region index (see spatial_index.py);
+once it exists it is rebuilt on every run that changes frames. --lod does
+the same for the frames_lod level-of-detail tables (see lod_tables.py).
+
+Every run ends with data/metapitch.ingest.report.json: wall time, rows/sec
+and peak memory per stage (CSV parse, normalize, frame writes, backfill,
+...), see instrument.py. --profile adds a cProfile dump and --trace-memory
+the top tracemalloc allocation sites.
 """
 
+import argparse
+import hashlib
 import os
 import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
 import pandas as pd
 
+import instrument
+import play_payloads
+import publish
+from event_index import EVENTS_DDL, build_event_index
+from lod_tables import build_lod_tables
+from spatial_index import build_spatial_index
+
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "nfl-big-data-bowl-2025")
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
 CHUNK_SIZE = 500_000
 
+# --max-memory: a declared schema instead of inferred float64/object columns,
+# chunks sized to the budget and frames written WRITE_ROWS at a time
+TRACKING_DTYPES = {
+    "gameId": "int64",
+    "playId": "int32",
+    "nflId": "float32",
+    "displayName": "category",
+    "frameId": "int32",
+    "time": "category",
+    "jerseyNumber": "float32",
+    "club": "category",
+    "playDirection": "category",
+    "x": "float64",
+    "y": "float64",
+    "s": "float64",
+    "a": "float64",
+    "o": "float64",
+    "dir": "float64",
+    "event": "category",
+}
+TEAMS = ["home", "away", "ball", "unknown"]
+MIN_CHUNK_ROWS = 20_000
+MAX_CHUNK_ROWS = 2_000_000
+WRITE_ROWS = 50_000
+WRITE_ROW_BYTES = 700  # insert tuples of one frames row, as Python objects
+ROW_OVERHEAD = 2.0     # transient arrays on top of the chunk and its normalized copy
+WEEKS = range(1, 10)
+
+FRAME_COLUMNS = [
+    "game_id", "play_id", "frame_id", "nfl_id", "x", "y", "speed", "accel",
+    "vx", "vy", "orientation", "direction", "team", "jersey_number",
+    "display_name", "event", "source",
+]
+
+FRAMES_COLUMNS_DDL = """
+        game_id INTEGER NOT NULL,
+        play_id INTEGER NOT NULL,
+        frame_id INTEGER NOT NULL,
+        nfl_id INTEGER,
+        x REAL NOT NULL,
+        y REAL NOT NULL,
+        speed REAL,
+        accel REAL,
+        vx REAL,
+        vy REAL,
+        orientation REAL,
+        direction REAL,
+        team TEXT,
+        jersey_number INTEGER,
+        display_name TEXT,
+        event TEXT,
+        source TEXT DEFAULT 'kaggle'"""
+
+# --compact layout: strings replaced by codes into the lookup tables
+COMPACT_FRAME_COLUMNS = [
+    "game_id", "play_id", "frame_id", "nfl_id", "x", "y", "speed", "accel",
+    "vx", "vy", "orientation", "direction", "team_id", "jersey_number",
+    "event_id", "source_id",
+]
+
+COMPACT_FRAMES_COLUMNS_DDL = """
+        game_id INTEGER NOT NULL,
+        play_id INTEGER NOT NULL,
+        frame_id INTEGER NOT NULL,
+        nfl_id INTEGER,
+        x REAL NOT NULL,
+        y REAL NOT NULL,
+        speed REAL,
+        accel REAL,
+        vx REAL,
+        vy REAL,
+        orientation REAL,
+        direction REAL,
+        team_id INTEGER,
+        jersey_number INTEGER,
+        event_id INTEGER,
+        source_id INTEGER"""
+
+# (table, frames column it encodes)
+LOOKUPS = [("lookup_teams", "team"), ("lookup_events", "event"), ("lookup_sources", "source")]
+
+LOOKUP_DDL = "".join(f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+""" for table, _ in LOOKUPS) + """
+    CREATE TABLE IF NOT EXISTS lookup_players (
+        nfl_id INTEGER PRIMARY KEY,
+        display_name TEXT
+    );
+"""
+
+FRAMES_KEY = ("game_id", "play_id", "frame_id", "nfl_id")
+
+PLAY_CATALOG_DDL = """
+    CREATE TABLE IF NOT EXISTS play_catalog (
+        game_id INTEGER NOT NULL,
+        play_id INTEGER NOT NULL,
+        frame_count INTEGER NOT NULL,
+        player_count INTEGER NOT NULL,
+        start_time TEXT,
+        end_time TEXT,
+        ball_min_x REAL,
+        ball_max_x REAL,
+        ball_min_y REAL,
+        ball_max_y REAL,
+        ball_distance REAL,
+        events TEXT,  -- distinct events in frame order, comma-separated
+        PRIMARY KEY (game_id, play_id)
+    );
+"""
+
+
+def frame_columns(compact: bool = False) -> list:
+    return COMPACT_FRAME_COLUMNS if compact else FRAME_COLUMNS
 
-def create_tables(conn: sqlite3.Connection):
+
+def insert_frames_sql(compact: bool = False) -> str:
+    cols = frame_columns(compact)
+    return f"INSERT INTO frames ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+
+
+def frames_ddl(primary_key: bool = True, compact: bool = False) -> str:
+    """CREATE TABLE frames. The bulk loader leaves the key off until the end."""
+    cols = COMPACT_FRAMES_COLUMNS_DDL if compact else FRAMES_COLUMNS_DDL
+    pk = f",\n        PRIMARY KEY ({', '.join(FRAMES_KEY)})" if primary_key else ""
+    ddl = f"CREATE TABLE frames ({cols}{pk}\n    );\n"
+    return ddl + LOOKUP_DDL if compact else ddl
+
+
+def create_tables(conn: sqlite3.Connection, frames_pk: bool = True, compact: bool = False):
     conn.executescript("""
         DROP TABLE IF EXISTS frames;
+        DROP TABLE IF EXISTS play_catalog;
+        DROP TABLE IF EXISTS events;
         DROP TABLE IF EXISTS plays;
         DROP TABLE IF EXISTS players;
         DROP TABLE IF EXISTS games;
@@ -58,29 +255,123 @@ def create_tables(conn: sqlite3.Connection):
             PRIMARY KEY (game_id, play_id)
         );
 
-        CREATE TABLE frames (
-            game_id INTEGER NOT NULL,
-            play_id INTEGER NOT NULL,
-            frame_id INTEGER NOT NULL,
-            nfl_id INTEGER,
-            x REAL NOT NULL,
-            y REAL NOT NULL,
-            speed REAL,
-            accel REAL,
-            vx REAL,
-            vy REAL,
-            orientation REAL,
-            direction REAL,
-            team TEXT,
-            jersey_number INTEGER,
-            display_name TEXT,
-            event TEXT,
-            source TEXT DEFAULT 'kaggle',
-            PRIMARY KEY (game_id, play_id, frame_id, nfl_id)
-        );
+    """ + PLAY_CATALOG_DDL + EVENTS_DDL + frames_ddl(frames_pk, compact))
+
+
+def create_manifest(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+            path TEXT PRIMARY KEY,  -- relative to DATA_DIR
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            sha256 TEXT NOT NULL,
+            status TEXT NOT NULL,   -- 'pending' | 'done'
+            rows INTEGER,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
     """)
 
 
+def has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def existing_layout(db_path: str):
+    """'compact' or 'text' for a DB with a manifest, None if it has to be rebuilt."""
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "ingest_manifest" not in tables:
+            return None
+        return "compact" if "lookup_teams" in tables else "text"
+    finally:
+        conn.close()
+
+
+def resumable_staging(db_path: str, layout: str) -> bool:
+    """Whether a crashed run left a staging file to carry on with: one of the
+    same layout, newer than db_path, whose manifest still has weeks 'pending'."""
+    staging = publish.staging_path(db_path)
+    if not os.path.exists(staging) or existing_layout(staging) != layout:
+        return False
+    if os.path.exists(db_path) and os.path.getmtime(db_path) > os.path.getmtime(staging):
+        return False  # the DB was published since: the snapshot is out of date
+    conn = sqlite3.connect(staging)
+    try:
+        return conn.execute(
+            "SELECT 1 FROM ingest_manifest WHERE status = 'pending' LIMIT 1"
+        ).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def save_manifest(staging: str, db_path: str):
+    """Copy the manifest rows a run changed from staging into db_path.
+
+    For a run with nothing to publish: check_manifest refreshed the size and
+    mtime of touched-but-identical files, and without them every later run
+    would hash those files again. Only manifest rows are written.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS staging", (staging,))
+        rows = conn.execute("""
+            INSERT OR REPLACE INTO main.ingest_manifest
+            SELECT * FROM staging.ingest_manifest EXCEPT SELECT * FROM main.ingest_manifest
+        """).rowcount
+        conn.commit()
+        conn.execute("DETACH DATABASE staging")
+    finally:
+        conn.close()
+    if rows:
+        print(f"  {rows} manifest entries refreshed")
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 23), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def check_manifest(conn: sqlite3.Connection, path: str):
+    """Return the file's manifest entry if it needs ingesting, else None.
+
+    size + mtime is the fast path; the content hash is only computed when
+    those differ, so a touched-but-identical file is still skipped.
+    """
+    name = os.path.relpath(path, DATA_DIR)
+    st = os.stat(path)
+    row = conn.execute(
+        "SELECT size, mtime, sha256, status FROM ingest_manifest WHERE path = ?", (name,)
+    ).fetchone()
+    if row and row[3] == "done" and row[0] == st.st_size and row[1] == st.st_mtime:
+        return None
+
+    sha = file_sha256(path)
+    if row and row[3] == "done" and row[2] == sha:
+        conn.execute(
+            "UPDATE ingest_manifest SET size = ?, mtime = ? WHERE path = ?",
+            (st.st_size, st.st_mtime, name),
+        )
+        conn.commit()
+        return None
+
+    return {"path": name, "size": st.st_size, "mtime": st.st_mtime, "sha256": sha}
+
+
+def mark_manifest(conn: sqlite3.Connection, entry: dict, status: str, rows: int = None):
+    conn.execute(
+        """INSERT OR REPLACE INTO ingest_manifest (path, size, mtime, sha256, status, rows, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+        (entry["path"], entry["size"], entry["mtime"], entry["sha256"], status, rows),
+    )
+    conn.commit()
+
+
 def ingest_games(conn: sqlite3.Connection):
     print("Loading games.csv...")
     df = pd.read_csv(os.path.join(DATA_DIR, "games.csv"))
@@ -106,6 +397,7 @@ def ingest_players(conn: sqlite3.Connection):
         "players", conn, if_exists="append", index=False
     )
     print(f"  {len(df)} players")
+    return df
 
 
 def ingest_plays(conn: sqlite3.Connection):
@@ -127,129 +419,808 @@ def ingest_plays(conn: sqlite3.Connection):
         "plays", conn, if_exists="append", index=False
     )
     print(f"  {len(df)} plays")
+    return df
 
 
-def ingest_tracking(conn: sqlite3.Connection, games_df: pd.DataFrame):
-    # Build team lookup: gameId -> (home, away)
-    team_map = {}
-    for _, g in games_df.iterrows():
-        team_map[g["game_id"]] = (g["home_team"], g["away_team"])
+def sync_dimensions(conn: sqlite3.Connection):
+    """(Re)load games/players/plays when their CSV changed. Returns (games_df, changed)."""
+    loaders = [("games", ingest_games), ("players", ingest_players), ("plays", ingest_plays)]
+    games_df = None
+    changed = False
+    for table, loader in loaders:
+        entry = check_manifest(conn, os.path.join(DATA_DIR, f"{table}.csv"))
+        if entry is None:
+            print(f"{table}.csv unchanged, skipping")
+            continue
+        conn.execute(f"DELETE FROM {table}")
+        if table == "plays" and has_table(conn, "play_payloads"):
+            conn.execute("DELETE FROM play_payloads")  # descriptions may have changed; rebuilt below
+        df = loader(conn)
+        if table == "games":
+            games_df = df
+        mark_manifest(conn, entry, "done", len(df))
+        changed = True
 
-    total_rows = 0
-    for week in range(1, 10):
-        path = os.path.join(DATA_DIR, f"tracking_week_{week}.csv")
+    if games_df is None:
+        games_df = pd.read_sql("SELECT game_id, home_team, away_team FROM games", conn)
+    return games_df, changed
+
+
+def build_team_map(games_df: pd.DataFrame) -> pd.DataFrame:
+    """home/away club abbreviations indexed by gameId"""
+    return games_df.set_index("game_id")[["home_team", "away_team"]]
+
+
+def tracking_path(week: int) -> str:
+    return os.path.join(DATA_DIR, f"tracking_week_{week}.csv")
+
+
+def normalize_chunk(chunk: pd.DataFrame, team_map: pd.DataFrame) -> pd.DataFrame:
+    """Turn one raw tracking chunk into rows shaped like the frames table."""
+    # Vectorized processing
+    is_left = chunk["playDirection"] == "left"
+
+    # Normalize coords
+    x = chunk["x"].copy()
+    y = chunk["y"].copy()
+    o = chunk["o"].fillna(0.0).copy()
+    d = chunk["dir"].fillna(0.0).copy()
+
+    x[is_left] = 120.0 - x[is_left]
+    y[is_left] = 53.3 - y[is_left]
+    o[is_left] = (o[is_left] + 180.0) % 360.0
+    d[is_left] = (d[is_left] + 180.0) % 360.0
+
+    # Compute velocity components
+    s = chunk["s"].fillna(0.0)
+    d_rad = np.radians(d)
+    vx = s * np.cos(d_rad)
+    vy = s * np.sin(d_rad)
+
+    # Map club -> team (vectorized lookup against the game's home/away clubs)
+    club = chunk["club"].to_numpy()
+    home_teams = chunk["gameId"].map(team_map["home_team"]).to_numpy()
+    away_teams = chunk["gameId"].map(team_map["away_team"]).to_numpy()
+    team = np.select(
+        [club == away_teams, club == home_teams, club == "football"],
+        ["away", "home", "ball"],
+        default="unknown",
+    )
+
+    # Build output DataFrame
+    out = pd.DataFrame({
+        "game_id": chunk["gameId"],
+        "play_id": chunk["playId"],
+        "frame_id": chunk["frameId"],
+        "nfl_id": chunk["nflId"],
+        "x": x.round(2),
+        "y": y.round(2),
+        "speed": s.round(2),
+        "accel": chunk["a"].fillna(0.0).round(2),
+        "vx": vx.round(2),
+        "vy": vy.round(2),
+        "orientation": o.round(2),
+        "direction": d.round(2),
+        "team": team,
+        "jersey_number": chunk["jerseyNumber"],
+        "display_name": chunk["displayName"],
+        "event": chunk["event"],
+        "source": "kaggle",
+    })
+
+    # Use sentinel -1 for football (NULL breaks composite PK)
+    out["nfl_id"] = out["nfl_id"].fillna(-1).astype(int)
+    return out
+
+
+def normalize_chunk_typed(chunk: pd.DataFrame, team_map: pd.DataFrame) -> pd.DataFrame:
+    """normalize_chunk for a chunk read with TRACKING_DTYPES.
+
+    Each numeric column is copied once into a float64 array and normalized
+    and rounded in place; team, event and names stay categorical.
+    """
+    left = (chunk["playDirection"] == "left").to_numpy()
+    x, y, s, a, o, d = (chunk[c].to_numpy(np.float64, copy=True) for c in ("x", "y", "s", "a", "o", "dir"))
+    for values in (s, a, o, d):
+        np.nan_to_num(values, copy=False)
+    np.subtract(120.0, x, out=x, where=left)
+    np.subtract(53.3, y, out=y, where=left)
+    for angle in (o, d):
+        np.add(angle, 180.0, out=angle, where=left)
+        np.mod(angle, 360.0, out=angle, where=left)
+
+    d_rad = np.radians(d)
+    vx = np.cos(d_rad)
+    vx *= s
+    vy = np.sin(d_rad, out=d_rad)
+    vy *= s
+    for values in (x, y, s, a, vx, vy, o, d):
+        np.round(values, 2, out=values)
+
+    # Club -> team on the category codes: one home/away lookup per game in the chunk
+    club = chunk["club"].cat
+    code_of = {name: i for i, name in enumerate(club.categories)}
+    game_id = chunk["gameId"].to_numpy()
+    games, per_row = np.unique(game_id, return_inverse=True)
+    home = np.array([code_of.get(team_map["home_team"].get(g), -2) for g in games])[per_row]
+    away = np.array([code_of.get(team_map["away_team"].get(g), -2) for g in games])[per_row]
+    codes = club.codes.to_numpy()
+    team = np.select([codes == away, codes == home, codes == code_of.get("football", -2)], [1, 0, 2], default=3)
+
+    nfl_id = chunk["nflId"].to_numpy(np.float64)
+    return pd.DataFrame({
+        "game_id": game_id,
+        "play_id": chunk["playId"].to_numpy(),
+        "frame_id": chunk["frameId"].to_numpy(),
+        "nfl_id": np.where(np.isnan(nfl_id), -1, nfl_id).astype(np.int64),
+        "x": x,
+        "y": y,
+        "speed": s,
+        "accel": a,
+        "vx": vx,
+        "vy": vy,
+        "orientation": o,
+        "direction": d,
+        "team": pd.Categorical.from_codes(team, TEAMS),
+        "jersey_number": chunk["jerseyNumber"].to_numpy(),
+        "display_name": chunk["displayName"].array,
+        "event": chunk["event"].array,
+        "source": "kaggle",
+    }, index=chunk.index, copy=False)
+
+
+class ChunkBudget:
+    """Sizes tracking chunks so a chunk, its normalized copy and one write
+    batch fit in max_memory_mb of RSS on top of what the process holds now."""
+
+    def __init__(self, max_memory_mb: int):
+        self.limit_kb = max_memory_mb * 1024
+        self.baseline_kb = instrument.rss_kb()
+        self.rows = MIN_CHUNK_ROWS  # measure on a small first chunk
+        if self.baseline_kb >= self.limit_kb:
+            print(f"  warning: already at {self.baseline_kb // 1024:,} MB RSS, "
+                  f"over --max-memory {max_memory_mb:,}; using {MIN_CHUNK_ROWS:,}-row chunks")
+
+    def update(self, chunk: pd.DataFrame, out: pd.DataFrame):
+        """Resize from the measured bytes per row of the last chunk."""
+        used = chunk.memory_usage(deep=True).sum() + out.memory_usage(deep=True).sum()
+        per_row = ROW_OVERHEAD * used / max(len(chunk), 1)
+        free = (self.limit_kb - self.baseline_kb) * 1024 - WRITE_ROWS * WRITE_ROW_BYTES
+        self.rows = int(min(MAX_CHUNK_ROWS, max(MIN_CHUNK_ROWS, free / per_row)))
+
+
+def read_tracking(path: str, budget: ChunkBudget = None):
+    """Chunks of a tracking CSV: inferred dtypes and CHUNK_SIZE rows, or
+    TRACKING_DTYPES with sizes from budget."""
+    if budget is None:
+        yield from pd.read_csv(path, chunksize=CHUNK_SIZE)
+        return
+    with pd.read_csv(path, usecols=list(TRACKING_DTYPES), dtype=TRACKING_DTYPES, iterator=True) as reader:
+        while True:
+            try:
+                yield reader.get_chunk(budget.rows)
+            except StopIteration:
+                return
+
+
+def frame_rows(out: pd.DataFrame, columns: list = FRAME_COLUMNS):
+    """Yield insert tuples straight from the NumPy columns, NaN -> NULL."""
+    cols = []
+    for name in columns:
+        col = out[name]
+        if col.hasnans:
+            values = col.to_numpy(dtype=object)
+            values[col.isna().to_numpy()] = None
+            cols.append(values.tolist())
+        else:
+            cols.append(col.to_numpy().tolist())
+    return zip(*cols)
+
+
+def load_lookups(conn: sqlite3.Connection) -> dict:
+    """In-memory copy of the lookup tables: {frames column: {name: id}}, plus known players."""
+    lookups = {col: dict(conn.execute(f"SELECT name, id FROM {table}")) for table, col in LOOKUPS}
+    lookups["players"] = {r[0] for r in conn.execute("SELECT nfl_id FROM lookup_players")}
+    return lookups
+
+
+def encode_frames(conn: sqlite3.Connection, out: pd.DataFrame, lookups: dict) -> pd.DataFrame:
+    """Replace the string columns of a normalized chunk with lookup codes."""
+    for table, col in LOOKUPS:
+        codes = lookups[col]
+        for name in out[col].dropna().unique().tolist():
+            if name not in codes:
+                codes[name] = conn.execute(f"INSERT INTO {table} (name) VALUES (?)", (name,)).lastrowid
+        out[f"{col}_id"] = out[col].map(codes)
+
+    players = out.drop_duplicates("nfl_id")
+    new_players = players[~players["nfl_id"].isin(lookups["players"])]
+    conn.executemany(
+        "INSERT OR IGNORE INTO lookup_players (nfl_id, display_name) VALUES (?, ?)",
+        frame_rows(new_players, ["nfl_id", "display_name"]),
+    )
+    lookups["players"].update(new_players["nfl_id"].tolist())
+    return out[COMPACT_FRAME_COLUMNS]
+
+
+class PlayCatalog:
+    """Per-play summary accumulated chunk by chunk as tracking rows stream past.
+
+    A play never spans two weeks, so write() after each week has every
+    play of that week complete.
+    """
+
+    def __init__(self):
+        self.plays = {}
+
+    def _play(self, key):
+        play = self.plays.get(key)
+        if play is None:
+            play = self.plays[key] = {"frames": 0, "players": set(), "start": None, "end": None,
+                                      "ball": [], "events": set()}
+        return play
+
+    def add(self, out: pd.DataFrame, times: pd.Series = None):
+        """out is a normalized chunk (see normalize_chunk); times its raw time column."""
+        keys = [out["game_id"], out["play_id"]]
+        for (g, p), frames in out["frame_id"].groupby(keys, sort=False).max().items():
+            play = self._play((g, p))
+            play["frames"] = max(play["frames"], int(frames))
+        if times is not None:
+            if isinstance(times.dtype, pd.CategoricalDtype):
+                # min/max need an order; the time strings sort chronologically
+                times = times.cat.reorder_categories(sorted(times.cat.categories), ordered=True)
+            spans = times.groupby(keys, sort=False, observed=True).agg(["min", "max"])
+            for (g, p), start, end in spans.itertuples():
+                play = self._play((g, p))
+                play["start"] = start if play["start"] is None else min(play["start"], start)
+                play["end"] = end if play["end"] is None else max(play["end"], end)
+
+        players = out.loc[out["team"] != "ball", ["game_id", "play_id", "nfl_id"]].drop_duplicates()
+        for g, p, nfl_id in players.itertuples(index=False):
+            self.plays[(g, p)]["players"].add(nfl_id)
+        ball = out.loc[out["team"] == "ball", ["game_id", "play_id", "frame_id", "x", "y"]]
+        for (g, p), rows in ball.groupby(["game_id", "play_id"], sort=False):
+            self.plays[(g, p)]["ball"].append(rows[["frame_id", "x", "y"]].to_numpy(dtype=np.float64))
+        events = out.loc[out["event"].notna(), ["game_id", "play_id", "frame_id", "event"]].drop_duplicates()
+        for g, p, frame_id, event in events.itertuples(index=False):
+            self.plays[(g, p)]["events"].add((frame_id, event))
+
+    def rows(self):
+        for (g, p), play in self.plays.items():
+            bbox = (None,) * 4
+            distance = None
+            if play["ball"]:
+                ball = np.concatenate(play["ball"])
+                ball = ball[np.unique(ball[:, 0], return_index=True)[1]]  # sorted by frame
+                bbox = (ball[:, 1].min(), ball[:, 1].max(), ball[:, 2].min(), ball[:, 2].max())
+                distance = round(float(np.hypot(np.diff(ball[:, 1]), np.diff(ball[:, 2])).sum()), 2)
+            events = []
+            for _, event in sorted(play["events"]):
+                if event not in events:
+                    events.append(event)
+            yield (int(g), int(p), play["frames"], len(play["players"]), play["start"], play["end"],
+                   *(None if v is None else round(float(v), 2) for v in bbox), distance,
+                   ",".join(events) or None)
+
+    def write(self, conn: sqlite3.Connection) -> int:
+        """Upsert the accumulated plays into play_catalog and events, and start over."""
+        rows = list(self.rows())
+        conn.executemany(f"INSERT OR REPLACE INTO play_catalog VALUES ({', '.join('?' * 12)})", rows)
+        conn.executemany("DELETE FROM events WHERE game_id = ? AND play_id = ?", [r[:2] for r in rows])
+        conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", (
+            (int(g), int(p), int(frame_id), event)
+            for (g, p), play in self.plays.items() for frame_id, event in sorted(play["events"])
+        ))
+        self.plays = {}
+        return len(rows)
+
+
+def catalog_from_frames(conn: sqlite3.Connection, game_ids: list = None) -> int:
+    """Build play_catalog (and events) from an existing frames table, for every
+    game or only game_ids; frames has no start/end times."""
+    print("Building play catalog from frames...")
+    if game_ids is None:
+        cursors = [play_payloads.frame_rows(conn)]
+    else:
+        cursors = (play_payloads.frame_rows(conn, g) for g in game_ids)
+    columns = ["game_id", "play_id", "frame_id", "nfl_id", "x", "y", "vx", "vy", "orientation",
+               "team", "jersey_number", "display_name", "event"]
+    catalog = PlayCatalog()
+    for cursor in cursors:
+        while rows := cursor.fetchmany(CHUNK_SIZE):
+            catalog.add(pd.DataFrame.from_records(rows, columns=columns))
+    return catalog.write(conn)
+
+
+# Per-frame analytics built by their own scripts (frame_features.py,
+# pitch_control.py, belief_precompute.py, track_codec.py); too slow to redo
+# on every load, so a wholesale rewrite of frames drops them instead
+ANALYTICS_TABLES = ("frame_features", "pitch_control", "pitch_control_grid", "belief_posteriors",
+                    "belief_deltas", "belief_pivotal", "track_blobs")
+
+
+def refresh_derived(conn: sqlite3.Connection, game_ids: list = None):
+    """Bring the tables built from frames back in line after frames was rewritten.
+
+    For loaders other than this one (ingest_metrica.py, mock_soccer.py
+    --games): events, play_catalog, play_payloads, frames_lod and
+    frames_rtree are rebuilt when they exist, the tables in
+    ANALYTICS_TABLES are dropped. With game_ids (games appended to frames)
+    only those games get events, catalog and payload rows, and the other
+    games' rows are left alone; frames_lod and frames_rtree are still
+    rebuilt whole.
+    """
+    if game_ids is not None:
+        refresh_games(conn, game_ids)
+        return
+    if has_table(conn, "events") or has_table(conn, "play_catalog"):
+        with instrument.stage("event_index") as st:
+            st.rows = build_event_index(conn)
+    if has_table(conn, "play_catalog"):
+        conn.execute("DROP TABLE play_catalog")
+        conn.executescript(PLAY_CATALOG_DDL)
+        with instrument.stage("play_catalog") as st:
+            st.rows = catalog_from_frames(conn)
+        conn.commit()
+    if has_table(conn, "play_payloads"):
+        print("Building play payloads...")
+        with instrument.stage("play_payloads") as st:
+            st.rows = play_payloads.build_payloads(conn)
+    if has_table(conn, "frames_lod"):
+        with instrument.stage("lod_tables") as st:
+            st.rows = sum(build_lod_tables(conn).values())
+    if has_table(conn, "frames_rtree"):
+        with instrument.stage("spatial_index"):
+            build_spatial_index(conn)
+    stale = [t for t in ANALYTICS_TABLES if has_table(conn, t)]
+    for table in stale:
+        conn.execute(f"DROP TABLE {table}")
+    conn.commit()
+    if stale:
+        print(f"  dropped {', '.join(stale)}; rerun their scripts to rebuild them")
+
+
+def refresh_games(conn: sqlite3.Connection, game_ids: list):
+    """refresh_derived for games newly appended to frames."""
+    if has_table(conn, "events") or has_table(conn, "play_catalog"):
+        conn.executescript(PLAY_CATALOG_DDL + EVENTS_DDL)
+        with instrument.stage("play_catalog") as st:
+            st.rows = catalog_from_frames(conn, game_ids)  # writes the plays' events too
+        conn.commit()
+    marks = ", ".join("?" * len(game_ids))
+    if has_table(conn, "play_payloads"):
+        print("Building play payloads...")
+        keys = conn.execute(
+            f"SELECT DISTINCT game_id, play_id FROM play_catalog WHERE game_id IN ({marks}) ORDER BY 1, 2",
+            game_ids,
+        ).fetchall()
+        with instrument.stage("play_payloads") as st:
+            st.rows = play_payloads.build_payloads(conn, keys)
+    if has_table(conn, "frames_lod"):
+        with instrument.stage("lod_tables") as st:
+            st.rows = sum(build_lod_tables(conn).values())
+    if has_table(conn, "frames_rtree"):
+        with instrument.stage("spatial_index"):
+            build_spatial_index(conn)
+    missing = [t for t in ANALYTICS_TABLES if has_table(conn, t)]
+    for table in missing:
+        if "game_id" in {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}:
+            conn.execute(f"DELETE FROM {table} WHERE game_id IN ({marks})", game_ids)
+    conn.commit()
+    if missing:
+        print(f"  {', '.join(missing)} have no rows for the new games; rerun their scripts to add them")
+
+
+# Tables ingest.py writes per play: replacing a play clears it from all of them
+PLAY_TABLES = ("frames", "play_catalog", "events", "play_payloads")
+
+
+def week_plays(conn: sqlite3.Connection, week: int) -> list:
+    """[(game_id, play_id)] loaded so far for the games of tracking_week_{week}.csv."""
+    return conn.execute("""
+        SELECT c.game_id, c.play_id FROM play_catalog c
+        JOIN games g ON g.game_id = c.game_id WHERE g.week = ?
+    """, (week,)).fetchall()
+
+
+def delete_plays(conn: sqlite3.Connection, keys: list):
+    """Delete the given (game_id, play_id) plays from every table in PLAY_TABLES."""
+    for table in PLAY_TABLES:
+        if has_table(conn, table):
+            conn.executemany(f"DELETE FROM {table} WHERE game_id = ? AND play_id = ?", keys)
+
+
+def write_frames(conn: sqlite3.Connection, out: pd.DataFrame, loader: str, lookups: dict = None):
+    """lookups is set for --compact; see load_lookups."""
+    compact = lookups is not None
+    if compact:
+        with instrument.stage("encode_lookups", len(out)):
+            out = encode_frames(conn, out, lookups)
+    with instrument.stage(f"write_frames_{loader}", len(out)):
+        if loader == "to_sql":
+            out.to_sql("frames", conn, if_exists="append", index=False)
+        else:
+            conn.executemany(insert_frames_sql(compact), frame_rows(out, frame_columns(compact)))
+
+
+def ingest_week(conn: sqlite3.Connection, path: str, team_map: pd.DataFrame, loader: str = "bulk",
+                replace: bool = False, compact: bool = False, max_memory_mb: int = None) -> int:
+    """Load one week in a single transaction.
+
+    With replace=True, existing rows of each (game_id, play_id) in the file
+    are deleted (delete_plays) just before that play's first chunk is
+    written; the caller clears the plays that left the file. With
+    max_memory_mb the typed, budget-sized reader is used (see ChunkBudget).
+    """
+    lookups = load_lookups(conn) if compact else None
+    catalog = PlayCatalog()
+    week_rows = 0
+    seen = set()
+    budget = ChunkBudget(max_memory_mb) if max_memory_mb else None
+    for chunk in instrument.timed("csv_parse", read_tracking(path, budget), rows=len):
+        with instrument.stage("normalize", len(chunk)):
+            out = normalize_chunk(chunk, team_map) if budget is None else normalize_chunk_typed(chunk, team_map)
+        if replace:
+            with instrument.stage("delete_replaced"):
+                keys = out[["game_id", "play_id"]].drop_duplicates().to_numpy().tolist()
+                new_keys = [tuple(k) for k in keys if tuple(k) not in seen]
+                delete_plays(conn, new_keys)
+                seen.update(new_keys)
+        with instrument.stage("play_catalog", len(out)):
+            catalog.add(out, chunk.get("time"))
+        if budget is None:
+            write_frames(conn, out, loader, lookups)
+        else:
+            budget.update(chunk, out)
+            for lo in range(0, len(out), WRITE_ROWS):
+                write_frames(conn, out.iloc[lo:lo + WRITE_ROWS], loader, lookups)
+        week_rows += len(out)
+    with instrument.stage("play_catalog"):
+        catalog.write(conn)
+    with instrument.stage("commit"):
+        conn.commit()
+    return week_rows
+
+
+def pending_weeks(conn: sqlite3.Connection) -> list:
+    """[(week, manifest entry)] for tracking files that need (re)ingesting."""
+    weeks = []
+    for week in WEEKS:
+        path = tracking_path(week)
         if not os.path.exists(path):
             continue
-        print(f"Loading tracking_week_{week}.csv...")
-        week_rows = 0
-
-        for chunk in pd.read_csv(path, chunksize=CHUNK_SIZE):
-            # Vectorized processing
-            is_left = chunk["playDirection"] == "left"
-
-            # Normalize coords
-            x = chunk["x"].copy()
-            y = chunk["y"].copy()
-            o = chunk["o"].fillna(0.0).copy()
-            d = chunk["dir"].fillna(0.0).copy()
-
-            x[is_left] = 120.0 - x[is_left]
-            y[is_left] = 53.3 - y[is_left]
-            o[is_left] = (o[is_left] + 180.0) % 360.0
-            d[is_left] = (d[is_left] + 180.0) % 360.0
-
-            # Compute velocity components
-            s = chunk["s"].fillna(0.0)
-            d_rad = np.radians(d)
-            vx = s * np.cos(d_rad)
-            vy = s * np.sin(d_rad)
-
-            # Map club -> team (vectorized)
-            home_teams = chunk["gameId"].map(lambda gid: team_map.get(gid, (None, None))[0])
-            away_teams = chunk["gameId"].map(lambda gid: team_map.get(gid, (None, None))[1])
-            team = pd.Series("unknown", index=chunk.index)
-            team[chunk["club"] == "football"] = "ball"
-            team[chunk["club"] == home_teams] = "home"
-            team[chunk["club"] == away_teams] = "away"
-
-            # Build output DataFrame
-            out = pd.DataFrame({
-                "game_id": chunk["gameId"],
-                "play_id": chunk["playId"],
-                "frame_id": chunk["frameId"],
-                "nfl_id": chunk["nflId"],
-                "x": x.round(2),
-                "y": y.round(2),
-                "speed": s.round(2),
-                "accel": chunk["a"].fillna(0.0).round(2),
-                "vx": vx.round(2),
-                "vy": vy.round(2),
-                "orientation": o.round(2),
-                "direction": d.round(2),
-                "team": team,
-                "jersey_number": chunk["jerseyNumber"],
-                "display_name": chunk["displayName"],
-                "event": chunk["event"],
-                "source": "kaggle",
-            })
-
-            # Use sentinel -1 for football (NULL breaks composite PK)
-            out["nfl_id"] = out["nfl_id"].fillna(-1).astype(int)
+        entry = check_manifest(conn, path)
+        if entry is None:
+            print(f"tracking_week_{week}.csv unchanged, skipping")
+            continue
+        weeks.append((week, entry))
+    return weeks
 
-            out.to_sql("frames", conn, if_exists="append", index=False)
-            week_rows += len(out)
 
-        print(f"  {week_rows:,} rows")
+def ingest_tracking(conn: sqlite3.Connection, games_df: pd.DataFrame, loader: str = "bulk",
+                    replace: bool = False, compact: bool = False, max_memory_mb: int = None) -> int:
+    team_map = build_team_map(games_df)
+
+    total_rows = 0
+    t_start = time.perf_counter()
+    for week, entry in pending_weeks(conn):
+        print(f"Loading tracking_week_{week}.csv...")
+        mark_manifest(conn, entry, "pending")
+        t0 = time.perf_counter()
+        with instrument.stage(f"tracking_week_{week}") as st:
+            if replace:
+                # Plays dropped from the file too; committed with the week's rows
+                delete_plays(conn, week_plays(conn, week))
+            week_rows = st.rows = ingest_week(conn, tracking_path(week), team_map, loader, replace,
+                                              compact, max_memory_mb)
+        secs = time.perf_counter() - t0
+        mark_manifest(conn, entry, "done", week_rows)
+        peak = f", peak RSS {st.peak_rss_kb / 1024:,.0f} MB" if st.peak_rss_kb else ""
+        print(f"  {week_rows:,} rows ({week_rows / max(secs, 1e-9):,.0f} rows/s{peak})")
         total_rows += week_rows
 
+    secs = time.perf_counter() - t_start
+    print(f"Total tracking rows: {total_rows:,} ({total_rows / max(secs, 1e-9):,.0f} rows/s, {loader})")
+    return total_rows
+
+
+def ingest_week_shard(week: int, path: str, shard_path: str, team_map: pd.DataFrame,
+                      loader: str = "bulk", max_memory_mb: int = None):
+    """Worker: parse one week into its own shard DB. Returns (week, rows, seconds, peak RSS kB)."""
+    t0 = time.perf_counter()
+    conn = sqlite3.connect(shard_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        # Shards skip the key; uniqueness is enforced once in the main DB.
+        # They always hold text columns; --compact encodes them during the merge.
+        conn.executescript(PLAY_CATALOG_DDL + EVENTS_DDL + frames_ddl(primary_key=False))
+        rows = ingest_week(conn, path, team_map, loader, max_memory_mb=max_memory_mb)
+    finally:
+        conn.close()
+    return week, rows, time.perf_counter() - t0, instrument.peak_rss_kb()
+
+
+def encode_shard_sql(alias: str) -> list:
+    """Statements that intern a text shard's strings and copy it into compact frames."""
+    stmts = [
+        f"INSERT OR IGNORE INTO lookup_players (nfl_id, display_name) "
+        f"SELECT nfl_id, MIN(display_name) FROM {alias}.frames GROUP BY nfl_id"
+    ]
+    joins = []
+    selects = [f"f.{c}" for c in COMPACT_FRAME_COLUMNS]
+    for i, (table, col) in enumerate(LOOKUPS):
+        stmts.append(
+            f"INSERT OR IGNORE INTO {table} (name) "
+            f"SELECT DISTINCT {col} FROM {alias}.frames WHERE {col} IS NOT NULL"
+        )
+        joins.append(f"LEFT JOIN {table} l{i} ON l{i}.name = f.{col}")
+        selects[COMPACT_FRAME_COLUMNS.index(f"{col}_id")] = f"l{i}.id"
+    stmts.append(
+        f"INSERT INTO main.frames ({', '.join(COMPACT_FRAME_COLUMNS)}) "
+        f"SELECT {', '.join(selects)} FROM {alias}.frames f {' '.join(joins)}"
+    )
+    return stmts
+
+
+def merge_shards(conn: sqlite3.Connection, shard_paths: list, replace: bool = False,
+                 compact: bool = False, stale_plays: list = ()):
+    """Copy every shard's frames into the main DB in one transaction.
+
+    With replace=True the plays in stale_plays (see week_plays) and every
+    play in a shard are deleted first (delete_plays).
+    """
+    conn.commit()
+    aliases = [f"shard{i}" for i in range(len(shard_paths))]
+    for alias, shard_path in zip(aliases, shard_paths):
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (shard_path,))
+    try:
+        cols = ", ".join(FRAME_COLUMNS)
+        if replace:
+            delete_plays(conn, stale_plays)
+        for alias in aliases:
+            if replace:
+                delete_plays(conn, conn.execute(
+                    f"SELECT game_id, play_id FROM {alias}.play_catalog").fetchall())
+            if compact:
+                for stmt in encode_shard_sql(alias):
+                    conn.execute(stmt)
+            else:
+                conn.execute(f"INSERT INTO main.frames ({cols}) SELECT {cols} FROM {alias}.frames")
+            conn.execute(f"INSERT OR REPLACE INTO main.play_catalog SELECT * FROM {alias}.play_catalog")
+            conn.execute(f"INSERT INTO main.events SELECT * FROM {alias}.events")
+        conn.commit()
+    finally:
+        for alias in aliases:
+            conn.execute(f"DETACH DATABASE {alias}")
+
+
+def ingest_tracking_parallel(conn: sqlite3.Connection, games_df: pd.DataFrame, workers: int,
+                             loader: str = "bulk", replace: bool = False, compact: bool = False,
+                             max_memory_mb: int = None) -> int:
+    team_map = build_team_map(games_df)
+    entries = dict(pending_weeks(conn))
+    weeks = sorted(entries)
+    if not weeks:
+        print("Total tracking rows: 0")
+        return 0
+    for week in weeks:
+        mark_manifest(conn, entries[week], "pending")
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(DB_PATH)) as shard_dir:
+        print(f"Parsing {len(weeks)} tracking weeks with {workers} workers...")
+        t0 = time.perf_counter()
+        shards = {}
+        week_rows = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(ingest_week_shard, w, tracking_path(w),
+                            os.path.join(shard_dir, f"week_{w}.db"), team_map, loader, max_memory_mb)
+                for w in weeks
+            ]
+            for fut in as_completed(futures):
+                week, rows, secs, peak_kb = fut.result()
+                instrument.add_stage("parse_week_worker", secs, rows, peak_kb)
+                shards[week] = os.path.join(shard_dir, f"week_{week}.db")
+                week_rows[week] = rows
+                print(f"  tracking_week_{week}.csv: {rows:,} rows in {secs:.1f}s "
+                      f"({rows / max(secs, 1e-9):,.0f} rows/s, worker peak RSS {peak_kb / 1024:,.0f} MB)")
+        print(f"  parse phase: {time.perf_counter() - t0:.1f}s")
+
+        print("Merging shards...")
+        t0 = time.perf_counter()
+        with instrument.stage("merge_shards", sum(week_rows.values())):
+            stale = [key for w in weeks for key in week_plays(conn, w)] if replace else []
+            merge_shards(conn, [shards[w] for w in weeks], replace, compact, stale)
+        print(f"  merge phase: {time.perf_counter() - t0:.1f}s")
+
+    for week in weeks:
+        mark_manifest(conn, entries[week], "done", week_rows[week])
+    total_rows = sum(week_rows.values())
     print(f"Total tracking rows: {total_rows:,}")
+    return total_rows
+
+
+def build_frames_key(conn: sqlite3.Connection):
+    """Stand-in for the primary key the bulk loader skipped; also serves getPlayData."""
+    if publish.is_clustered(conn, "frames"):
+        return  # a published DB: frames is keyed on FRAMES_KEY itself
+    print("Building frames key index...")
+    with instrument.stage("frames_key"):
+        conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_frames_key ON frames({', '.join(FRAMES_KEY)})"
+        )
 
 
 def backfill_and_index(conn: sqlite3.Connection):
     print("Backfilling frame_count...")
-    conn.execute("""
-        UPDATE plays SET frame_count = (
-            SELECT MAX(frame_id) FROM frames
-            WHERE frames.game_id = plays.game_id AND frames.play_id = plays.play_id
-        )
-    """)
+    with instrument.stage("backfill_frame_count") as st:
+        # play_catalog was filled while the rows streamed in: a key lookup per play, no frames scan
+        st.rows = conn.execute("""
+            UPDATE plays SET frame_count = (
+                SELECT frame_count FROM play_catalog c
+                WHERE c.game_id = plays.game_id AND c.play_id = plays.play_id
+            )
+        """).rowcount
 
     print("Creating indexes...")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_frames_play ON frames(game_id, play_id)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_frames_player ON frames(nfl_id, game_id)")
+    with instrument.stage("indexes"):
+        if not publish.is_clustered(conn, "frames"):
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_frames_play ON frames(game_id, play_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_frames_player ON frames(nfl_id, game_id)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for tracking weeks (1 = serial)")
+    parser.add_argument("--loader", choices=["bulk", "to_sql"], default="bulk",
+                        help="frames writer (to_sql is the old pandas path)")
+    parser.add_argument("--full", action="store_true",
+                        help="delete the DB and rebuild everything")
+    parser.add_argument("--compact", action="store_true",
+                        help="dictionary-encode team/display_name/event/source in frames")
+    parser.add_argument("--spatial", action="store_true",
+                        help="build the frames_rtree region index")
+    parser.add_argument("--lod", action="store_true",
+                        help="build the frames_lod level-of-detail tables")
+    parser.add_argument("--max-memory", type=int, metavar="MB",
+                        help="typed tracking reader with chunks sized to this RSS budget (per process)")
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    if args.max_memory and args.loader != "bulk":
+        parser.error("--max-memory needs the bulk loader")
+    return args
 
 
 def main():
-    if os.path.exists(DB_PATH):
-        os.remove(DB_PATH)
-        print(f"Removed existing {DB_PATH}")
+    args = parse_args()
+    bulk = args.loader == "bulk"
+
+    # A DB without a manifest predates incremental ingest, and switching
+    # --compact on or off changes the frames layout; both need a rebuild.
+    layout = "compact" if args.compact else "text"
+    fresh = not os.path.exists(DB_PATH) or args.full or existing_layout(DB_PATH) != layout
+    resume = not args.full and resumable_staging(DB_PATH, layout)
+    if resume:
+        print(f"Resuming the crashed run in {publish.staging_path(DB_PATH)}")
+        fresh = False
+    elif fresh and os.path.exists(DB_PATH):
+        print(f"Rebuilding {DB_PATH} from scratch")
 
-    conn = sqlite3.connect(DB_PATH)
+    instrument.start("ingest", DB_PATH, args)
+    totals = {"loader": args.loader, "workers": args.workers, "compact": args.compact, "fresh": fresh,
+              "resumed": resume, "max_memory_mb": args.max_memory}
+    with instrument.stage("staging"):
+        staging = publish.start_build(DB_PATH, fresh, reuse=resume)
+    backfilled = False
+    changed = True
+    conn = sqlite3.connect(staging)
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA synchronous=OFF")
-    conn.execute("PRAGMA cache_size=-2000000")
+    # The page cache grows with every week written; under --max-memory it gets a share of the budget
+    cache_kb = args.max_memory * 1024 // 4 if args.max_memory else 2_000_000
+    conn.execute(f"PRAGMA cache_size=-{cache_kb}")
 
     try:
-        create_tables(conn)
-        games_df = ingest_games(conn)
-        ingest_players(conn)
-        ingest_plays(conn)
-        conn.commit()
+        t0 = time.perf_counter()
+        if fresh:
+            create_tables(conn, frames_pk=not bulk, compact=args.compact)
+        else:
+            if not resume:
+                print(f"Updating existing {DB_PATH}")
+            if bulk:
+                # Replacing a week's plays must be an index lookup, not a scan
+                build_frames_key(conn)
+        create_manifest(conn)
+        if not has_table(conn, "play_catalog"):
+            # DB from before the catalog: one scan of frames, then it is kept up to date
+            conn.executescript(PLAY_CATALOG_DDL)
+            with instrument.stage("play_catalog_backfill") as st:
+                st.rows = catalog_from_frames(conn)
+            conn.commit()
+            backfilled = True
+        if not has_table(conn, "events"):
+            with instrument.stage("event_index_backfill") as st:
+                st.rows = build_event_index(conn)
+            backfilled = True
+        with instrument.stage("dimensions"):
+            games_df, dims_changed = sync_dimensions(conn)
+            conn.commit()
+        print(f"  dimension tables: {time.perf_counter() - t0:.1f}s")
 
-        ingest_tracking(conn, games_df)
-        conn.commit()
+        t0 = time.perf_counter()
+        replace = not fresh
+        with instrument.stage("tracking") as st:
+            if args.workers > 1:
+                tracking_rows = ingest_tracking_parallel(conn, games_df, args.workers, args.loader,
+                                                         replace, args.compact, args.max_memory)
+            else:
+                tracking_rows = ingest_tracking(conn, games_df, args.loader, replace, args.compact,
+                                                args.max_memory)
+            conn.commit()
+            st.rows = tracking_rows
+        totals["tracking_rows"] = tracking_rows
+        print(f"  tracking: {time.perf_counter() - t0:.1f}s")
 
-        backfill_and_index(conn)
-        conn.commit()
+        if fresh or dims_changed or tracking_rows:
+            t0 = time.perf_counter()
+            if bulk:
+                build_frames_key(conn)
+            backfill_and_index(conn)
+            conn.commit()
+            print(f"  backfill + index: {time.perf_counter() - t0:.1f}s")
+
+            # Replaced weeks (delete_plays) and a new plays.csv cleared their plays' cached JSON
+            if has_table(conn, "play_payloads"):
+                stale = play_payloads.missing_payloads(conn)
+                if stale:
+                    print(f"Rebuilding {len(stale):,} play payloads...")
+                    with instrument.stage("play_payloads") as st:
+                        st.rows = play_payloads.build_payloads(conn, stale)
+
+            # frames_rtree holds a point per frame row, so a replaced week invalidates it
+            if args.spatial or has_table(conn, "frames_rtree"):
+                t0 = time.perf_counter()
+                with instrument.stage("spatial_index"):
+                    build_spatial_index(conn)
+                print(f"  spatial index: {time.perf_counter() - t0:.1f}s")
+            if args.lod or has_table(conn, "frames_lod"):
+                with instrument.stage("lod_tables") as st:
+                    st.rows = sum(build_lod_tables(conn).values())
+        else:
+            missing_rtree = args.spatial and not has_table(conn, "frames_rtree")
+            missing_lod = args.lod and not has_table(conn, "frames_lod")
+            if missing_rtree:
+                with instrument.stage("spatial_index"):
+                    build_spatial_index(conn)
+            if missing_lod:
+                with instrument.stage("lod_tables") as st:
+                    st.rows = sum(build_lod_tables(conn).values())
+            if not (missing_rtree or missing_lod or backfilled):
+                print("Nothing changed since the last run.")
+                changed = False
 
         # Stats
         count = conn.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
         games = conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
         plays = conn.execute("SELECT COUNT(*) FROM plays").fetchone()[0]
+        totals.update(games=games, plays=plays, frame_rows=count)
+        conn.commit()
+        conn.close()
+
+        if changed:
+            with instrument.stage("publish"):
+                totals["published_bytes"] = publish.publish(staging, DB_PATH)["published_bytes"]
+        else:
+            save_manifest(staging, DB_PATH)
+            publish.remove_db(staging)
         print(f"\nDone! {DB_PATH}")
         print(f"  {games} games, {plays} plays, {count:,} frame rows")
     finally:
         conn.close()
+        instrument.finish(totals)
 
 
 if __name__ == "__main__":
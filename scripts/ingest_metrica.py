@@ -1,17 +1,55 @@
+"""Ingest the Metrica Sports sample game (full match, both teams) into SQLite.
 
+Usage: python scripts/ingest_metrica.py [--lod] [--profile] [--trace-memory]
+
+The raw CSVs are wide (one x/y column pair per player plus the ball); they
+are streamed CHUNK_FRAMES frames at a time, reshaped to long form with
+NumPy and batch-inserted, so memory stays bounded for a 140k-frame match.
+Velocity, speed, acceleration and heading are derived from the positions
+on the way in (see kinematics.py).
+
+The continuous match is split into possession / dead-ball segments first
+(see segment.py); each segment is its own play with frame ids from 1.
+
+--lod builds the frames_lod level-of-detail tables (see lod_tables.py).
+Every frame is replaced, so the tables derived from frames are refreshed
+at the end (see ingest.refresh_derived): events, play_catalog,
+play_payloads, frames_lod and frames_rtree are rebuilt when present, and
+the per-frame analytics (features, pitch control, beliefs, track blobs)
+are dropped for their scripts to rebuild.
+
+The run works on a snapshot of data/metapitch.db and publishes it back
+over the original when it is done (see publish.py).
+
+Per-stage timings, rows/sec and peak memory are written to
+data/metapitch.ingest_metrica.report.json (see instrument.py).
+"""
+
+import argparse
+import itertools
 import os
 import sqlite3
 import pandas as pd
 import requests
-import io
 import numpy as np
 
+import instrument
+import publish
+from ingest import refresh_derived
+from kinematics import context_frames, track_kinematics
+from lod_tables import build_lod_tables, has_lod
+from segment import describe, segment_frames
+
 # Metrica Sample Game 2
 GAME_ID = 2
-URL_HOME = "https://raw.githubusercontent.com/metrica-sports/sample-data/master/data/Sample_Game_2/Sample_Game_2_RawTrackingData_Home_Team.csv"
-URL_AWAY = "https://raw.githubusercontent.com/metrica-sports/sample-data/master/data/Sample_Game_2/Sample_Game_2_RawTrackingData_Away_Team.csv"
+URL_BASE = "https://raw.githubusercontent.com/metrica-sports/sample-data/master/data/Sample_Game_2"
+URL_HOME = f"{URL_BASE}/Sample_Game_2_RawTrackingData_Home_Team.csv"
+URL_AWAY = f"{URL_BASE}/Sample_Game_2_RawTrackingData_Away_Team.csv"
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+METRICA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "metrica")
+CHUNK_FRAMES = 10_000
+FPS = 25
 FIELD_LENGTH = 105
 FIELD_WIDTH = 68
 
@@ -21,6 +59,8 @@ def create_tables(conn: sqlite3.Connection):
         DROP TABLE IF EXISTS plays;
         DROP TABLE IF EXISTS players;
         DROP TABLE IF EXISTS games;
+        -- the BDB CSVs it describes are gone with their frames
+        DROP TABLE IF EXISTS ingest_manifest;
 
         CREATE TABLE games (
             game_id INTEGER PRIMARY KEY,
@@ -45,9 +85,12 @@ def create_tables(conn: sqlite3.Connection):
             nfl_id INTEGER, -- actually player_id
             x REAL NOT NULL,
             y REAL NOT NULL,
+            speed REAL,
+            accel REAL,
             vx REAL,
             vy REAL,
             orientation REAL,
+            direction REAL,
             team TEXT,
             jersey_number INTEGER,
             display_name TEXT,
@@ -57,24 +100,184 @@ def create_tables(conn: sqlite3.Connection):
         );
     """)
 
-def download_csv(url, filename):
-    local_path = os.path.join(os.path.dirname(__file__), "..", "data", "metrica", filename)
+def fetch_csv(url, filename):
+    """Local path of a raw tracking CSV, downloading it into data/metrica/ on first use."""
+    local_path = os.path.join(METRICA_DIR, filename)
     if os.path.exists(local_path):
         print(f"Loading local file: {local_path}")
-        with open(local_path, 'r', encoding='utf-8') as f:
-            content = f.read()
     else:
         print(f"Downloading {url}...")
         response = requests.get(url)
         response.raise_for_status()
-        content = response.content.decode('utf-8')
-        
-    return pd.read_csv(io.StringIO(content), skiprows=2)
+        os.makedirs(METRICA_DIR, exist_ok=True)
+        with open(local_path, 'wb') as f:
+            f.write(response.content)
+    return local_path
+
+def read_tracking_chunks(path):
+    """Raw tracking in bounded chunks of CHUNK_FRAMES frames (first two header rows skipped)."""
+    return instrument.timed("csv_parse", pd.read_csv(path, skiprows=2, chunksize=CHUNK_FRAMES), rows=len)
+
+def parse_entities(columns, team_name, id_offset=0, skip_ball=False):
+    """Map the wide x/y column pairs to entities.
+
+    Returns (x column indices, nfl_ids, names, teams, jerseys); the y column
+    of each entity is the one right after its x column.
+    """
+    cols, ids, names, teams, jerseys = [], [], [], [], []
+    for i in range(3, len(columns) - 1, 2):
+        col_name = columns[i]
+        if "Ball" in col_name:
+            if skip_ball:
+                continue
+            ids.append(-1)
+            names.append("Ball")
+            teams.append("ball")
+            jerseys.append(0)
+        elif col_name.startswith("Player"):
+            # Parse "Player11" or "Player 11"
+            try:
+                jersey = int(col_name.replace("Player", "").strip())
+            except ValueError:
+                continue  # Skip if no valid number
+            ids.append(jersey + id_offset)
+            names.append(col_name)
+            teams.append(team_name)
+            jerseys.append(jersey)
+        else:
+            continue
+        cols.append(i)
+    return np.array(cols), np.array(ids), np.array(names, dtype=object), np.array(teams, dtype=object), np.array(jerseys)
+
+def wide_xy(chunk, cols):
+    """(frames, entities) x and y in metres for the given x column indices."""
+    xy = chunk.iloc[:, np.concatenate([cols, cols + 1])].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    n = len(cols)
+    return xy[:, :n] * FIELD_LENGTH, xy[:, n:] * FIELD_WIDTH
+
+def to_long_form(chunk, entities):
+    """Reshape a wide chunk (frames x entity x/y pairs) into one row per visible entity."""
+    cols, ids, names, teams, jerseys = entities
+    frame_ids = chunk["Frame"].to_numpy(dtype=np.int64)
+    x, y = wide_xy(chunk, cols)
+
+    # (frames, entities) -> flat, dropping entities that are off-camera (NaN)
+    visible = ~(np.isnan(x) | np.isnan(y))
+    f_idx, e_idx = np.nonzero(visible)
+    return {
+        "frame_id": frame_ids[f_idx],
+        "nfl_id": ids[e_idx],
+        "x": x[visible],
+        "y": y[visible],
+        "team": teams[e_idx],
+        "jersey_number": jerseys[e_idx],
+        "display_name": names[e_idx],
+    }
+
+def segment_inputs(path, team_name):
+    """Per-frame inputs for segmentation from one team's file.
 
-def transform_coords(x_norm, y_norm):
-    if pd.isna(x_norm) or pd.isna(y_norm):
-        return None, None
-    return x_norm * FIELD_LENGTH, y_norm * FIELD_WIDTH
+    Returns frame ids, period, ball x/y and the distance from the ball to
+    this team's nearest player (NaN when nobody or no ball is visible).
+    """
+    parts = []
+    entities = None
+    for chunk in read_tracking_chunks(path):
+        if entities is None:
+            entities = parse_entities(list(chunk.columns), team_name)
+            is_ball = entities[1] == -1
+        x, y = wide_xy(chunk, entities[0])
+        bx = x[:, is_ball][:, 0] if is_ball.any() else np.full(len(x), np.nan)
+        by = y[:, is_ball][:, 0] if is_ball.any() else np.full(len(x), np.nan)
+        dist = np.hypot(x[:, ~is_ball] - bx[:, None], y[:, ~is_ball] - by[:, None])
+        nearest = np.where(np.isnan(dist).all(axis=1), np.nan, np.fmin.reduce(dist, axis=1))
+        parts.append((chunk["Frame"].to_numpy(dtype=np.int64), chunk["Period"].to_numpy(dtype=np.int64),
+                      bx, by, nearest))
+    return [np.concatenate(col) for col in zip(*parts)]
+
+def segment_match(conn, path_home, path_away):
+    """Split the match into plays; returns (play_of, first_frame_of) indexed by raw frame id."""
+    frame_ids, period, bx, by, home_dist = segment_inputs(path_home, "home")
+    away_frames, _, _, _, away_dist = segment_inputs(path_away, "away")
+    # Both files cover the same frames; align defensively on the frame id
+    away_dist = pd.Series(away_dist, index=away_frames).reindex(frame_ids).to_numpy()
+
+    segments = segment_frames(bx, by, home_dist, away_dist, period, FPS)
+    play_of = np.zeros(frame_ids.max() + 1, dtype=np.int64)
+    first_frame_of = np.zeros(frame_ids.max() + 1, dtype=np.int64)
+    rows = []
+    for play_id, (s, e, phase) in enumerate(segments, start=1):
+        play_of[frame_ids[s]:frame_ids[e] + 1] = play_id
+        first_frame_of[frame_ids[s]:frame_ids[e] + 1] = frame_ids[s]
+        desc = describe(phase, int(period[s]), (frame_ids[s] - 1) / FPS, frame_ids[e] / FPS)
+        rows.append((GAME_ID, play_id, desc, e - s + 1))
+    conn.executemany(
+        "INSERT INTO plays (game_id, play_id, description, frame_count) VALUES (?, ?, ?, ?)", rows
+    )
+    print(f"  {len(rows)} segments")
+    return play_of, first_frame_of
+
+def insert_long_form(conn, rows, play_index):
+    """play_index is segment_match's (play_of, first_frame_of); frame ids restart at 1 per play."""
+    play_of, first_frame_of = play_index
+    n = len(rows["frame_id"])
+    with instrument.stage("insert_frames", n):
+        conn.executemany(
+            """INSERT OR IGNORE INTO frames (game_id, play_id, frame_id, nfl_id, x, y, speed, accel, vx, vy,
+                                             orientation, direction, team, jersey_number, display_name)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            zip(
+                itertools.repeat(GAME_ID, n), play_of[rows["frame_id"]].tolist(),
+                (rows["frame_id"] - first_frame_of[rows["frame_id"]] + 1).tolist(), rows["nfl_id"].tolist(),
+                rows["x"].tolist(), rows["y"].tolist(),
+                rows["speed"].tolist(), rows["accel"].tolist(),
+                rows["vx"].tolist(), rows["vy"].tolist(),
+                itertools.repeat(0, n), rows["direction"].tolist(),
+                rows["team"].tolist(), rows["jersey_number"].tolist(), rows["display_name"].tolist(),
+            ),
+        )
+    return n
+
+def long_form_with_kinematics(buf, entities, after, upto):
+    """Long-form rows of buf with kinematics, keeping only after < frame_id <= upto."""
+    with instrument.stage("long_form", len(buf)):
+        rows = to_long_form(buf, entities)
+    with instrument.stage("kinematics", len(rows["frame_id"])):
+        rows.update(track_kinematics(rows["nfl_id"], rows["frame_id"], rows["x"], rows["y"],
+                                     rows["nfl_id"] == -1, FPS))
+    keep = (rows["frame_id"] > after) & (rows["frame_id"] <= upto)
+    return {k: v[keep] for k, v in rows.items()}
+
+def process_team(conn, path, play_index, team_name, id_offset=0, skip_ball=False):
+    """Stream one team's file into frames. Returns the number of rows.
+
+    Kinematics need frames on both sides, so each chunk is processed together
+    with the last 2 * context_frames(FPS) frames of the previous one and rows
+    are written once their right-hand context has been read.
+    """
+    ctx = context_frames(FPS)
+    total_rows = 0
+    entities = None
+    buf = None
+    written = -1
+    for chunk in read_tracking_chunks(path):
+        if entities is None:
+            entities = parse_entities(list(chunk.columns), team_name, id_offset, skip_ball)
+            print(f"  {len(entities[0])} tracked entities for {team_name}")
+        buf = chunk if buf is None else pd.concat([buf, chunk])
+        frames = buf["Frame"].to_numpy()
+        upto = int(frames[-1]) - ctx
+        total_rows += insert_long_form(conn, long_form_with_kinematics(buf, entities, written, upto), play_index)
+        written = upto
+        buf = buf[frames > upto - ctx]
+        conn.commit()
+
+    if buf is not None:
+        last_frame = int(buf["Frame"].max())
+        total_rows += insert_long_form(conn, long_form_with_kinematics(buf, entities, written, last_frame), play_index)
+        conn.commit()
+    print(f"  {total_rows:,} rows")
+    return total_rows
 
 def ingest_metrica(conn):
     # 1. Initialize Tables (Schema)
@@ -85,73 +288,60 @@ def ingest_metrica(conn):
         "INSERT INTO games (game_id, home_team, away_team, game_date, stadium) VALUES (?, ?, ?, ?, ?)",
         (GAME_ID, "Home (Red)", "Away (Blue)", "2020-01-01", "Metrica Stadium")
     )
-    
-    # 3. Insert Play
-    conn.execute(
-        "INSERT INTO plays (game_id, play_id, description, frame_count) VALUES (?, ?, ?, ?)",
-        (GAME_ID, 1, "Full Match Segment (Metrica Game 2)", 2000)
-    )
 
-    # 4. Process Tracking Data
-    df_home = download_csv(URL_HOME, "Sample_Game_2_RawTrackingData_Home_Team.csv")
-    df_away = download_csv(URL_AWAY, "Sample_Game_2_RawTrackingData_Away_Team.csv")
-    
-    def process_team(df, team_name, id_offset=0, skip_ball=False):
-        df = df.drop(0)
-        print(f"DEBUG: Columns for {team_name}: {list(df.columns[:10])}...")
-        
-        for idx, row in df.head(2000).iterrows():
-            frame_id = int(row[1])
-            cols = df.columns
-            for i in range(3, len(cols), 2):
-                col_name = cols[i]
-                if "Ball" in col_name:
-                    if skip_ball: continue
-                    nfl_id = -1
-                    name = "Ball"
-                    team = "ball"
-                    jersey = 0
-                else:
-                    # Parse "Player11" or "Player 11"
-                    if col_name.startswith("Player"):
-                        try:
-                            # Remove "Player" and strip spaces to get jersey number
-                            jersey_str = col_name.replace("Player", "").strip()
-                            jersey = int(jersey_str)
-                            nfl_id = jersey + id_offset
-                            name = col_name
-                            team = team_name
-                        except ValueError:
-                            continue # Skip if no valid number
-                    else:
-                        continue
-                
-                x_raw = row.iloc[i]
-                y_raw = row.iloc[i+1]
-                
-                x, y = transform_coords(pd.to_numeric(x_raw, errors='coerce'), pd.to_numeric(y_raw, errors='coerce'))
-                
-                if x is not None:
-                     conn.execute(
-                        """INSERT OR IGNORE INTO frames (game_id, play_id, frame_id, nfl_id, x, y, vx, vy, orientation, team, jersey_number, display_name) 
-                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                        (GAME_ID, 1, frame_id, nfl_id, x, y, 0, 0, 0, team, jersey, name)
-                    )
-    
+    # 3. Fetch Tracking Data (processed one chunk of frames at a time)
+    path_home = fetch_csv(URL_HOME, "Sample_Game_2_RawTrackingData_Home_Team.csv")
+    path_away = fetch_csv(URL_AWAY, "Sample_Game_2_RawTrackingData_Away_Team.csv")
+
+    # 4. Insert Plays: one per possession / dead-ball segment
+    print("Segmenting match...")
+    with instrument.stage("segment"):
+        play_index = segment_match(conn, path_home, path_away)
+
     print("Ingesting Home Team...")
-    process_team(df_home, "home", id_offset=0, skip_ball=False)
+    with instrument.stage("team_home") as st:
+        st.rows = process_team(conn, path_home, play_index, "home", id_offset=0, skip_ball=False)
     print("Ingesting Away Team...")
-    process_team(df_away, "away", id_offset=100, skip_ball=True) # Skip ball for away to avoid duplicates
-    
+    with instrument.stage("team_away") as st:
+        # The ball is in both files: take it from the home one only
+        st.rows = process_team(conn, path_away, play_index, "away", id_offset=100, skip_ball=True)
+
     conn.commit()
     print("Ingestion Complete.")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lod", action="store_true",
+                        help="build the frames_lod level-of-detail tables")
+    instrument.add_arguments(parser)
+    return parser.parse_args()
+
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    args = parse_args()
+    instrument.start("ingest_metrica", DB_PATH, args)
+    totals = {}
+    staging = publish.start_build(DB_PATH)
     try:
-        ingest_metrica(conn)
+        conn = sqlite3.connect(staging)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        try:
+            ingest_metrica(conn)
+            # create_tables replaced every frame, so stale derived tables would lie
+            refresh_derived(conn)
+            if args.lod and not has_lod(conn):
+                with instrument.stage("lod_tables") as st:
+                    st.rows = sum(build_lod_tables(conn).values())
+            totals["plays"] = conn.execute(
+                "SELECT COUNT(*) FROM plays WHERE game_id = ?", (GAME_ID,)).fetchone()[0]
+            totals["frame_rows"] = conn.execute(
+                "SELECT COUNT(*) FROM frames WHERE game_id = ?", (GAME_ID,)).fetchone()[0]
+        finally:
+            conn.close()
+        with instrument.stage("publish"):
+            publish.publish(staging, DB_PATH)
     finally:
-        conn.close()
+        instrument.finish(totals)
 
 if __name__ == "__main__":
     main()
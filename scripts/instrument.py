@@ -0,0 +1,281 @@
+"""Per-stage wall time, row rates and peak memory for the ingest scripts.
+
+Usage (inside ingest.py, ingest_metrica.py, mock_soccer.py):
+
+    instrument.add_arguments(parser)          # --profile, --trace-memory
+    instrument.start("ingest", DB_PATH, args)
+    with instrument.stage("backfill") as st:
+        st.rows = ...
+    for chunk in instrument.timed("csv_parse", reader, rows=len):
+        ...
+    instrument.finish(totals)                 # also from a finally: block
+
+Stages are flat names; one that runs many times (per chunk, per week) is
+accumulated into a single entry with its call count. Peak memory per stage
+is the process's RSS high-water mark (VmHWM, reset at every stage entry
+through /proc/self/clear_refs on Linux; otherwise the running ru_maxrss),
+and, with --trace-memory, the tracemalloc peak of Python allocations plus
+the top allocation sites live at the highest stage exit. --profile runs the
+whole script under cProfile and dumps the stats next to the report.
+
+finish() writes <db>.<script>.report.json next to the DB (for example
+data/metapitch.ingest.report.json). Until start() is called every hook is
+a no-op, so the instrumented functions also run unchanged in worker
+processes and from other scripts.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+TOP_ALLOCATIONS = 15
+TOP_PROFILE = 15
+SNAPSHOT_GROWTH = 1.25  # re-snapshot only once live traced memory grew this much
+
+_report = None
+
+
+class Stage:
+    """Accumulated measurements of one named stage."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.rows = 0
+        self.peak_rss_kb = 0
+        self.traced_peak = 0
+
+    def as_dict(self, traced: bool) -> dict:
+        out = {
+            "seconds": round(self.seconds, 4),
+            "calls": self.calls,
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows / self.seconds, 1) if self.rows and self.seconds else None,
+            "peak_rss_mb": round(self.peak_rss_kb / 1024, 1),
+        }
+        if traced:
+            out["traced_peak_mb"] = round(self.traced_peak / 2**20, 1)
+        return out
+
+
+class _Entry:
+    """What a `with stage(...)` block sees; set .rows to record throughput.
+
+    After the block, .peak_rss_kb holds the stage's peak so far.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.peak_rss_kb = 0
+
+
+def _rss_hwm_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _reset_rss_hwm():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def add_arguments(parser):
+    parser.add_argument("--profile", action="store_true",
+                        help="run under cProfile and dump the stats next to the report")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="track Python allocations with tracemalloc (slower)")
+
+
+def start(script: str, db_path: str, args=None):
+    """Begin recording. args may carry .profile / .trace_memory (see add_arguments)."""
+    global _report
+    base = os.path.splitext(db_path)[0]
+    _report = {
+        "script": script,
+        "db": os.path.abspath(db_path),
+        "path": f"{base}.{script}.report.json",
+        "profile_path": f"{base}.{script}.prof",
+        "argv": sys.argv[1:],
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "t0": time.perf_counter(),
+        "stages": {},
+        "open": [],
+        "trace_memory": bool(getattr(args, "trace_memory", False)),
+        "profiler": None,
+        "snapshot": None,
+        "snapshot_current": 0,
+    }
+    if _report["trace_memory"]:
+        tracemalloc.start()
+    if getattr(args, "profile", False):
+        _report["profiler"] = cProfile.Profile()
+        _report["profiler"].enable()
+
+
+def _record_peaks():
+    """Fold the current high-water marks into every open stage, then reset them."""
+    rss = _rss_hwm_kb()
+    traced = tracemalloc.get_traced_memory()[1] if _report["trace_memory"] else 0
+    for st in _report["open"]:
+        st.peak_rss_kb = max(st.peak_rss_kb, rss)
+        st.traced_peak = max(st.traced_peak, traced)
+    _reset_rss_hwm()
+    if _report["trace_memory"]:
+        tracemalloc.reset_peak()
+
+
+def _snapshot_if_highest():
+    # Grouping the traces is the slow part, so that waits for finish()
+    current = tracemalloc.get_traced_memory()[0]
+    if current > _report["snapshot_current"] * SNAPSHOT_GROWTH:
+        _report["snapshot_current"] = current
+        _report["snapshot"] = tracemalloc.take_snapshot()
+
+
+def _top_allocations(snapshot) -> list:
+    if snapshot is None:
+        return []
+    stats = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics("lineno")
+    return [
+        {"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+         "size_mb": round(s.size / 2**20, 2), "count": s.count}
+        for s in stats[:TOP_ALLOCATIONS]
+    ]
+
+
+@contextmanager
+def stage(name: str, rows: int = 0):
+    """Time the block as stage `name`; rows (or entry.rows set inside) feed rows/sec."""
+    entry = _Entry()
+    entry.rows = rows
+    if _report is None:
+        yield entry
+        return
+    st = _report["stages"].setdefault(name, Stage())
+    _record_peaks()
+    _report["open"].append(st)
+    t0 = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        st.seconds += time.perf_counter() - t0
+        st.calls += 1
+        st.rows += entry.rows
+        _record_peaks()
+        entry.peak_rss_kb = st.peak_rss_kb
+        _report["open"].remove(st)
+        if _report["trace_memory"]:
+            _snapshot_if_highest()
+
+
+_END = object()
+
+
+def timed(name: str, iterable, rows=None):
+    """Yield from iterable, timing each next() as stage `name`; rows(item) counts rows."""
+    it = iter(iterable)
+    while True:
+        with stage(name) as st:
+            item = next(it, _END)
+            if item is not _END and rows is not None:
+                st.rows = rows(item)
+        if item is _END:
+            return
+        yield item
+
+
+def add_stage(name: str, seconds: float, rows: int = 0, peak_rss_kb: int = 0):
+    """Record work measured elsewhere, e.g. in a worker process."""
+    if _report is None:
+        return
+    st = _report["stages"].setdefault(name, Stage())
+    st.seconds += seconds
+    st.calls += 1
+    st.rows += rows
+    st.peak_rss_kb = max(st.peak_rss_kb, peak_rss_kb)
+
+
+def rss_kb() -> int:
+    """This process's current RSS (the high-water mark where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss_kb() -> int:
+    """This process's RSS high-water mark, for workers reporting back through add_stage."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def finish(totals: dict = None) -> str:
+    """Write the JSON report (and profile) and print a stage summary. Returns the report path."""
+    global _report
+    if _report is None:
+        return None
+    rep, _report = _report, None
+    wall = time.perf_counter() - rep["t0"]
+    error = sys.exc_info()[1]
+
+    profile_path = None
+    if rep["profiler"] is not None:
+        rep["profiler"].disable()
+        rep["profiler"].dump_stats(rep["profile_path"])
+        profile_path = rep["profile_path"]
+
+    stages = {name: st.as_dict(rep["trace_memory"]) for name, st in rep["stages"].items()}
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    report = {
+        "script": rep["script"],
+        "db": rep["db"],
+        "argv": rep["argv"],
+        "started": rep["started"],
+        "status": "ok" if error is None else f"failed: {type(error).__name__}: {error}",
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "children_peak_rss_mb": round(children.ru_maxrss / 1024, 1),
+        "stages": stages,
+        "totals": totals or {},
+        "profile": profile_path,
+    }
+    if rep["trace_memory"]:
+        report["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+        report["top_allocations"] = _top_allocations(rep["snapshot"])
+
+    with open(rep["path"], "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("\nStages:")
+    for name, st in stages.items():
+        rate = f"{st['rows_per_sec']:>12,.0f} rows/s" if st["rows_per_sec"] else " " * 19
+        print(f"  {name:<24}{st['seconds']:>9.2f}s {st['calls']:>6}x {st['rows']:>13,} rows "
+              f"{rate}  peak {st['peak_rss_mb']:,.0f} MB")
+    if rep["trace_memory"]:
+        print("Top allocations (at the highest stage exit):")
+        for a in report["top_allocations"][:5]:
+            print(f"  {a['size_mb']:>8.1f} MB  {a['count']:>9,}  {a['where']}")
+    if profile_path:
+        print(f"Profile: {profile_path} (top {TOP_PROFILE} by cumulative time)")
+        pstats.Stats(profile_path, stream=sys.stdout).sort_stats("cumulative").print_stats(TOP_PROFILE)
+    print(f"Report: {rep['path']}")
+    return rep["path"]
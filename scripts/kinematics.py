@@ -0,0 +1,181 @@
+"""Derive velocity, speed, acceleration and heading from tracked positions.
+
+Usage: python scripts/kinematics.py --fps 25 [--game-id N]
+
+Sources like Metrica and the mock generator only record positions. This
+stage fills the frames columns vx, vy, speed, accel and direction for
+every (game, play, player) track, all tracks at once in NumPy:
+
+  1. a track is split into segments wherever a frame is missing (player
+     off camera, ball out of play), so nothing is differenced across a gap;
+  2. positions get a centred moving average within each segment (a shorter
+     window for the ball, which changes velocity abruptly on every touch);
+  3. velocity and acceleration are central differences of the smoothed
+     series, falling back to one-sided differences at segment edges.
+
+Ingest scripts call track_kinematics on rows before inserting them; with
+context_frames of overlap on each side a long match can be processed a
+window at a time with the same result (up to float rounding).
+add_kinematics updates an existing DB in place; the CLI runs it on a
+staging copy that is published over the DB (see publish.py).
+
+direction follows ingest.py's convention: vx = s*cos(dir), vy = s*sin(dir).
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import publish
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+PLAYER_SMOOTHING_S = 0.3
+BALL_SMOOTHING_S = 0.12
+
+
+def window_frames(seconds: float, fps: float) -> int:
+    """Odd moving-average window length covering `seconds`."""
+    w = max(1, int(round(seconds * fps)))
+    return w if w % 2 else w + 1
+
+
+def segment_bounds(track: np.ndarray, frame_id: np.ndarray):
+    """Per-row (first, last) row index of its gap-free segment. Rows sorted by (track, frame)."""
+    n = len(track)
+    brk = np.ones(n, dtype=bool)
+    brk[1:] = (track[1:] != track[:-1]) | (frame_id[1:] - frame_id[:-1] != 1)
+    seg = np.cumsum(brk) - 1
+    starts = np.flatnonzero(brk)
+    ends = np.append(starts[1:] - 1, n - 1)
+    return starts[seg], ends[seg]
+
+
+def moving_average(values: np.ndarray, first: np.ndarray, last: np.ndarray, half: np.ndarray) -> np.ndarray:
+    """Centred mean over [i - h, i + h] with h shrunk near segment edges.
+
+    Keeping the window symmetric means straight-line motion passes through
+    unchanged instead of being pulled inwards at the ends of a segment.
+    """
+    idx = np.arange(len(values))
+    h = np.minimum(half, np.minimum(idx - first, last - idx))
+    lo = idx - h
+    hi = idx + h
+    cs = np.concatenate([[0.0], np.cumsum(values)])
+    return (cs[hi + 1] - cs[lo]) / (hi - lo + 1)
+
+
+def derivative(values: np.ndarray, first: np.ndarray, last: np.ndarray, dt: float) -> np.ndarray:
+    """Central difference within the segment; 0 for single-frame segments."""
+    idx = np.arange(len(values))
+    lo = np.maximum(idx - 1, first)
+    hi = np.minimum(idx + 1, last)
+    span = hi - lo
+    out = np.zeros(len(values))
+    ok = span > 0
+    out[ok] = (values[hi[ok]] - values[lo[ok]]) / (span[ok] * dt)
+    return out
+
+
+def context_frames(fps: float) -> int:
+    """Frames of context needed on each side of a frame for its values to be exact.
+
+    Smooth -> difference -> smooth -> difference reaches 2*half + 2 frames,
+    plus half more because the symmetric window shrinks near a cut edge.
+    """
+    half = max(window_frames(PLAYER_SMOOTHING_S, fps), window_frames(BALL_SMOOTHING_S, fps)) // 2
+    return 3 * half + 3
+
+
+def track_kinematics(track: np.ndarray, frame_id: np.ndarray, x: np.ndarray, y: np.ndarray,
+                     is_ball: np.ndarray, fps: float) -> dict:
+    """vx, vy, speed, accel, direction for rows in any order, returned in input order.
+
+    `track` is any integer id that is unique per (game, play, player).
+    """
+    order = np.lexsort((frame_id, track))
+    first, last = segment_bounds(track[order], frame_id[order])
+    half = np.where(is_ball[order], window_frames(BALL_SMOOTHING_S, fps),
+                    window_frames(PLAYER_SMOOTHING_S, fps)) // 2
+
+    dt = 1.0 / fps
+    xs = moving_average(np.asarray(x, dtype=np.float64)[order], first, last, half)
+    ys = moving_average(np.asarray(y, dtype=np.float64)[order], first, last, half)
+    vx = derivative(xs, first, last, dt)
+    vy = derivative(ys, first, last, dt)
+    ax = derivative(moving_average(vx, first, last, half), first, last, dt)
+    ay = derivative(moving_average(vy, first, last, half), first, last, dt)
+
+    sorted_cols = {
+        "vx": vx.round(2),
+        "vy": vy.round(2),
+        "speed": np.hypot(vx, vy).round(2),
+        "accel": np.hypot(ax, ay).round(2),
+        "direction": (np.degrees(np.arctan2(vy, vx)) % 360.0).round(2),
+    }
+    out = {}
+    for name, values in sorted_cols.items():
+        out[name] = np.empty_like(values)
+        out[name][order] = values
+    return out
+
+
+def compute_kinematics(df: pd.DataFrame, fps: float) -> pd.DataFrame:
+    """df has game_id, play_id, nfl_id, frame_id, x, y; adds vx, vy, speed, accel, direction."""
+    track = df.groupby(["game_id", "play_id", "nfl_id"], sort=False).ngroup().to_numpy()
+    cols = track_kinematics(track, df["frame_id"].to_numpy(), df["x"].to_numpy(), df["y"].to_numpy(),
+                            (df["nfl_id"] == -1).to_numpy(), fps)
+    return df.assign(**cols)
+
+
+def add_kinematics(conn: sqlite3.Connection, fps: float, game_id: int = None) -> int:
+    """Compute kinematics for one game (or all) and write them back by key.
+
+    Not by rowid: a DB published by publish.py keeps frames WITHOUT ROWID.
+    """
+    where = "WHERE game_id = ?" if game_id is not None else ""
+    params = (game_id,) if game_id is not None else ()
+    df = pd.read_sql(f"SELECT game_id, play_id, nfl_id, frame_id, x, y FROM frames {where}",
+                     conn, params=params)
+    if df.empty:
+        return 0
+
+    df = compute_kinematics(df, fps)
+    conn.executemany(
+        """UPDATE frames SET vx = ?, vy = ?, speed = ?, accel = ?, direction = ?
+           WHERE game_id = ? AND play_id = ? AND frame_id = ? AND nfl_id = ?""",
+        zip(df["vx"].tolist(), df["vy"].tolist(), df["speed"].tolist(),
+            df["accel"].tolist(), df["direction"].tolist(), df["game_id"].tolist(),
+            df["play_id"].tolist(), df["frame_id"].tolist(), df["nfl_id"].tolist()),
+    )
+    conn.commit()
+    return len(df)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fps", type=float, required=True, help="tracking frame rate (Metrica 25, mock 10)")
+    parser.add_argument("--game-id", type=int, help="only this game")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    staging = publish.start_build(DB_PATH)
+    conn = sqlite3.connect(staging)
+    try:
+        print("Computing kinematics...")
+        t0 = time.perf_counter()
+        rows = add_kinematics(conn, args.fps, args.game_id)
+        print(f"  {rows:,} rows in {time.perf_counter() - t0:.1f}s")
+    finally:
+        conn.close()
+    publish.publish(staging, DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
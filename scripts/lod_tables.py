@@ -0,0 +1,289 @@
+"""Downsampled level-of-detail copies of frames for overviews and scrubbing.
+
+Usage: python scripts/lod_tables.py [--build]
+       python scripts/lod_tables.py --game-id 2 [--play-id 5] [--frames 1 3000] [--max-points 20000]
+
+frames_lod holds every play at coarser strides (LOD_STRIDES source frames
+per LOD frame: 2 Hz and 0.5 Hz for the 10 Hz sources, 5 Hz and 1.25 Hz for
+25 Hz Metrica). One row per (stride, game, play, bucket, entity):
+
+  frame_id   first source frame of the bucket
+  x, y       mean position over the bucket
+  vx, vy     mean velocity (NULL when no source row had one)
+  samples    number of source frames averaged
+  event      every distinct event of the entity's rows in the bucket, in
+             frame order, comma-separated, so no pass or tackle is lost
+
+lod_frames() picks the finest level whose estimated row count for the
+requested play(s) and frame range fits a point budget, so a whole-match
+overview reads a few percent of the rows frames would return. Stride 1
+means the raw frames table.
+
+Like frames_rtree the table is rebuilt as a whole: ingest.py and
+ingest_metrica.py do that after every run that changed frames once it
+exists (or with --lod), and --build here does it on demand, on a staging
+copy that is published over the DB (see publish.py).
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+import publish
+from play_payloads import frame_rows, frames_layout
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+LOD_STRIDES = (5, 20)
+DEFAULT_MAX_POINTS = 20_000
+
+RAW_SELECT = {
+    "text": "SELECT game_id, play_id, frame_id, nfl_id, x, y, event FROM frames f",
+    "compact": """
+        SELECT f.game_id, f.play_id, f.frame_id, f.nfl_id, f.x, f.y, e.name FROM frames f
+        LEFT JOIN lookup_events e ON e.id = f.event_id
+    """,
+}
+
+
+def create_lod_table(conn: sqlite3.Connection):
+    conn.executescript("""
+        DROP TABLE IF EXISTS frames_lod;
+        CREATE TABLE frames_lod (
+            stride INTEGER NOT NULL,
+            game_id INTEGER NOT NULL,
+            play_id INTEGER NOT NULL,
+            frame_id INTEGER NOT NULL,
+            nfl_id INTEGER NOT NULL,
+            x REAL NOT NULL,
+            y REAL NOT NULL,
+            vx REAL,
+            vy REAL,
+            samples INTEGER NOT NULL,
+            event TEXT,
+            PRIMARY KEY (stride, game_id, play_id, frame_id, nfl_id)
+        );
+    """)
+
+
+def downsample(frame_id, nfl_id, x, y, vx, vy, events: dict, stride: int) -> dict:
+    """Bucket one play's rows by `stride` frames per entity.
+
+    events maps row index -> event name for the (few) rows that have one.
+    """
+    bucket = (frame_id - 1) // stride * stride + 1
+    order = np.lexsort((frame_id, nfl_id, bucket))
+    b, n = bucket[order], nfl_id[order]
+    brk = np.ones(len(order), dtype=bool)
+    brk[1:] = (b[1:] != b[:-1]) | (n[1:] != n[:-1])
+    starts = np.flatnonzero(brk)
+    samples = np.diff(np.append(starts, len(order)))
+
+    def mean(values):
+        v = values[order]
+        has = ~np.isnan(v)
+        count = np.add.reduceat(has.astype(np.int64), starts)
+        total = np.add.reduceat(np.where(has, v, 0.0), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+    group_events = [None] * len(starts)
+    if events:
+        group_of = np.cumsum(brk) - 1
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        # Sorted by (bucket, entity, frame), so each group's events arrive in frame order
+        for r in sorted(rank[i] for i in events):
+            name = events[int(order[r])]
+            g = group_of[r]
+            if group_events[g] is None:
+                group_events[g] = [name]
+            elif name not in group_events[g]:
+                group_events[g].append(name)
+    return {
+        "frame_id": b[starts],
+        "nfl_id": n[starts],
+        "x": mean(x).round(2),
+        "y": mean(y).round(2),
+        "vx": mean(vx).round(2),
+        "vy": mean(vy).round(2),
+        "samples": samples,
+        "event": [None if e is None else ",".join(e) for e in group_events],
+    }
+
+
+def write_lod(conn: sqlite3.Connection, stride: int, game_id: int, play_id: int, cols: dict) -> int:
+    def nullable(values):
+        return [None if v != v else v for v in values.tolist()]
+
+    n = len(cols["frame_id"])
+    conn.executemany(
+        "INSERT INTO frames_lod VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        zip(itertools.repeat(stride, n), itertools.repeat(game_id, n), itertools.repeat(play_id, n),
+            cols["frame_id"].tolist(), cols["nfl_id"].tolist(), cols["x"].tolist(), cols["y"].tolist(),
+            nullable(cols["vx"]), nullable(cols["vy"]), cols["samples"].tolist(), cols["event"]),
+    )
+    return n
+
+
+def build_lod_tables(conn: sqlite3.Connection) -> dict:
+    """(Re)build frames_lod from frames in one streaming pass. Returns {stride: rows}."""
+    print("Building LOD tables...")
+    t0 = time.perf_counter()
+    create_lod_table(conn)
+    written = dict.fromkeys(LOD_STRIDES, 0)
+    source_rows = 0
+    for (game_id, play_id), rows in itertools.groupby(frame_rows(conn), key=lambda r: (r[0], r[1])):
+        rows = list(rows)
+        source_rows += len(rows)
+        cols = list(zip(*rows))
+        frame_id = np.array(cols[2], dtype=np.int64)
+        nfl_id = np.array([-1 if i is None else i for i in cols[3]], dtype=np.int64)
+        x = np.array(cols[4], dtype=np.float64)
+        y = np.array(cols[5], dtype=np.float64)
+        vx = np.array(cols[6], dtype=np.float64)  # None -> nan
+        vy = np.array(cols[7], dtype=np.float64)
+        events = {i: e for i, e in enumerate(cols[12]) if e}
+        for stride in LOD_STRIDES:
+            lod = downsample(frame_id, nfl_id, x, y, vx, vy, events, stride)
+            written[stride] += write_lod(conn, stride, game_id, play_id, lod)
+    conn.commit()
+    for stride, rows in written.items():
+        share = rows / source_rows if source_rows else 0
+        print(f"  stride {stride}: {rows:,} rows ({share:.1%} of {source_rows:,})")
+    print(f"  {time.perf_counter() - t0:.1f}s")
+    return written
+
+
+def has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def has_lod(conn: sqlite3.Connection) -> bool:
+    return has_table(conn, "frames_lod")
+
+
+def estimate_points(conn: sqlite3.Connection, game_id: int, play_id: int = None,
+                    frame_min: int = None, frame_max: int = None) -> int:
+    """Raw frame rows the request would touch: per play, its frames in range
+    (plays.frame_count) times its entities, players plus the ball, from
+    play_catalog, or counted over the range in frames without one."""
+    sql = "SELECT play_id, frame_count FROM plays WHERE game_id = ? AND frame_count > 0"
+    params = [game_id]
+    if play_id is not None:
+        sql += " AND play_id = ?"
+        params.append(play_id)
+    plays = conn.execute(sql + " ORDER BY play_id", params).fetchall()
+    catalog = has_table(conn, "play_catalog")
+    lo = 1 if frame_min is None else max(1, frame_min)
+    points = 0
+    for pid, count in plays:
+        hi = min(count, frame_max or count)
+        if hi < lo:
+            continue
+        row = None
+        if catalog:
+            row = conn.execute(
+                "SELECT player_count + (ball_min_x IS NOT NULL) FROM play_catalog WHERE game_id = ? AND play_id = ?",
+                (game_id, pid),
+            ).fetchone()
+        if row is None:
+            row = conn.execute(
+                """SELECT COUNT(DISTINCT IFNULL(nfl_id, -1)) FROM frames
+                   WHERE game_id = ? AND play_id = ? AND frame_id BETWEEN ? AND ?""",
+                (game_id, pid, lo, hi),
+            ).fetchone()
+        points += (hi - lo + 1) * row[0]
+    return points
+
+
+def pick_stride(points: int, max_points: int, strides=LOD_STRIDES) -> int:
+    """Finest stride (1 = raw) whose row count fits the budget; the coarsest one otherwise."""
+    for stride in (1, *strides):
+        if points / stride <= max_points:
+            return stride
+    return strides[-1]
+
+
+def lod_frames(conn: sqlite3.Connection, game_id: int, play_id: int = None,
+               frame_min: int = None, frame_max: int = None,
+               max_points: int = DEFAULT_MAX_POINTS) -> tuple:
+    """(stride, rows) for a play, or a whole game when play_id is None.
+
+    rows are (game_id, play_id, frame_id, nfl_id, x, y, event) ordered by
+    play, frame and entity; frame_min/frame_max bound frame_id within each
+    play. At stride > 1 frame_id is the bucket's first frame and x/y are
+    bucket means.
+    """
+    points = estimate_points(conn, game_id, play_id, frame_min, frame_max)
+    stride = pick_stride(points, max_points) if has_lod(conn) else 1
+
+    conds = ["f.game_id = ?"]
+    params = [game_id]
+    if play_id is not None:
+        conds.append("f.play_id = ?")
+        params.append(play_id)
+    if frame_min is not None:
+        # A bucket overlapping the range starts at most stride - 1 frames before it
+        conds.append("f.frame_id >= ?")
+        params.append(frame_min - (stride - 1))
+    if frame_max is not None:
+        conds.append("f.frame_id <= ?")
+        params.append(frame_max)
+    where = " AND ".join(conds)
+    if stride == 1:
+        sql = f"{RAW_SELECT[frames_layout(conn)]} WHERE {where}"
+    else:
+        sql = f"SELECT game_id, play_id, frame_id, nfl_id, x, y, event FROM frames_lod f WHERE f.stride = ? AND {where}"
+        params.insert(0, stride)
+    rows = conn.execute(sql + " ORDER BY f.play_id, f.frame_id, f.nfl_id", params).fetchall()
+    return stride, rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--build", action="store_true", help="(re)build frames_lod")
+    parser.add_argument("--game-id", type=int)
+    parser.add_argument("--play-id", type=int)
+    parser.add_argument("--frames", type=int, nargs=2, metavar=("FIRST", "LAST"))
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.build:
+        staging = publish.start_build(DB_PATH)
+        conn = sqlite3.connect(staging)
+        try:
+            build_lod_tables(conn)
+        finally:
+            conn.close()
+        publish.publish(staging, DB_PATH)
+    if args.game_id is None:
+        return
+
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        first, last = args.frames or (None, None)
+        t0 = time.perf_counter()
+        stride, rows = lod_frames(conn, args.game_id, args.play_id, first, last, args.max_points)
+        ms = (time.perf_counter() - t0) * 1000
+        points = estimate_points(conn, args.game_id, args.play_id, first, last)
+        print(f"stride {stride}: {len(rows):,} rows in {ms:.1f} ms (~{points:,} raw rows in range)")
+        for row in rows[:10]:
+            print(f"  {row}")
+        if len(rows) > 10:
+            print(f"  ... {len(rows) - 10:,} more")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,49 @@
 """Generates mock Soccer/Blue Lock data into SQLite (data/metapitch.db).
 
 Usage: python scripts/mock_soccer.py
+       python scripts/mock_soccer.py --games 1000 --plays-per-game 20 --frames 300 --seed 7
+
+Without --games the DB is recreated with the hand-written Isagi scenario.
+With --games, synthetic matches for load testing are appended to (a
+snapshot of) the existing tables (game ids continue after the current maximum;
+columns missing from an older frames table are added, and a --compact
+frames table gets lookup codes instead of strings): 22 players
+in 4-4-2 blocks plus the ball at 10 Hz, players steered towards moving
+formation anchors with capped acceleration and speed, and the ball passed
+between players (sometimes intercepted). Everything is simulated with
+NumPy over a batch of plays x players at once, and the tables derived
+from frames are filled in for the new games afterwards (see
+ingest.refresh_derived); other games' rows are left alone.
+Either way the DB is built in a staging file and published over
+data/metapitch.db at the end (see publish.py).
+
+Per-stage timings, rows/sec and peak memory are written to
+data/metapitch.mock_soccer.report.json (see instrument.py); --profile and
+--trace-memory add a cProfile dump and tracemalloc allocation sites.
 """
 
+import argparse
+import itertools
 import os
 import sqlite3
+import time
 import numpy as np
 
+import instrument
+import publish
+from ingest import LOOKUPS, refresh_derived
+from kinematics import add_kinematics
+from play_payloads import frames_layout
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+FPS = 10
+
+# frames columns added since the first DBs were written; ALTERed into an older table
+ADDED_FRAME_COLUMNS = [("speed", "REAL"), ("accel", "REAL"), ("orientation", "REAL"),
+                       ("direction", "REAL"), ("display_name", "TEXT")]
+GAME_COLUMNS = ("game_id", "home_team", "away_team", "game_date", "stadium")
+BDB_GAME_COLUMNS = ("season", "week")
+PLAY_COLUMNS = ("game_id", "play_id", "description", "frame_count")
 
 def create_tables(conn: sqlite3.Connection):
     conn.executescript("""
@@ -15,8 +51,12 @@ def create_tables(conn: sqlite3.Connection):
         DROP TABLE IF EXISTS plays;
         DROP TABLE IF EXISTS players;
         DROP TABLE IF EXISTS games;
+    """)
+    ensure_tables(conn)
 
-        CREATE TABLE games (
+def ensure_tables(conn: sqlite3.Connection):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS games (
             game_id INTEGER PRIMARY KEY,
             home_team TEXT,
             away_team TEXT,
@@ -24,7 +64,7 @@ def create_tables(conn: sqlite3.Connection):
             stadium TEXT
         );
 
-        CREATE TABLE plays (
+        CREATE TABLE IF NOT EXISTS plays (
             game_id INTEGER NOT NULL,
             play_id INTEGER NOT NULL,
             description TEXT,
@@ -32,16 +72,19 @@ def create_tables(conn: sqlite3.Connection):
             PRIMARY KEY (game_id, play_id)
         );
 
-        CREATE TABLE frames (
+        CREATE TABLE IF NOT EXISTS frames (
             game_id INTEGER NOT NULL,
             play_id INTEGER NOT NULL,
             frame_id INTEGER NOT NULL,
             nfl_id INTEGER, -- actually player_id
             x REAL NOT NULL,
             y REAL NOT NULL,
+            speed REAL,
+            accel REAL,
             vx REAL,
             vy REAL,
             orientation REAL,
+            direction REAL,
             team TEXT,
             jersey_number INTEGER,
             display_name TEXT,
@@ -50,6 +93,17 @@ def create_tables(conn: sqlite3.Connection):
             PRIMARY KEY (game_id, play_id, frame_id, nfl_id)
         );
     """)
+    # frames from an older run, or from another loader, can predate the kinematics columns
+    have = {r[1] for r in conn.execute("PRAGMA table_info(frames)")}
+    for name, decl in ADDED_FRAME_COLUMNS:
+        if name not in have and not (name == "display_name" and frames_layout(conn) == "compact"):
+            conn.execute(f"ALTER TABLE frames ADD COLUMN {name} {decl}")
+    # Anything else required is a schema a synthetic match has no values for
+    for table, written in (("games", GAME_COLUMNS + BDB_GAME_COLUMNS), ("plays", PLAY_COLUMNS)):
+        required = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")
+                    if r[3] and r[4] is None and not r[5] and r[1] not in written]
+        if required:
+            raise ValueError(f"{table} requires {', '.join(required)}, which mock_soccer.py cannot fill")
 
 def generate_mock_data(conn: sqlite3.Connection):
     game_id = 999
@@ -116,9 +170,11 @@ def generate_mock_data(conn: sqlite3.Connection):
             
             # Save Frame
             conn.execute(
-                """INSERT INTO frames (game_id, play_id, frame_id, nfl_id, x, y, vx, vy, orientation, team, jersey_number, display_name, event) 
+                """INSERT INTO frames (game_id, play_id, frame_id, nfl_id, x, y, vx, vy, orientation, team,
+                                       jersey_number, display_name, event)
                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (game_id, play_id, frame_id, p["id"], p["start"][0], p["start"][1], 0, 0, 0, p["team"], p["number"], p["name"], event)
+                (game_id, play_id, frame_id, p["id"], p["start"][0], p["start"][1], 0, 0, 0,
+                 p["team"], p["number"], p["name"], event)
             )
 
         # Ball Logic
@@ -158,24 +214,290 @@ def generate_mock_data(conn: sqlite3.Connection):
             ball_pos = [ix + 1, iy]
 
         conn.execute(
-            """INSERT INTO frames (game_id, play_id, frame_id, nfl_id, x, y, vx, vy, orientation, team, jersey_number, display_name, event) 
+            """INSERT INTO frames (game_id, play_id, frame_id, nfl_id, x, y, vx, vy, orientation, team,
+                                   jersey_number, display_name, event)
                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
             (game_id, play_id, frame_id, -1, ball_pos[0], ball_pos[1], 0, 0, 0, "ball", 0, "Football", ball_event)
         )
 
     print(f"Generated {len(players) * 100} frames for Game {game_id}")
 
+# --- Synthetic matches for load testing (--games) ---
+
+DT = 1.0 / FPS
+PITCH = np.array([105.0, 68.0])
+MAX_PLAYER_SPEED = 8.5  # m/s
+MAX_PLAYER_ACCEL = 5.0  # m/s^2
+PASS_SPEED = (12.0, 22.0)  # m/s
+HOLD_FRAMES = (8, 30)  # frames on the ball before passing
+TURNOVER_P = 0.15
+PASS_EVENTS = {"pass", "received", "interception"}
+BATCH_PLAYS = 64
+
+# 4-4-2 for a team defending x=0: GK, back four, midfield four, two strikers
+FORMATION = np.array([
+    [5, 34], [20, 10], [18, 26], [18, 42], [20, 58],
+    [38, 10], [36, 26], [36, 42], [38, 58], [50, 26], [50, 42],
+], dtype=np.float64)
+JERSEYS = np.arange(1, 12)
+
+# Entity axis: ball, home 1-11, away 101-111 (ascending, so rows are written in PK order)
+ENTITY_IDS = np.concatenate([[-1], JERSEYS, JERSEYS + 100])
+ENTITY_TEAMS = np.array(["ball"] + ["home"] * 11 + ["away"] * 11, dtype=object)
+ENTITY_JERSEYS = np.concatenate([[0], JERSEYS, JERSEYS])
+ENTITY_NAMES = np.array(["Football"] + [f"Home #{j}" for j in JERSEYS] + [f"Away #{j}" for j in JERSEYS],
+                        dtype=object)
+
+TEAM_NAMES = ["Blue Lock 11", "U-20 Japan", "Bastard München", "Manshine City",
+              "Ubers", "FC Barcha", "PXG", "Re Al"]
+
+def cap_norm(v, limit):
+    """Scale vectors along the last axis down to at most `limit` long."""
+    norm = np.linalg.norm(v, axis=-1, keepdims=True)
+    return v * np.minimum(1.0, limit / np.maximum(norm, 1e-9))
+
+def simulate_players(rng, n_plays, n_frames):
+    """Positions, velocities and accelerations shaped (plays, frames, 22, 2).
+
+    Each player is steered towards its formation anchor, which drifts with a
+    smooth per-play block shift shared by both teams; acceleration and speed
+    are capped every step.
+    """
+    anchors = np.concatenate([FORMATION, np.column_stack([PITCH[0] - FORMATION[:, 0], FORMATION[:, 1]])])
+    shift = np.cumsum(rng.normal(0, 0.15, (n_plays, n_frames, 2)), axis=1)
+    shift += rng.uniform([-10, -6], [10, 6], (n_plays, 1, 2))
+    shift = np.clip(shift, [-15, -10], [15, 10])
+    targets = anchors + shift[:, :, None, :] + rng.normal(0, 2.0, (n_plays, 1, 22, 2))
+
+    pos = np.empty((n_plays, n_frames, 22, 2))
+    vel = np.empty_like(pos)
+    acc = np.empty_like(pos)
+    p = targets[:, 0].copy()
+    v = np.zeros_like(p)
+    for t in range(n_frames):
+        a = 1.2 * (targets[:, t] - p) - 1.5 * v + rng.normal(0, 2.0, p.shape)
+        v_next = cap_norm(v + cap_norm(a, MAX_PLAYER_ACCEL) * DT, MAX_PLAYER_SPEED)
+        acc[:, t] = (v_next - v) / DT
+        v = v_next
+        p = np.clip(p + v * DT, 0, PITCH)
+        pos[:, t] = p
+        vel[:, t] = v
+    return pos, vel, acc
+
+def simulate_ball(rng, pos, attacking):
+    """Ball path (plays, frames, 2) and {(play, frame): event}.
+
+    The ball stays with the carrier for HOLD_FRAMES, then flies in a straight
+    line at PASS_SPEED to a teammate, or to an opponent with probability
+    TURNOVER_P. `attacking` is 0 (home) / 1 (away) per play.
+    """
+    n_plays, n_frames = pos.shape[:2]
+    rows = np.arange(n_plays)
+    n_passes = n_frames // HOLD_FRAMES[0] + 2
+
+    starts = np.zeros((n_plays, n_passes), dtype=np.int64)    # frame the carrier gets the ball
+    releases = np.zeros((n_plays, n_passes), dtype=np.int64)  # frame the pass leaves
+    carriers = np.zeros((n_plays, n_passes), dtype=np.int64)
+    carrier = attacking * 11 + rng.integers(1, 11, n_plays)  # never start with the keeper
+    t = np.zeros(n_plays, dtype=np.int64)
+    events = {}
+    for k in range(n_passes):
+        starts[:, k] = t
+        carriers[:, k] = carrier
+        release = t + rng.integers(*HOLD_FRAMES, n_plays)
+        team = carrier // 11
+        mate = team * 11 + (carrier % 11 + rng.integers(1, 11, n_plays)) % 11
+        opponent = (1 - team) * 11 + rng.integers(0, 11, n_plays)
+        receiver = np.where(rng.random(n_plays) < TURNOVER_P, opponent, mate)
+
+        r = np.minimum(release, n_frames - 1)
+        dist = np.linalg.norm(pos[rows, r, receiver] - pos[rows, r, carrier], axis=-1)
+        flight = np.maximum(1, np.ceil(dist / rng.uniform(*PASS_SPEED, n_plays) * FPS)).astype(np.int64)
+        arrive = release + flight
+        releases[:, k] = release
+        for b in np.flatnonzero(release < n_frames):
+            events[(b, int(release[b]))] = "pass"
+        for b in np.flatnonzero(arrive < n_frames):
+            events[(b, int(arrive[b]))] = "interception" if receiver[b] // 11 != team[b] else "received"
+        t = arrive
+        carrier = receiver
+    starts = np.concatenate([starts, t[:, None]], axis=1)
+    carriers = np.concatenate([carriers, carrier[:, None]], axis=1)
+
+    # Which pass each frame belongs to, and whether the ball is held or in flight
+    frames = np.arange(n_frames)
+    k = (starts[:, None, :] <= frames[None, :, None]).sum(axis=-1) - 1
+    k = np.minimum(k, n_passes - 1)
+    b = np.broadcast_to(rows[:, None], k.shape)
+    f = np.broadcast_to(frames[None, :], k.shape)
+    release = releases[b, k]
+    arrive = starts[b, k + 1]  # may be past the last frame; the flight is cut off there
+
+    at_feet = pos[b, f, carriers[b, k]]
+    src = pos[b, np.minimum(release, n_frames - 1), carriers[b, k]]
+    dst = pos[b, np.minimum(arrive, n_frames - 1), carriers[b, k + 1]]
+    frac = np.clip((f - release) / np.maximum(arrive - release, 1), 0, 1)[..., None]
+    ball = np.where((f <= release)[..., None], at_feet, src + (dst - src) * frac)
+    return ball, events
+
+def lookup_codes(conn: sqlite3.Connection) -> dict:
+    """Codes for the strings a synthetic match writes into compact frames (see ingest.py --compact)."""
+    names = {"team": set(ENTITY_TEAMS), "event": PASS_EVENTS, "source": {"mock"}}
+    codes = {}
+    for table, col in LOOKUPS:
+        conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(n,) for n in names[col]])
+        codes[col] = dict(conn.execute(f"SELECT name, id FROM {table}"))
+    conn.executemany("INSERT OR IGNORE INTO lookup_players (nfl_id, display_name) VALUES (?, ?)",
+                     zip(ENTITY_IDS.tolist(), ENTITY_NAMES.tolist()))
+    return codes
+
+def frame_rows(batch, xy, speed, accel, v, direction, event, codes):
+    """INSERT rows for a batch of simulated plays, one play at a time, so only
+    one play's rows (frames x entities) are ever Python objects."""
+    _, frames, n_ent = speed.shape
+    frame_ids = np.repeat(np.arange(1, frames + 1), n_ent).tolist()
+    nfl_ids = ENTITY_IDS.tolist() * frames
+    if codes is None:
+        labels = (ENTITY_TEAMS.tolist() * frames, ENTITY_JERSEYS.tolist() * frames,
+                  ENTITY_NAMES.tolist() * frames)
+        source = "mock"
+    else:
+        labels = ([codes["team"][t] for t in ENTITY_TEAMS] * frames, ENTITY_JERSEYS.tolist() * frames)
+        source = codes["source"]["mock"]
+    for b, (g, p) in enumerate(batch):
+        events = event[b].ravel().tolist()
+        if codes is not None:
+            events = [None if e is None else codes["event"][e] for e in events]
+        # No facing is simulated, so orientation stays NULL
+        yield from zip(itertools.repeat(g), itertools.repeat(p), frame_ids, nfl_ids,
+                       xy[b, ..., 0].ravel().tolist(), xy[b, ..., 1].ravel().tolist(),
+                       speed[b].ravel().tolist(), accel[b].ravel().tolist(),
+                       v[b, ..., 0].ravel().tolist(), v[b, ..., 1].ravel().tolist(),
+                       itertools.repeat(None), direction[b].ravel().tolist(),
+                       *labels, events, itertools.repeat(source))
+
+def generate_matches(conn: sqlite3.Connection, games: int, plays_per_game: int, frames: int, seed: int = 0):
+    """Append synthetic games after the highest existing game_id. Returns (game_ids, frame rows written)."""
+    rng = np.random.default_rng(seed)
+    first_game = conn.execute("SELECT COALESCE(MAX(game_id), 0) FROM games").fetchone()[0] + 1
+    game_ids = list(range(first_game, first_game + games))
+
+    # BDB games (ingest.py) also need a season and week; synthetic games are week 0
+    bdb = "season" in {r[1] for r in conn.execute("PRAGMA table_info(games)")}
+    columns = GAME_COLUMNS + BDB_GAME_COLUMNS if bdb else GAME_COLUMNS
+    conn.executemany(
+        f"INSERT INTO games ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [(g, *rng.choice(TEAM_NAMES, 2, replace=False).tolist(),
+          str(np.datetime64("2026-01-01") + i), "Synthetic Stadium", *((2026, 0) if bdb else ()))
+         for i, g in enumerate(game_ids)],
+    )
+
+    codes = lookup_codes(conn) if frames_layout(conn) == "compact" else None
+
+    keys = [(g, p) for g in game_ids for p in range(1, plays_per_game + 1)]
+    n_ent = len(ENTITY_IDS)
+    total_rows = 0
+    t0 = time.perf_counter()
+    for start in range(0, len(keys), BATCH_PLAYS):
+        batch = keys[start:start + BATCH_PLAYS]
+        n = len(batch)
+        with instrument.stage("simulate", n * frames * n_ent):
+            attacking = rng.integers(0, 2, n)
+            pos, vel, acc = simulate_players(rng, n, frames)
+            ball, events = simulate_ball(rng, pos, attacking)
+            ball_vel = np.gradient(ball, DT, axis=1)
+            ball_acc = np.gradient(ball_vel, DT, axis=1)
+
+        # (plays, frames, entities, 2) in ENTITY_IDS order
+        xy = np.concatenate([ball[:, :, None], pos], axis=2).round(2)
+        v = np.concatenate([ball_vel[:, :, None], vel], axis=2)
+        a = np.concatenate([ball_acc[:, :, None], acc], axis=2)
+        speed = np.linalg.norm(v, axis=-1).round(2)
+        accel = np.linalg.norm(a, axis=-1).round(2)
+        direction = (np.degrees(np.arctan2(v[..., 1], v[..., 0])) % 360.0).round(2)
+        v = v.round(2)
+
+        event = np.full((n, frames, n_ent), None, dtype=object)
+        for (b, f), name in events.items():
+            event[b, f, 0] = name
+
+        with instrument.stage("insert_frames", n * frames * n_ent):
+            if codes is None:
+                conn.executemany(
+                    """INSERT INTO frames (game_id, play_id, frame_id, nfl_id, x, y, speed, accel, vx, vy,
+                                           orientation, direction, team, jersey_number, display_name,
+                                           event, source)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    frame_rows(batch, xy, speed, accel, v, direction, event, codes),
+                )
+            else:
+                conn.executemany(
+                    """INSERT INTO frames (game_id, play_id, frame_id, nfl_id, x, y, speed, accel, vx, vy,
+                                           orientation, direction, team_id, jersey_number, event_id,
+                                           source_id)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    frame_rows(batch, xy, speed, accel, v, direction, event, codes),
+                )
+            conn.executemany(
+                "INSERT INTO plays (game_id, play_id, description, frame_count) VALUES (?, ?, ?, ?)",
+                [(g, p, f"Synthetic play {p} ({'away' if att else 'home'} possession)", frames)
+                 for (g, p), att in zip(batch, attacking.tolist())],
+            )
+        with instrument.stage("commit"):
+            conn.commit()
+        total_rows += n * frames * n_ent
+        secs = time.perf_counter() - t0
+        print(f"  {start + n:,}/{len(keys):,} plays, {total_rows:,} rows ({total_rows / secs:,.0f} rows/s)")
+    return game_ids, total_rows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=0, help="append this many synthetic games")
+    parser.add_argument("--plays-per-game", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=300, help="frames per play (10 Hz)")
+    parser.add_argument("--seed", type=int, default=0)
+    instrument.add_arguments(parser)
+    return parser.parse_args()
+
 def main():
-    if os.path.exists(DB_PATH):
-        os.remove(DB_PATH)
-    
-    conn = sqlite3.connect(DB_PATH)
+    args = parse_args()
+    if args.games:
+        instrument.start("mock_soccer", DB_PATH, args)
+        totals = {"games": args.games, "plays": args.games * args.plays_per_game}
+        staging = publish.start_build(DB_PATH)
+        conn = sqlite3.connect(staging)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        try:
+            ensure_tables(conn)
+            print(f"Generating {args.games} games x {args.plays_per_game} plays x {args.frames} frames...")
+            game_ids, totals["frame_rows"] = generate_matches(conn, args.games, args.plays_per_game,
+                                                              args.frames, args.seed)
+            refresh_derived(conn, game_ids)
+            conn.close()
+            with instrument.stage("publish"):
+                publish.publish(staging, DB_PATH)
+        finally:
+            conn.close()
+            instrument.finish(totals)
+        return
+
+    instrument.start("mock_soccer", DB_PATH, args)
+    staging = publish.start_build(DB_PATH, fresh=True)
+    conn = sqlite3.connect(staging)
     try:
         create_tables(conn)
-        generate_mock_data(conn)
-        conn.commit()
+        with instrument.stage("scenario"):
+            generate_mock_data(conn)
+            conn.commit()
+        with instrument.stage("kinematics"):
+            add_kinematics(conn, FPS)
+        conn.close()
+        with instrument.stage("publish"):
+            publish.publish(staging, DB_PATH)
     finally:
         conn.close()
+        instrument.finish()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,255 @@
+"""Precompute a time-to-intercept pitch-control surface for every frame.
+
+Usage: python scripts/pitch_control.py [--workers N] [--cell 1.0] [--field LENGTH WIDTH]
+
+For every cell of a grid over the pitch (cell centres every --cell field
+units) each player's time to intercept is
+
+  tti = REACTION_TIME + |p + v * REACTION_TIME - cell| / MAX_SPEED
+
+from the stored positions p and velocities v (NULL velocities count as
+standing still): the player keeps running for the reaction time, then
+heads for the cell at top speed. With T_home / T_away the fastest player
+of each team, home control of the cell is
+
+  1 / (1 + exp(-pi / (sqrt(3) * SIGMA) * (T_away - T_home)))
+
+(Spearman's logistic model), so 1 = home, 0 = away, 0.5 = contested. The
+constants are in metres and seconds; BDB yards only change the scale. The
+grid covers --field, by default the field of the DB's games (see
+default_field).
+
+pitch_control has one row per frame whose data is the grid quantized to
+uint8 (round(255 * home control), rows = y, columns = x) and
+zlib-compressed; the grid geometry is in pitch_control_grid. Plays go to
+a process pool in groups of UNIT_PLAYS (see play_pool.py), each worker
+computing blocks of BLOCK_FRAMES frames at once as (players, cells)
+arrays, and the parent is the only writer, as in frame_features.py. The
+table is rebuilt in one pass over the whole DB, on a staging copy that is
+published over it when done.
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import time
+import zlib
+
+import numpy as np
+
+import play_pool
+import publish
+from play_payloads import frames_layout
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+REACTION_TIME = 0.7  # s
+MAX_SPEED = 5.0      # m/s
+SIGMA = 0.45         # s, spread of the arrival-time logistic
+UNIT_PLAYS = 20
+BLOCK_FRAMES = 32    # frames per (players, cells) block
+BDB_FIELD = (120.0, 53.3)     # yd, ingest.py games
+SOCCER_FIELD = (105.0, 68.0)  # m, mock_soccer.py and ingest_metrica.py games
+
+HOME, AWAY = 0, 1
+TEAM_CODES = {"home": HOME, "away": AWAY}
+
+PLAYER_SELECT = {
+    "text": """
+        SELECT play_id, frame_id, x, y, vx, vy, team FROM frames
+        WHERE game_id = ? AND play_id BETWEEN ? AND ? AND team IN ('home', 'away')
+        ORDER BY play_id, frame_id
+    """,
+    "compact": """
+        SELECT f.play_id, f.frame_id, f.x, f.y, f.vx, f.vy, t.name FROM frames f
+        JOIN lookup_teams t ON t.id = f.team_id
+        WHERE f.game_id = ? AND f.play_id BETWEEN ? AND ? AND t.name IN ('home', 'away')
+        ORDER BY f.play_id, f.frame_id
+    """,
+}
+
+_conn = None
+_layout = None
+_cells = None
+
+
+def grid_cells(length: float, width: float, cell: float) -> tuple:
+    """(nx, ny, cell centres as (ny * nx, 2)), row-major from y = 0."""
+    nx, ny = math.ceil(length / cell), math.ceil(width / cell)
+    gx = (np.arange(nx) + 0.5) * cell
+    gy = (np.arange(ny) + 0.5) * cell
+    xx, yy = np.meshgrid(gx, gy)
+    return nx, ny, np.stack([xx.ravel(), yy.ravel()], axis=1)
+
+
+def create_control_tables(conn: sqlite3.Connection, length: float, width: float, cell: float):
+    nx, ny, _ = grid_cells(length, width, cell)
+    conn.executescript("""
+        DROP TABLE IF EXISTS pitch_control;
+        DROP TABLE IF EXISTS pitch_control_grid;
+        CREATE TABLE pitch_control (
+            game_id INTEGER NOT NULL,
+            play_id INTEGER NOT NULL,
+            frame_id INTEGER NOT NULL,
+            data BLOB NOT NULL,  -- zlib(uint8[ny][nx]), 255 = home control
+            PRIMARY KEY (game_id, play_id, frame_id)
+        );
+        CREATE TABLE pitch_control_grid (
+            field_length REAL NOT NULL,
+            field_width REAL NOT NULL,
+            cell REAL NOT NULL,
+            nx INTEGER NOT NULL,
+            ny INTEGER NOT NULL
+        );
+    """)
+    conn.execute("INSERT INTO pitch_control_grid VALUES (?, ?, ?, ?, ?)", (length, width, cell, nx, ny))
+
+
+def control_block(fidx: np.ndarray, team: np.ndarray, pos: np.ndarray, vel: np.ndarray,
+                  cells: np.ndarray, frames: int) -> np.ndarray:
+    """Home control (frames, cells) for player rows sorted by frame index fidx (0..frames-1)."""
+    reach = pos + vel * REACTION_TIME
+    # tti grows with distance, so the fastest player of a team is the nearest
+    # one: take minima of squared distances (one matmul) and sqrt only those
+    sq = (reach * reach).sum(1)[:, None] - 2 * reach @ cells.T + (cells * cells).sum(1)[None, :]
+
+    # Scatter into (frame * team, slot, cell) padded with inf; a min over the
+    # slots vectorizes far better than reduceat over segments of rows
+    key = fidx * 2 + team
+    order = np.argsort(key, kind="stable")
+    starts = np.searchsorted(key[order], key[order], side="left")
+    slot = np.empty(len(key), dtype=np.int64)
+    slot[order] = np.arange(len(key)) - starts
+    padded = np.full((frames * 2, slot.max() + 1, len(cells)), np.inf, dtype=np.float32)
+    padded[key, slot] = sq
+    nearest = np.sqrt(np.maximum(padded.min(axis=1), 0)).reshape(frames, 2, len(cells))
+
+    # T_away - T_home; the reaction time cancels
+    gap = (nearest[:, AWAY] - nearest[:, HOME]) / MAX_SPEED
+    with np.errstate(invalid="ignore", over="ignore"):
+        control = 1.0 / (1.0 + np.exp(-math.pi / (math.sqrt(3) * SIGMA) * gap))
+    return np.where(np.isnan(control), 0.5, control)  # neither team on the pitch
+
+
+def compute_control(play_id, frame_id, x, y, vx, vy, team, cells) -> tuple:
+    """([(play_id, frame_id)], uint8 grids (frames, cells)) for rows sorted by (play, frame)."""
+    n = len(play_id)
+    brk = np.ones(n, dtype=bool)
+    brk[1:] = (play_id[1:] != play_id[:-1]) | (frame_id[1:] != frame_id[:-1])
+    fidx = np.cumsum(brk) - 1
+    firsts = np.flatnonzero(brk)
+    pos = np.stack([x, y], axis=1).astype(np.float32)
+    vel = np.nan_to_num(np.stack([vx, vy], axis=1)).astype(np.float32)
+
+    grids = np.empty((len(firsts), len(cells)), dtype=np.uint8)
+    row_starts = np.append(firsts, n)
+    for f0 in range(0, len(firsts), BLOCK_FRAMES):
+        f1 = min(f0 + BLOCK_FRAMES, len(firsts))
+        lo, hi = row_starts[f0], row_starts[f1]
+        control = control_block(fidx[lo:hi] - f0, team[lo:hi], pos[lo:hi], vel[lo:hi], cells, f1 - f0)
+        grids[f0:f1] = np.rint(control * 255)
+    keys = list(zip(play_id[firsts].tolist(), frame_id[firsts].tolist()))
+    return keys, grids
+
+
+def _init_worker(db_path: str, length: float, width: float, cell: float):
+    global _conn, _layout, _cells
+    _conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    _layout = frames_layout(_conn)
+    _cells = grid_cells(length, width, cell)[2].astype(np.float32)
+
+
+def unit_control(unit):
+    """Worker: read one (game, play range) and return its compressed grids."""
+    game_id = unit[0]
+    rows = _conn.execute(PLAYER_SELECT[_layout], unit).fetchall()
+    if not rows:
+        return game_id, []
+    play_id, frame_id, x, y, vx, vy, team = zip(*rows)
+    keys, grids = compute_control(
+        np.array(play_id), np.array(frame_id), np.array(x, dtype=np.float64), np.array(y, dtype=np.float64),
+        np.array(vx, dtype=np.float64), np.array(vy, dtype=np.float64),  # None -> nan
+        np.array([TEAM_CODES[t] for t in team]), _cells,
+    )
+    return game_id, [(game_id, p, f, zlib.compress(g.tobytes(), 1)) for (p, f), g in zip(keys, grids)]
+
+
+def default_field(conn: sqlite3.Connection) -> tuple:
+    """(length, width) every frame fits on: BDB's field when the games come
+    from ingest.py (games.season is set, weeks from 1), the soccer pitch for
+    synthetic week-0 games and soccer-only DBs, the larger of each side when
+    a BDB DB also holds mock games."""
+    if "season" not in {r[1] for r in conn.execute("PRAGMA table_info(games)")}:
+        return SOCCER_FIELD
+    first, last = conn.execute("SELECT MIN(week), MAX(week) FROM games").fetchone()
+    fields = []
+    if last is None or last > 0:
+        fields.append(BDB_FIELD)
+    if first == 0:
+        fields.append(SOCCER_FIELD)
+    return tuple(max(sides) for sides in zip(*fields))
+
+
+def build_control(conn: sqlite3.Connection, db_path: str, workers: int,
+                  length: float, width: float, cell: float) -> int:
+    create_control_tables(conn, length, width, cell)
+    units = play_pool.play_ranges(conn, UNIT_PLAYS)
+    total = 0
+    stored = 0
+    t0 = time.perf_counter()
+    results = play_pool.imap_units(units, unit_control, workers, _init_worker, (db_path, length, width, cell))
+    for done, (_, rows) in enumerate(results, 1):
+        conn.executemany("INSERT INTO pitch_control VALUES (?, ?, ?, ?)", rows)
+        total += len(rows)
+        stored += sum(len(r[3]) for r in rows)
+        if done % 100 == 0 or done == len(units):
+            conn.commit()
+            print(f"  {done:,}/{len(units):,} units, {total:,} frames "
+                  f"({total / (time.perf_counter() - t0):,.0f} frames/s, "
+                  f"{stored / max(total, 1) / 1024:.1f} KB/frame)")
+    conn.commit()
+    return total
+
+
+def load_control(conn: sqlite3.Connection, game_id: int, play_id: int, frame_id: int) -> np.ndarray:
+    """Home control in [0, 1] as (ny, nx), or None when the frame has no grid."""
+    row = conn.execute(
+        "SELECT data FROM pitch_control WHERE game_id = ? AND play_id = ? AND frame_id = ?",
+        (game_id, play_id, frame_id),
+    ).fetchone()
+    if row is None:
+        return None
+    nx, ny = conn.execute("SELECT nx, ny FROM pitch_control_grid").fetchone()
+    return np.frombuffer(zlib.decompress(row[0]), dtype=np.uint8).reshape(ny, nx) / 255.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cell", type=float, default=1.0, help="grid cell size in field units")
+    parser.add_argument("--field", type=float, nargs=2, metavar=("LENGTH", "WIDTH"),
+                        help="grid extent in field units (default: the games' field, see default_field)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    staging = publish.start_build(DB_PATH)
+    conn = sqlite3.connect(staging)
+    conn.execute("PRAGMA journal_mode=WAL")  # the workers read it while the parent writes
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        field = args.field or default_field(conn)
+        print(f"Building pitch control on a {field[0]:g} x {field[1]:g} field...")
+        t0 = time.perf_counter()
+        frames = build_control(conn, staging, args.workers, *field, args.cell)
+        secs = time.perf_counter() - t0
+        print(f"  {frames:,} frames in {secs:.1f}s ({frames / max(secs, 1e-9):,.0f} frames/s)")
+    finally:
+        conn.close()
+    publish.publish(staging, DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
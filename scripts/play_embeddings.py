@@ -0,0 +1,272 @@
+"""Fixed-length play embeddings and a nearest-neighbour index over them.
+
+Usage: python scripts/play_embeddings.py --build
+       python scripts/play_embeddings.py --game-id 1 --play-id 1 [-k 10] [--exact]
+
+Every play in frames becomes one vector of three equally weighted blocks:
+
+  ball       ball x/y resampled to PATH_POINTS points along the play
+  teams      home/away centroid x/y and spread (RMS distance to the
+             centroid), resampled to TEAM_POINTS points
+  events     counts of the EVENT_VOCAB most common events in each of
+             EVENT_BINS thirds of the play
+
+Columns are standardized over all plays, then each block is scaled by
+1/sqrt(width) so none dominates the Euclidean distance. The matrix is
+saved as <db>.embeddings.npy (float32, opened memory-mapped) next to
+<db>.embeddings.npz, which holds the (game_id, play_id) of every row, the
+standardization and an inverted-file index: k-means centroids with the
+rows stored contiguously per cluster. A query scans the NPROBE clusters
+nearest to the query vector; --exact scans the whole matrix in batches.
+
+The DB is only read (over a read-only connection). --build writes both
+files under temporary names and renames them into place, as publish.py
+does for the DB, so a running query keeps its memory-mapped old matrix;
+PlayIndex refuses a matrix and ids that do not belong together.
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+import time
+from collections import Counter
+
+import numpy as np
+
+from play_payloads import frame_rows
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+PATH_POINTS = 16
+TEAM_POINTS = 8
+EVENT_VOCAB = 16
+EVENT_BINS = 3
+NPROBE = 16
+KMEANS_ITERS = 15
+TRAIN_PER_CLUSTER = 64
+BATCH_ROWS = 65_536
+
+
+def index_paths(db_path: str) -> tuple:
+    base = os.path.splitext(db_path)[0]
+    return f"{base}.embeddings.npy", f"{base}.embeddings.npz"
+
+
+def resample(frame_id: np.ndarray, values: np.ndarray, points: int) -> np.ndarray:
+    """values (n, d) sampled at frame_id -> (points, d) evenly spaced over the play."""
+    if len(frame_id) == 0:
+        return np.zeros((points, values.shape[1]))
+    t = np.linspace(frame_id[0], frame_id[-1], points)
+    return np.stack([np.interp(t, frame_id, values[:, j]) for j in range(values.shape[1])], axis=1)
+
+
+def team_series(frame_id, x, y, mask) -> tuple:
+    """Per-frame (centroid x, centroid y, spread) of the rows in mask."""
+    frames, inv = np.unique(frame_id[mask], return_inverse=True)
+    if len(frames) == 0:
+        return frames, np.zeros((0, 3))
+    count = np.bincount(inv)
+    cx = np.bincount(inv, x[mask]) / count
+    cy = np.bincount(inv, y[mask]) / count
+    spread = np.sqrt(np.bincount(inv, (x[mask] - cx[inv]) ** 2 + (y[mask] - cy[inv]) ** 2) / count)
+    return frames, np.stack([cx, cy, spread], axis=1)
+
+
+def play_features(rows: list) -> tuple:
+    """(numeric features, [(relative time, event)]) for one play's frame_rows."""
+    cols = list(zip(*rows))
+    frame_id = np.array(cols[2], dtype=np.float64)
+    x = np.array(cols[4], dtype=np.float64)
+    y = np.array(cols[5], dtype=np.float64)
+    team = np.array(cols[9], dtype=object)
+
+    ball = team == "ball"
+    bf, first = np.unique(frame_id[ball], return_index=True)
+    ball_xy = np.stack([x[ball][first], y[ball][first]], axis=1)
+    parts = [resample(bf, ball_xy, PATH_POINTS).ravel()]
+    for side in ("home", "away"):
+        tf, series = team_series(frame_id, x, y, team == side)
+        parts.append(resample(tf, series, TEAM_POINTS).ravel())
+
+    lo, hi = frame_id.min(), frame_id.max()
+    span = max(hi - lo, 1.0)
+    events = sorted({(f, e) for f, e in zip(cols[2], cols[12]) if e})
+    return np.concatenate(parts), [((f - lo) / span, e) for f, e in events]
+
+
+def event_block(events: list, vocab: list) -> np.ndarray:
+    out = np.zeros((len(vocab), EVENT_BINS))
+    slot = {e: i for i, e in enumerate(vocab)}
+    for t, e in events:
+        if e in slot:
+            out[slot[e], min(int(t * EVENT_BINS), EVENT_BINS - 1)] += 1
+    return out.ravel()
+
+
+def kmeans(matrix: np.ndarray, k: int, seed: int = 0) -> tuple:
+    """Lloyd's k-means, trained on at most TRAIN_PER_CLUSTER rows per cluster.
+
+    Returns (centroids, assignment of every row).
+    """
+    rng = np.random.default_rng(seed)
+    train = matrix
+    if len(matrix) > TRAIN_PER_CLUSTER * k:
+        train = matrix[rng.choice(len(matrix), TRAIN_PER_CLUSTER * k, replace=False)]
+    centroids = train[rng.choice(len(train), k, replace=False)].copy()
+    for _ in range(KMEANS_ITERS):
+        assign = nearest(train, centroids)
+        order = np.argsort(assign, kind="stable")
+        members, starts = np.unique(assign[order], return_index=True)
+        sums = np.add.reduceat(train[order], starts, axis=0)
+        centroids[members] = sums / np.diff(np.append(starts, len(train)))[:, None]
+    return centroids, nearest(matrix, centroids)
+
+
+def nearest(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(matrix), dtype=np.int64)
+    for lo in range(0, len(matrix), BATCH_ROWS):
+        out[lo:lo + BATCH_ROWS] = sq_dists(matrix[lo:lo + BATCH_ROWS], centroids).argmin(axis=1)
+    return out
+
+
+def sq_dists(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Squared Euclidean distances between the rows of a and b."""
+    d = (a * a).sum(1)[:, None] - 2 * a @ b.T + (b * b).sum(1)[None, :]
+    return np.maximum(d, 0)
+
+
+def build_embeddings(conn: sqlite3.Connection, db_path: str) -> int:
+    """Compute, standardize and index every play's vector. Returns the number of plays."""
+    print("Computing play embeddings...")
+    t0 = time.perf_counter()
+    ids, numeric, play_events = [], [], []
+    for key, rows in itertools.groupby(frame_rows(conn), key=lambda r: (r[0], r[1])):
+        features, events = play_features(list(rows))
+        ids.append(key)
+        numeric.append(features)
+        play_events.append(events)
+    if not ids:
+        print("  no plays in frames")
+        return 0
+
+    counts = Counter(e for events in play_events for _, e in events)
+    vocab = sorted(e for e, _ in counts.most_common(EVENT_VOCAB))
+    events = np.array([event_block(ev, vocab) for ev in play_events]).reshape(len(ids), -1)
+    raw = np.hstack([np.array(numeric), events])
+
+    widths = [PATH_POINTS * 2, TEAM_POINTS * 3, TEAM_POINTS * 3, len(vocab) * EVENT_BINS]
+    weights = np.concatenate([np.full(w, 1 / np.sqrt(w)) for w in widths if w])
+    mean = raw.mean(axis=0)
+    std = raw.std(axis=0)
+    std[std == 0] = 1.0
+    matrix = ((raw - mean) / std * weights).astype(np.float32)
+    print(f"  {len(ids):,} plays x {matrix.shape[1]} dims in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    nlist = max(1, int(np.sqrt(len(ids))))
+    centroids, assign = kmeans(matrix, nlist)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+    matrix_path, meta_path = index_paths(db_path)
+    # File objects: given a path np.save/np.savez would append their own suffix
+    with open(f"{matrix_path}.tmp", "wb") as f:
+        np.save(f, matrix[order])
+    with open(f"{meta_path}.tmp", "wb") as f:
+        np.savez(f, ids=np.array(ids, dtype=np.int64)[order], centroids=centroids,
+                 offsets=offsets, mean=mean, std=std, weights=weights, vocab=np.array(vocab, dtype=str))
+    os.replace(f"{matrix_path}.tmp", matrix_path)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    print(f"  {nlist} clusters in {time.perf_counter() - t0:.1f}s -> {matrix_path}")
+    return len(ids)
+
+
+class PlayIndex:
+    """The saved embeddings: matrix memory-mapped, ids and clusters in memory."""
+
+    def __init__(self, db_path: str = DB_PATH):
+        matrix_path, meta_path = index_paths(db_path)
+        self.matrix = np.load(matrix_path, mmap_mode="r")
+        meta = np.load(meta_path)
+        self.ids = meta["ids"]
+        self.centroids = meta["centroids"]
+        self.offsets = meta["offsets"]
+        if len(self.ids) != len(self.matrix):
+            raise RuntimeError(f"{matrix_path} and {meta_path} are from different builds; retry, "
+                               f"or rerun --build if this persists")
+        self.row = {(int(g), int(p)): i for i, (g, p) in enumerate(self.ids)}
+
+    def vector(self, game_id: int, play_id: int) -> np.ndarray:
+        i = self.row.get((game_id, play_id))
+        if i is None:
+            raise KeyError(f"play {game_id}/{play_id} is not in the embeddings; rerun --build")
+        return np.asarray(self.matrix[i])
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = NPROBE, exact: bool = False) -> list:
+        """[(game_id, play_id, distance)] of the k rows nearest to query."""
+        if exact:
+            spans = [(0, len(self.ids))]
+        else:
+            # Probe clusters nearest first until they hold at least k rows
+            spans = []
+            held = 0
+            for c in sq_dists(query[None, :], self.centroids)[0].argsort():
+                lo, hi = self.offsets[c], self.offsets[c + 1]
+                if hi > lo:
+                    spans.append((lo, hi))
+                    held += hi - lo
+                if len(spans) >= nprobe and held >= k:
+                    break
+        rows, dists = [], []
+        for lo, hi in spans:
+            for b in range(lo, hi, BATCH_ROWS):
+                block = np.asarray(self.matrix[b:min(hi, b + BATCH_ROWS)])
+                rows.append(np.arange(b, b + len(block)))
+                dists.append(sq_dists(query[None, :], block)[0])
+        rows, dists = np.concatenate(rows), np.concatenate(dists)
+        top = np.argsort(dists, kind="stable")[:k]
+        return [(int(self.ids[rows[i]][0]), int(self.ids[rows[i]][1]), float(np.sqrt(dists[i])))
+                for i in top]
+
+    def similar_plays(self, game_id: int, play_id: int, k: int = 10, **kwargs) -> list:
+        """Plays most like (game_id, play_id), excluding itself."""
+        hits = self.search(self.vector(game_id, play_id), k + 1, **kwargs)
+        return [h for h in hits if (h[0], h[1]) != (game_id, play_id)][:k]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--build", action="store_true", help="(re)compute the embeddings and index")
+    parser.add_argument("--game-id", type=int)
+    parser.add_argument("--play-id", type=int)
+    parser.add_argument("-k", type=int, default=10, help="number of similar plays")
+    parser.add_argument("--nprobe", type=int, default=NPROBE, help="clusters scanned per query")
+    parser.add_argument("--exact", action="store_true", help="scan every play instead of the nearest clusters")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        if args.build:
+            build_embeddings(conn, DB_PATH)
+        if args.game_id is None or args.play_id is None:
+            return
+
+        index = PlayIndex(DB_PATH)
+        t0 = time.perf_counter()
+        hits = index.similar_plays(args.game_id, args.play_id, args.k, nprobe=args.nprobe, exact=args.exact)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"Plays like {args.game_id}/{args.play_id} ({len(index.ids):,} indexed, {ms:.1f} ms):")
+        for game_id, play_id, dist in hits:
+            desc = conn.execute(
+                "SELECT description FROM plays WHERE game_id = ? AND play_id = ?", (game_id, play_id)
+            ).fetchone()
+            print(f"  {game_id}/{play_id}  {dist:6.3f}  {(desc[0] if desc else '') or ''}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Precompute the canonical play JSON (contracts/data.md) for every play.
+
+Usage: python scripts/play_payloads.py [--check N]
+
+Streams frames once in (game_id, play_id, frame_id, nfl_id) order, builds
+the same payload that server/src/db.ts getPlayData assembles per request,
+and stores it zlib-compressed in play_payloads so the server can answer
+with a single primary-key lookup. Works on text and --compact frames.
+
+ingest.py keeps the table current: plays it replaces, and every play after
+a new plays.csv, are rebuilt at the end of the run (missing_payloads).
+
+--check N first checks build_payload against the fixture
+contracts/fixtures/play-payload.json, whose payload is getPlayData's own
+output (server/src/__tests__/play-payload.test.ts keeps it that way), then
+re-assembles N randomly sampled plays from frames and compares them
+against the cached payloads (also useful after an incremental ingest).
+Without --check the table is rebuilt on a staging copy that publish.py
+publishes over the DB.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sqlite3
+import time
+import zlib
+
+import publish
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "..", "contracts", "fixtures", "play-payload.json")
+FIXTURE_COLUMNS = ["frame_id", "nfl_id", "x", "y", "vx", "vy", "orientation",
+                   "team", "jersey_number", "display_name", "event"]
+
+FRAME_SELECT = {
+    "text": """
+        SELECT game_id, play_id, frame_id, nfl_id, x, y, vx, vy, orientation,
+               team, jersey_number, display_name, event
+        FROM frames
+    """,
+    "compact": """
+        SELECT f.game_id, f.play_id, f.frame_id, f.nfl_id, f.x, f.y, f.vx, f.vy, f.orientation,
+               t.name, f.jersey_number, p.display_name, e.name
+        FROM frames f
+        LEFT JOIN lookup_teams t ON t.id = f.team_id
+        LEFT JOIN lookup_events e ON e.id = f.event_id
+        LEFT JOIN lookup_players p ON p.nfl_id = f.nfl_id
+    """,
+}
+
+
+def create_payload_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS play_payloads (
+            game_id INTEGER NOT NULL,
+            play_id INTEGER NOT NULL,
+            payload BLOB NOT NULL,  -- zlib(JSON)
+            PRIMARY KEY (game_id, play_id)
+        )
+    """)
+
+
+def frames_layout(conn: sqlite3.Connection) -> str:
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(frames)")}
+    return "compact" if "team_id" in cols else "text"
+
+
+def frame_rows(conn: sqlite3.Connection, game_id: int = None, play_id: int = None):
+    """Frame rows for one play, one game (no play_id), or every play when no key is given."""
+    layout = frames_layout(conn)
+    sql = FRAME_SELECT[layout]
+    f = "f." if layout == "compact" else ""
+    if game_id is None:
+        return conn.execute(f"{sql} ORDER BY {f}game_id, {f}play_id, {f}frame_id, {f}nfl_id")
+    if play_id is None:
+        return conn.execute(
+            f"{sql} WHERE {f}game_id = ? ORDER BY {f}play_id, {f}frame_id, {f}nfl_id", (game_id,)
+        )
+    return conn.execute(
+        f"{sql} WHERE {f}game_id = ? AND {f}play_id = ? ORDER BY {f}frame_id, {f}nfl_id",
+        (game_id, play_id),
+    )
+
+
+def build_payload(game_id: int, play_id: int, description, rows) -> dict:
+    """Mirror of getPlayData's reassembly; rows are ordered by (frame_id, nfl_id)."""
+    players = {}
+    events = {}
+    frames = {}
+
+    for (_, _, frame_id, nfl_id, x, y, vx, vy, orientation,
+         team, jersey, name, event) in rows:
+        pid = "ball" if nfl_id is None or nfl_id == -1 else str(nfl_id)
+
+        if pid not in players:
+            info = {
+                "name": name or ("Ball" if team == "ball" else "Unknown"),
+                "team": team if team in ("home", "away", "ball") else "home",
+            }
+            if jersey is not None:
+                info["jersey"] = jersey
+            players[pid] = info
+
+        if event:
+            events[str(frame_id)] = event
+
+        frame = frames.get(frame_id)
+        if frame is None:
+            frame = frames[frame_id] = {"positions": {}, "velocities": {}, "orientations": {}}
+        frame["positions"][pid] = [x, y]
+        if vx is not None and vy is not None:
+            frame["velocities"][pid] = [vx, vy]
+        if orientation is not None:
+            frame["orientations"][pid] = orientation
+
+    frame_list = [{"id": fid, **frames[fid]} for fid in sorted(frames)]
+    return {
+        "gameId": game_id,
+        "playId": play_id,
+        "meta": {
+            "description": description,
+            "quarter": 1,  # Mock defaults, as in getPlayData
+            "down": 1,
+            "yardsToGo": 10,
+            "offense": "Home",
+            "defense": "Away",
+        },
+        "frameCount": len(frame_list),
+        "events": events,
+        "players": players,
+        "frames": frame_list,
+        "source": "mock",
+    }
+
+
+def decode_payload(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob))
+
+
+def missing_payloads(conn: sqlite3.Connection) -> list:
+    """[(game_id, play_id)] of plays with frames (play_catalog) but no cached payload."""
+    return conn.execute("""
+        SELECT c.game_id, c.play_id FROM play_catalog c
+        WHERE NOT EXISTS (
+            SELECT 1 FROM play_payloads p WHERE p.game_id = c.game_id AND p.play_id = c.play_id
+        )
+        ORDER BY c.game_id, c.play_id
+    """).fetchall()
+
+
+def build_payloads(conn: sqlite3.Connection, keys: list = None) -> int:
+    """Cache the payload of every play, or only of the (game_id, play_id) in keys.
+
+    Every play is one ordered pass over frames; keys are looked up play by play.
+    """
+    create_payload_table(conn)
+    if keys is None:
+        conn.execute("DELETE FROM play_payloads")
+        plays = itertools.groupby(frame_rows(conn), key=lambda r: (r[0], r[1]))
+    else:
+        conn.executemany("DELETE FROM play_payloads WHERE game_id = ? AND play_id = ?", keys)
+        plays = (((g, p), frame_rows(conn, g, p)) for g, p in keys)
+    descriptions = {
+        (g, p): d for g, p, d in conn.execute("SELECT game_id, play_id, description FROM plays")
+    }
+
+    count = 0
+    raw_bytes = 0
+    stored_bytes = 0
+    batch = []
+    for (game_id, play_id), rows in plays:
+        payload = build_payload(game_id, play_id, descriptions.get((game_id, play_id)), rows)
+        text = json.dumps(payload, separators=(",", ":"))
+        blob = zlib.compress(text.encode("utf-8"), 6)
+        raw_bytes += len(text)
+        stored_bytes += len(blob)
+        batch.append((game_id, play_id, blob))
+        count += 1
+        if len(batch) >= 500:
+            conn.executemany("INSERT INTO play_payloads VALUES (?, ?, ?)", batch)
+            batch.clear()
+    conn.executemany("INSERT INTO play_payloads VALUES (?, ?, ?)", batch)
+    conn.commit()
+
+    if count:
+        print(f"  {count:,} payloads, {raw_bytes / 1e6:.1f} MB JSON -> {stored_bytes / 1e6:.1f} MB zlib")
+    return count
+
+
+def check_fixture(path: str = FIXTURE_PATH) -> bool:
+    """Whether build_payload reproduces the getPlayData output stored in the fixture."""
+    with open(path) as f:
+        fixture = json.load(f)
+    game_id, play_id = fixture["gameId"], fixture["playId"]
+    rows = [(game_id, play_id, *(r[c] for c in FIXTURE_COLUMNS)) for r in fixture["rows"]]
+    ours = json.loads(json.dumps(build_payload(game_id, play_id, fixture["description"], rows)))
+    return ours == fixture["payload"]
+
+
+def check_payloads(conn: sqlite3.Connection, sample: int, seed: int = 0) -> int:
+    """Compare cached payloads against a fresh reassembly. Returns the number of mismatches."""
+    keys = conn.execute("SELECT game_id, play_id FROM play_payloads").fetchall()
+    keys = random.Random(seed).sample(keys, min(sample, len(keys)))
+
+    mismatches = 0
+    for game_id, play_id in keys:
+        (blob,) = conn.execute(
+            "SELECT payload FROM play_payloads WHERE game_id = ? AND play_id = ?", (game_id, play_id)
+        ).fetchone()
+        row = conn.execute(
+            "SELECT description FROM plays WHERE game_id = ? AND play_id = ?", (game_id, play_id)
+        ).fetchone()
+        live = build_payload(game_id, play_id, row[0] if row else None, frame_rows(conn, game_id, play_id))
+        # Round-trip through JSON so both sides compare as the client sees them
+        if decode_payload(blob) != json.loads(json.dumps(live)):
+            print(f"  MISMATCH game {game_id} play {play_id}")
+            mismatches += 1
+
+    print(f"  checked {len(keys)} plays, {mismatches} mismatches")
+    return mismatches
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", type=int, metavar="N",
+                        help="only verify the fixture and N sampled cached payloads against frames")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.check:
+        print("Checking play payloads...")
+        if not check_fixture():
+            raise SystemExit(f"  build_payload no longer matches getPlayData ({FIXTURE_PATH})")
+        print("  fixture matches getPlayData")
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+        try:
+            if check_payloads(conn, args.check):
+                raise SystemExit(1)
+        finally:
+            conn.close()
+        return
+
+    staging = publish.start_build(DB_PATH)
+    conn = sqlite3.connect(staging)
+    try:
+        print("Building play payloads...")
+        t0 = time.perf_counter()
+        build_payloads(conn)
+        print(f"  {time.perf_counter() - t0:.1f}s")
+    finally:
+        conn.close()
+    publish.publish(staging, DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
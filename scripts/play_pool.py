@@ -0,0 +1,49 @@
+"""Groups of plays spread over a process pool, with the parent as the only writer.
+
+Usage (inside frame_features.py, pitch_control.py, belief_precompute.py):
+
+    units = play_pool.play_ranges(conn, UNIT_PLAYS)
+    for result in play_pool.imap_units(units, unit_fn, workers, _init_worker, (db_path,)):
+        ...  # write result; they arrive in unit order
+
+A unit is (game_id, first_play_id, last_play_id): at most UNIT_PLAYS plays
+of one game, so a worker reads it with one range query on the frames key.
+imap_units keeps 2 * workers units in flight and hands results back as
+they are drained, so finished units never pile up in memory.
+"""
+
+import itertools
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def play_ranges(conn: sqlite3.Connection, unit_plays: int, game_id: int = None, play_id: int = None) -> list:
+    """[(game_id, first_play_id, last_play_id)] covering every play, or just the given one."""
+    sql = "SELECT game_id, play_id FROM plays"
+    params = ()
+    if game_id is not None:
+        sql += " WHERE game_id = ? AND play_id = ?"
+        params = (game_id, play_id)
+    units = []
+    plays = conn.execute(sql + " ORDER BY game_id, play_id", params).fetchall()
+    for game_id, group in itertools.groupby(plays, key=lambda r: r[0]):
+        play_ids = [p for _, p in group]
+        for i in range(0, len(play_ids), unit_plays):
+            units.append((game_id, play_ids[i], play_ids[min(i + unit_plays, len(play_ids)) - 1]))
+    return units
+
+
+def imap_units(units: list, fn, workers: int, initializer=None, initargs: tuple = (), args: tuple = ()):
+    """Yield fn(unit, *args) for every unit, in order, computed by a pool of workers."""
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        todo = iter(units)
+        for unit in itertools.islice(todo, workers * 2):
+            pending.append(pool.submit(fn, unit, *args))
+        while pending:
+            result = pending.popleft().result()
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append(pool.submit(fn, nxt, *args))
+            yield result
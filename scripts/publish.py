@@ -0,0 +1,317 @@
+"""Publish a read-optimized copy of the DB by an atomic rename.
+
+Usage: python scripts/publish.py [--page-size 16384] [--check]
+
+The server opens data/metapitch.db read-only, so no script should remove
+it or write a half-built DB in its place. Every script that writes to it
+works on a staging file next to it instead (start_build: empty for a
+rebuild, else a VACUUM INTO snapshot of the current DB) and finishes with
+publish():
+
+  1. cluster   frames, and every other table keyed on a composite primary
+               key whose rows are small (at most 1/CLUSTER_ROW_FRACTION of
+               a page), is rewritten as WITHOUT ROWID in key order, so a
+               play's rows sit together in the key's own b-tree; frames is
+               keyed (game_id, play_id, frame_id, nfl_id). Indexes made
+               redundant by the key are dropped.
+  2. ANALYZE   planner statistics in sqlite_stat1, with skip-scans off
+  3. VACUUM INTO a second file with PAGE_SIZE pages, in rollback-journal
+               mode (no -wal next to the served file)
+  4. check     EXPLAIN QUERY PLAN of the server's queries (SERVER_QUERIES);
+               a query that would scan stops the publish (PlanError)
+  5. rename    os.replace over the DB: open connections keep reading the
+               old file, new ones see the new one, nothing sees a mix
+
+Nothing here depends on rowids: kinematics.py updates frames by key and
+frames_rtree carries the frames key (see spatial_index.py). A failed run
+leaves the staging file behind: ingest.py resumes it while its manifest
+has weeks 'pending', every other run starts over.
+Without --check this republishes the current DB as it is; --check only
+prints the query plans.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+PAGE_SIZE = 16384
+CLUSTER_ROW_FRACTION = 20  # SQLite's rule of thumb for WITHOUT ROWID rows
+SAMPLE_ROWS = 1000
+FRAMES_KEY = ["game_id", "play_id", "frame_id", "nfl_id"]
+SMALL_TABLE_ROWS = 1000  # reading all of it is a page or two
+
+# The server's keyed queries (server/src/db.ts) and the tables they need.
+# The games list and lookup_teams/lookup_events read whole tiny tables.
+SERVER_QUERIES = [
+    ("plays of a game", "plays",
+     "SELECT play_id, description, frame_count FROM plays WHERE game_id = ? ORDER BY play_id"),
+    ("play", "plays", "SELECT * FROM plays WHERE game_id = ? AND play_id = ?"),
+    ("play frames", "frames",
+     "SELECT * FROM frames WHERE game_id = ? AND play_id = ? ORDER BY frame_id, nfl_id"),
+    ("play player names", "lookup_players",
+     """SELECT nfl_id, display_name FROM lookup_players WHERE nfl_id IN (
+            SELECT nfl_id FROM frames WHERE game_id = ? AND play_id = ?)"""),
+    ("cached payload", "play_payloads",
+     "SELECT payload FROM play_payloads WHERE game_id = ? AND play_id = ?"),
+    ("belief posteriors", "belief_posteriors",
+     """SELECT frame_id, p_goal, p_turnover, expected_xg, turnover, retention, progression,
+               opportunity, goal
+        FROM belief_posteriors WHERE game_id = ? AND play_id = ? ORDER BY frame_id"""),
+    ("belief deltas", "belief_deltas",
+     """SELECT frame_id, delta_p_goal, kl_divergence, is_pivotal
+        FROM belief_deltas WHERE game_id = ? AND play_id = ? ORDER BY frame_id"""),
+    ("belief pivotal", "belief_pivotal",
+     "SELECT frame_id FROM belief_pivotal WHERE game_id = ? AND play_id = ? ORDER BY rank"),
+    ("player", "players", "SELECT * FROM players WHERE nfl_id = ?"),
+]
+
+
+class PlanError(RuntimeError):
+    """A server query would scan the DB about to be published."""
+
+
+def staging_path(db_path: str) -> str:
+    return f"{os.path.splitext(db_path)[0]}.staging.db"
+
+
+def remove_db(path: str):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def start_build(db_path: str, fresh: bool = False, reuse: bool = False) -> str:
+    """The staging file to write into: empty when fresh or there is no DB yet,
+    else a snapshot of db_path. A stale one from a failed run is discarded,
+    unless reuse asks to carry on with it."""
+    staging = staging_path(db_path)
+    if reuse and os.path.exists(staging):
+        return staging
+    remove_db(staging)
+    if not fresh and os.path.exists(db_path):
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            # A consistent snapshot even while the server or a writer has it open
+            conn.execute("VACUUM INTO ?", (staging,))
+        finally:
+            conn.close()
+    return staging
+
+
+def table_info(conn: sqlite3.Connection) -> dict:
+    """{name: without_rowid} of the ordinary tables."""
+    return {name: bool(wr) for _, name, kind, _, wr, _ in conn.execute("PRAGMA main.table_list")
+            if kind == "table" and not name.startswith("sqlite_")}
+
+
+def is_clustered(conn: sqlite3.Connection, table: str) -> bool:
+    return table_info(conn).get(table, False)
+
+
+def table_key(conn: sqlite3.Connection, table: str) -> list:
+    """Primary key columns in key order; FRAMES_KEY for frames without one (bulk ingest)."""
+    cols = sorted((pk, name) for _, name, _, _, _, pk in conn.execute(f'PRAGMA table_info("{table}")') if pk)
+    if not cols and table == "frames":
+        return FRAMES_KEY
+    return [name for _, name in cols]
+
+
+def avg_row_bytes(conn: sqlite3.Connection, table: str) -> float:
+    cols = [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+    size = " + ".join(f'IFNULL(LENGTH("{c}"), 0)' for c in cols)
+    row = conn.execute(f'SELECT AVG({size}) FROM (SELECT * FROM "{table}" LIMIT {SAMPLE_ROWS})').fetchone()
+    return row[0] or 0.0
+
+
+def cluster_candidates(conn: sqlite3.Connection, page_size: int) -> list:
+    """[(table, key)] to rewrite WITHOUT ROWID, printing why others are skipped."""
+    out = []
+    for table, without_rowid in table_info(conn).items():
+        key = table_key(conn, table)
+        if without_rowid or len(key) < 2:
+            continue  # already clustered, or an INTEGER PRIMARY KEY (the rowid)
+        if avg_row_bytes(conn, table) > page_size / CLUSTER_ROW_FRACTION:
+            continue
+        nulls = " OR ".join(f'"{c}" IS NULL' for c in key)
+        if conn.execute(f'SELECT 1 FROM "{table}" WHERE {nulls} LIMIT 1').fetchone():
+            print(f"  {table}: kept, NULL in key ({', '.join(key)})")
+            continue
+        out.append((table, key))
+    return out
+
+
+def clustered_sql(sql: str, name: str, key: list, has_key: bool) -> str:
+    """The table's own CREATE TABLE statement (constraints, defaults and
+    comments kept) renamed to name and made WITHOUT ROWID, with a PRIMARY KEY
+    on key added unless it has one (frames from the bulk ingest has none)."""
+    head = re.match(r'\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?'
+                    r'(?:"(?:[^"]|"")*"|\[[^\]]*\]|`[^`]*`|\w+)', sql, re.IGNORECASE)
+    body, close, options = sql[head.end():].rpartition(")")
+    if not has_key:
+        body += ", PRIMARY KEY ({})".format(", ".join(f'"{c}"' for c in key))
+    options = ", ".join(o for o in (options.strip(), "WITHOUT ROWID") if o)
+    return f'CREATE TABLE "{name}"{body}{close} {options}'
+
+
+def cluster_table(conn: sqlite3.Connection, table: str, key: list) -> int:
+    """Rewrite table as WITHOUT ROWID ordered by key. Returns the number of rows."""
+    cols = list(conn.execute(f'PRAGMA table_info("{table}")'))
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    key_sql = ", ".join(f'"{c}"' for c in key)
+    # Indexes on a prefix of the key (or the key itself) are the clustered b-tree now
+    indexes = []
+    for _, index, _, _, _ in conn.execute(f'PRAGMA index_list("{table}")'):
+        index_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (index,)).fetchone()[0]
+        columns = [r[2] for r in conn.execute(f'PRAGMA index_info("{index}")')]
+        if index_sql and columns != key[:len(columns)]:
+            indexes.append(index_sql)
+
+    tmp = f"{table}__clustered"
+    names = ", ".join(f'"{c[1]}"' for c in cols)
+    conn.execute(f'DROP TABLE IF EXISTS "{tmp}"')
+    conn.execute(clustered_sql(sql, tmp, key, has_key=any(c[5] for c in cols)))
+    rows = conn.execute(f'INSERT INTO "{tmp}" SELECT {names} FROM "{table}" ORDER BY {key_sql}').rowcount
+    conn.execute(f'DROP TABLE "{table}"')
+    conn.execute(f'ALTER TABLE "{tmp}" RENAME TO "{table}"')
+    for sql in indexes:
+        conn.execute(sql)
+    return rows
+
+
+def plan_status(details: list, table_rows: dict) -> str:
+    """'covering' when every table access is a key or covering-index search
+    (or reads a small table whole), 'lookup' when an index hit still reads
+    the table row, else 'scan'. A sort (temp b-tree) is a scan unless every
+    table in the query is small: the planner happily sorts a dozen rows."""
+    status = "covering"
+    tables = [d.split()[1] for d in details if d.startswith(("SCAN", "SEARCH"))]
+    small = {t for t in tables if table_rows.get(t, SMALL_TABLE_ROWS + 1) <= SMALL_TABLE_ROWS}
+    for detail in details:
+        if detail.startswith("USE TEMP B-TREE") and not small.issuperset(tables):
+            return "scan"
+        if detail.startswith("SCAN") and detail.split()[1] not in small:
+            return "scan"
+        if detail.startswith("SEARCH") and not any(
+                k in detail for k in ("PRIMARY KEY", "COVERING INDEX", "ROWID")):
+            status = "lookup"
+    return status
+
+
+def check_query_plans(conn: sqlite3.Connection) -> list:
+    """[(query name, status, plan details)] for the server queries this DB can serve."""
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    table_rows = {}
+    if "sqlite_stat1" in tables:
+        table_rows = {tbl: int(stat.split()[0]) for tbl, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1")}
+    out = []
+    for name, table, sql in SERVER_QUERIES:
+        if table not in tables:
+            continue
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", (0,) * sql.count("?")).fetchall()
+        details = [row[3] for row in plan]
+        out.append((name, plan_status(details, table_rows), details))
+    return out
+
+
+def print_plans(plans: list):
+    for name, status, details in plans:
+        print(f"  {name:<20}{status:<10}{'; '.join(details)}")
+
+
+def publish(staging: str, db_path: str, page_size: int = PAGE_SIZE) -> dict:
+    """Cluster, ANALYZE and compact staging into a new file and rename it over db_path.
+
+    staging is consumed (see start_build). Returns sizes and the query plans.
+    Raises PlanError, with db_path untouched, if a server query would scan.
+    """
+    print(f"Publishing {db_path}...")
+    t0 = time.perf_counter()
+    out_path = f"{staging}.publish"
+    remove_db(out_path)
+    conn = sqlite3.connect(staging)
+    try:
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("PRAGMA synchronous=OFF")
+        for table, key in cluster_candidates(conn, page_size):
+            t1 = time.perf_counter()
+            rows = cluster_table(conn, table, key)
+            print(f"  {table}: {rows:,} rows clustered on ({', '.join(key)}) "
+                  f"in {time.perf_counter() - t1:.1f}s")
+        conn.execute("ANALYZE")
+        # With few distinct leading values (23 nfl_ids in a play) ANALYZE makes
+        # a skip-scan of idx_frames_player, ANY(nfl_id) AND game_id AND play_id
+        # plus a sort, look cheaper than the frames key for "play frames", and
+        # the publish then stops on the scan. No server query needs skip-scans
+        # (test_publish.py builds such a DB)
+        conn.execute("UPDATE sqlite_stat1 SET stat = stat || ' noskipscan' WHERE idx IS NOT NULL")
+        conn.commit()
+        conn.execute(f"PRAGMA page_size={page_size}")
+        conn.execute("VACUUM INTO ?", (out_path,))
+    finally:
+        conn.close()
+
+    conn = sqlite3.connect(f"file:{out_path}?mode=ro", uri=True)
+    try:
+        plans = check_query_plans(conn)
+    finally:
+        conn.close()
+    print_plans(plans)
+    scans = [name for name, status, _ in plans if status == "scan"]
+    if scans:
+        remove_db(out_path)
+        raise PlanError(f"not publishing {db_path}: {', '.join(scans)} would scan "
+                        f"(staging left at {staging})")
+
+    # A -wal left by the old file would be replayed into the new one by the
+    # next connection: checkpoint it away first (needs no other connections)
+    if os.path.exists(f"{db_path}-wal"):
+        old = sqlite3.connect(db_path)
+        try:
+            old.execute("PRAGMA journal_mode=DELETE")
+        except sqlite3.OperationalError as e:
+            raise RuntimeError(f"{db_path} is open in WAL mode elsewhere ({e}); "
+                               f"close it once so its WAL can be checkpointed") from None
+        finally:
+            old.close()
+
+    staged_bytes = os.path.getsize(staging)
+    os.replace(out_path, db_path)
+    remove_db(staging)
+    size = os.path.getsize(db_path)
+    print(f"  {staged_bytes / 2**20:,.1f} MB staged -> {size / 2**20:,.1f} MB published "
+          f"({page_size:,}-byte pages) in {time.perf_counter() - t0:.1f}s")
+    return {"staged_bytes": staged_bytes, "published_bytes": size, "plans": plans}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--check", action="store_true", help="only print the server query plans")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.check:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+        try:
+            plans = check_query_plans(conn)
+        finally:
+            conn.close()
+        print_plans(plans)
+        if any(status == "scan" for _, status, _ in plans):
+            sys.exit(1)
+    else:
+        try:
+            publish(start_build(DB_PATH), DB_PATH, args.page_size)
+        except PlanError as e:
+            sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
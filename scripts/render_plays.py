@@ -0,0 +1,231 @@
+"""Render plays from metapitch.db to MP4/GIF clips without a display.
+
+Usage: python scripts/render_plays.py --plays 2022090800:56 2022090800:80 [--format mp4|gif]
+       python scripts/render_plays.py --game-id 2022090800 [--event pass_forward] [--limit 100]
+       python scripts/render_plays.py --where "quarter = 4 AND down = 3" --workers 8
+
+Plays are either listed explicitly (--plays GAME:PLAY ...) or selected from
+the plays table with --game-id / --event (plays whose frames contain that
+event) / --where (an SQL condition on plays columns), capped by --limit.
+
+Each worker process uses the Agg backend, opens the DB read-only, and
+creates the figure, field and artists once (draw_field / create_artists
+from viz_2d.py). Per play it renders the static background (field + title)
+once. Per frame it restores that background, draws only the moved artists,
+and hands the RGBA buffer straight to the encoder. MP4 frames are piped
+raw to ffmpeg. GIF frames are quantized against the first frame's palette
+and written with pillow. Clips go to --out as <game_id>_<play_id>.<format>,
+and frames/sec is reported per worker.
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+import numpy as np
+from PIL import Image
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+from viz_2d import bind_play, create_artists, draw_field, load_play, update_frame  # noqa: E402
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+OUT_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "clips")
+
+_worker = {}
+
+
+def select_plays(conn: sqlite3.Connection, game_id: int = None, event: str = None,
+                 where: str = None, limit: int = None) -> list:
+    """(game_id, play_id) for plays with frames matching every given filter."""
+    conds = ["p.frame_count > 0"]
+    params = []
+    if game_id is not None:
+        conds.append("p.game_id = ?")
+        params.append(game_id)
+    if event is not None:
+        has_team_id = any(r[1] == "team_id" for r in conn.execute("PRAGMA table_info(frames)"))
+        event_match = ("f.event_id = (SELECT id FROM lookup_events WHERE name = ?)" if has_team_id
+                       else "f.event = ?")
+        conds.append(f"EXISTS (SELECT 1 FROM frames f WHERE f.game_id = p.game_id "
+                     f"AND f.play_id = p.play_id AND {event_match})")
+        params.append(event)
+    if where:
+        conds.append(f"({where})")
+    sql = f"SELECT p.game_id, p.play_id FROM plays p WHERE {' AND '.join(conds)} ORDER BY p.game_id, p.play_id"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return conn.execute(sql, params).fetchall()
+
+
+def ffmpeg_path():
+    path = matplotlib.rcParams["animation.ffmpeg_path"]
+    return shutil.which(path)
+
+
+class ClipWriter:
+    """Encode RGBA frames of a fixed size to an MP4 (ffmpeg pipe) or GIF (pillow)."""
+
+    def __init__(self, path: str, fmt: str, fps: int, size: tuple):
+        self.path = path
+        self.fmt = fmt
+        self.fps = fps
+        self.size = size  # (width, height)
+        self.frames = []
+        self.palette = None
+        self.proc = None
+        if fmt == "mp4":
+            self.proc = subprocess.Popen(
+                [ffmpeg_path(), "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgba",
+                 "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-",
+                 "-vcodec", "libx264", "-pix_fmt", "yuv420p", path],
+                stdin=subprocess.PIPE,
+            )
+
+    def write(self, rgba: memoryview):
+        if self.proc is not None:
+            self.proc.stdin.write(rgba)
+            return
+        image = Image.frombuffer("RGBA", self.size, bytes(rgba), "raw", "RGBA", 0, 1).convert("RGB")
+        # Every frame shares the field's colours: quantize once, then map onto that palette
+        if self.palette is None:
+            self.palette = image.quantize(colors=64)
+            self.frames.append(self.palette)
+        else:
+            self.frames.append(image.quantize(palette=self.palette, dither=Image.Dither.NONE))
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.stdin.close()
+            if self.proc.wait():
+                raise RuntimeError(f"ffmpeg failed writing {self.path}")
+        elif self.frames:
+            self.frames[0].save(self.path, save_all=True, append_images=self.frames[1:],
+                                duration=int(1000 / self.fps), loop=0)
+
+
+def _init_worker(db_path: str, dpi: int):
+    fig, ax = plt.subplots(figsize=(14, 6.5), dpi=dpi)
+    fig.patch.set_facecolor("#1a1a1a")
+    draw_field(ax)
+    ax.set_title(" ", color="white", fontsize=11)  # reserve room for the per-play title
+    fig.tight_layout()
+    _worker.update(
+        conn=sqlite3.connect(f"file:{db_path}?mode=ro", uri=True),
+        fig=fig, ax=ax, artists=create_artists(ax),
+    )
+
+
+def render_play(key, out_dir: str, fmt: str, fps: int) -> tuple:
+    """Worker: write one clip. Returns (pid, key, path, frames, seconds)."""
+    t0 = time.perf_counter()
+    conn, fig, ax, artists = _worker["conn"], _worker["fig"], _worker["ax"], _worker["artists"]
+    game_id, play_id = key
+    play = load_play(conn, game_id, play_id)
+    n_frames = len(play["frame_ids"])
+    path = os.path.join(out_dir, f"{game_id}_{play_id}.{fmt}")
+    if n_frames == 0:
+        return os.getpid(), key, None, 0, time.perf_counter() - t0
+
+    teams = conn.execute("SELECT home_team, away_team FROM games WHERE game_id = ?", (game_id,)).fetchone()
+    home_team, away_team = teams or ("Home", "Away")
+    ax.set_title(f"{away_team} @ {home_team} | game {game_id} play {play_id}", color="white", fontsize=11)
+    bind_play(ax, artists, play)
+    description = play["info"].get("description") or ""
+
+    # The artists are animated, so a full draw renders just the background
+    canvas = fig.canvas
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+    width, height = canvas.get_width_height()
+    # libx264 with yuv420p needs even dimensions; crop the odd row/column
+    size = (width - width % 2, height - height % 2) if fmt == "mp4" else (width, height)
+
+    writer = ClipWriter(path, fmt, fps, size)
+    try:
+        for fi in range(n_frames):
+            canvas.restore_region(background)
+            artists["info_text"].set_text(f"frame {fi + 1}/{n_frames} | {description[:100]}")
+            for artist in update_frame(artists, play, fi):
+                ax.draw_artist(artist)
+            rgba = np.asarray(canvas.buffer_rgba())[:size[1], :size[0]]
+            writer.write(np.ascontiguousarray(rgba).data)
+    finally:
+        writer.close()
+    return os.getpid(), key, path, n_frames, time.perf_counter() - t0
+
+
+def render_plays(keys: list, db_path: str, out_dir: str, fmt: str, fps: int, workers: int, dpi: int) -> dict:
+    """Render every play across a process pool; returns {pid: [frames, seconds, clips]}."""
+    os.makedirs(out_dir, exist_ok=True)
+    per_worker = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_path, dpi)) as pool:
+        futures = [pool.submit(render_play, key, out_dir, fmt, fps) for key in keys]
+        for i, fut in enumerate(as_completed(futures), 1):
+            pid, (game_id, play_id), path, frames, secs = fut.result()
+            stats = per_worker.setdefault(pid, [0, 0.0, 0])
+            stats[0] += frames
+            stats[1] += secs
+            stats[2] += 1
+            note = os.path.basename(path) if path else "no frames, skipped"
+            print(f"  [{i}/{len(keys)}] {game_id}:{play_id} {note} "
+                  f"({frames} frames, {frames / secs:.1f} fps, worker {pid})")
+    return per_worker
+
+
+def parse_key(text: str) -> tuple:
+    game_id, play_id = text.split(":")
+    return int(game_id), int(play_id)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plays", nargs="+", type=parse_key, metavar="GAME:PLAY")
+    parser.add_argument("--game-id", type=int)
+    parser.add_argument("--event", help="only plays whose frames contain this event")
+    parser.add_argument("--where", help="SQL condition on plays columns, e.g. \"quarter = 4\"")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--format", choices=["mp4", "gif"], default="mp4")
+    parser.add_argument("--fps", type=int, default=10, help="clip frame rate (tracking is 10 Hz)")
+    parser.add_argument("--dpi", type=int, default=80)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default=OUT_DIR)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.format == "mp4" and not ffmpeg_path():
+        raise SystemExit("ffmpeg not found; install it or use --format gif")
+
+    if args.plays:
+        keys = args.plays
+    else:
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            keys = select_plays(conn, args.game_id, args.event, args.where, args.limit)
+        finally:
+            conn.close()
+    if not keys:
+        raise SystemExit("No plays selected")
+
+    print(f"Rendering {len(keys)} plays to {args.out} as {args.format} with {args.workers} workers...")
+    t0 = time.perf_counter()
+    per_worker = render_plays(keys, DB_PATH, args.out, args.format, args.fps, args.workers, args.dpi)
+    secs = time.perf_counter() - t0
+
+    total_frames = sum(s[0] for s in per_worker.values())
+    for pid, (frames, busy, clips) in sorted(per_worker.items()):
+        print(f"  worker {pid}: {clips} clips, {frames:,} frames, {frames / busy:.1f} fps")
+    print(f"  {total_frames:,} frames in {secs:.1f}s ({total_frames / secs:.1f} fps overall)")
+
+
+if __name__ == "__main__":
+    main()
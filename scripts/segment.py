@@ -0,0 +1,111 @@
+"""Split continuous match tracking into possession / phase-of-play segments.
+
+Works on per-frame arrays (ball position, each team's nearest-player
+distance to the ball, period) so any continuous source can use it; see
+ingest_metrica.py for how those are extracted.
+
+Heuristics:
+  - dead ball: the ball is missing or (almost) still for DEAD_BALL_S;
+  - control: the team with the nearest player, if within CONTROL_DIST;
+    in-flight frames keep the last controlling team, and a change only
+    counts once the new team has held the ball for MIN_HOLD_S;
+  - a new segment starts whenever the phase (home / away / dead) or the
+    period changes; segments shorter than MIN_SEGMENT_S are folded into
+    the previous one and segments longer than MAX_SEGMENT_S are split.
+"""
+
+import numpy as np
+
+DEAD_BALL_S = 2.0
+BALL_STILL_SPEED = 0.3  # m/s
+CONTROL_DIST = 2.0  # m
+MIN_HOLD_S = 1.0
+MIN_SEGMENT_S = 3.0
+MAX_SEGMENT_S = 60.0
+
+DEAD, HOME, AWAY = 0, 1, 2
+PHASE_NAMES = {DEAD: "Dead ball", HOME: "Home possession", AWAY: "Away possession"}
+
+
+def runs(values: np.ndarray):
+    """Run-length encode: (starts, ends inclusive, values)."""
+    n = len(values)
+    if n == 0:
+        return np.array([], int), np.array([], int), values[:0]
+    change = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate([[0], change])
+    ends = np.append(change - 1, n - 1)
+    return starts, ends, values[starts]
+
+
+def dead_ball_mask(ball_x: np.ndarray, ball_y: np.ndarray, fps: float) -> np.ndarray:
+    speed = np.full(len(ball_x), np.nan)
+    speed[1:] = np.hypot(np.diff(ball_x), np.diff(ball_y)) * fps
+    candidate = np.isnan(ball_x) | (np.nan_to_num(speed, nan=0.0) < BALL_STILL_SPEED)
+
+    dead = np.zeros(len(ball_x), dtype=bool)
+    min_len = int(DEAD_BALL_S * fps)
+    for s, e, v in zip(*runs(candidate)):
+        if v and e - s + 1 >= min_len:
+            dead[s:e + 1] = True
+    return dead
+
+
+def possession(home_dist: np.ndarray, away_dist: np.ndarray, fps: float) -> np.ndarray:
+    """HOME / AWAY per frame, carried through in-flight frames and debounced."""
+    h = np.nan_to_num(home_dist, nan=np.inf)
+    a = np.nan_to_num(away_dist, nan=np.inf)
+    owner = np.where(h <= a, HOME, AWAY)
+    owner[np.minimum(h, a) > CONTROL_DIST] = DEAD  # nobody in control yet
+
+    # Forward-fill uncontrolled frames with the last owner (back-fill the start)
+    idx = np.where(owner != DEAD, np.arange(len(owner)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    owner = owner[idx]
+    if (owner == DEAD).any() and (owner != DEAD).any():
+        owner[owner == DEAD] = owner[owner != DEAD][0]
+    owner[owner == DEAD] = HOME
+
+    # Short spells (deflections, tackles that don't stick) don't change possession
+    min_hold = int(MIN_HOLD_S * fps)
+    starts, ends, values = runs(owner)
+    for i in range(1, len(starts)):
+        if ends[i] - starts[i] + 1 < min_hold:
+            values[i] = values[i - 1]
+            owner[starts[i]:ends[i] + 1] = values[i]
+    return owner
+
+
+def segment_frames(ball_x, ball_y, home_dist, away_dist, period, fps: float) -> list:
+    """Segments as [(start_idx, end_idx inclusive, phase)] over the frame arrays."""
+    phase = possession(home_dist, away_dist, fps)
+    phase[dead_ball_mask(ball_x, ball_y, fps)] = DEAD
+
+    # Period changes always cut; encode (period, phase) as one run key
+    key = np.asarray(period, dtype=np.int64) * 4 + phase
+    starts, ends, _ = runs(key)
+
+    min_len = int(MIN_SEGMENT_S * fps)
+    merged = []
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        same_period = merged and period[merged[-1][0]] == period[s]
+        if merged and same_period and (e - s + 1 < min_len or merged[-1][1] - merged[-1][0] + 1 < min_len):
+            merged[-1][1] = e
+        else:
+            merged.append([s, e])
+
+    max_len = int(MAX_SEGMENT_S * fps)
+    segments = []
+    for s, e in merged:
+        # A merged segment is labelled by its dominant phase
+        label = int(np.bincount(phase[s:e + 1], minlength=3).argmax())
+        pieces = -(-(e - s + 1) // max_len)
+        bounds = np.linspace(s, e + 1, pieces + 1).astype(int)
+        segments.extend((int(a), int(b) - 1, label) for a, b in zip(bounds[:-1], bounds[1:]))
+    return segments
+
+
+def describe(phase: int, period: int, start_s: float, end_s: float) -> str:
+    def clock(t):
+        return f"{int(t // 60):02d}:{int(t % 60):02d}"
+    return f"{PHASE_NAMES[phase]} (P{period} {clock(start_s)}-{clock(end_s)})"
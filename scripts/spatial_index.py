@@ -0,0 +1,195 @@
+"""Spatio-temporal R*Tree over frames for region and time-window queries.
+
+Usage: python scripts/spatial_index.py [--build]
+       python scripts/spatial_index.py --region penalty_box_right --frames 40 80 [--game-id G --play-id P] [--ball]
+       python scripts/spatial_index.py --box 88.5 105 13.84 54.16
+
+frames_rtree is an SQLite R*Tree with one point per frame row over five
+dimensions:
+
+  x, y        position
+  frame       frame_id
+  play        frames_rtree_plays.play (a small dense integer, exact in the
+              R*Tree's 32-bit floats, unlike game_id)
+  kind        0 = player, 1 = ball
+
+so "players in the box between frames 40-80 of this play" and "every frame
+where the ball was in the final third" are both a single box lookup.
+R*Tree coordinates are stored as 32-bit floats and rounded outwards, so
+hits are joined back to frames and re-checked against the exact x/y.
+Each point carries the frames key (game_id, play_id, frame_id, nfl_id) as
+auxiliary columns and the join is on that key, so the index works on a
+published DB whose frames is WITHOUT ROWID (see publish.py).
+
+The index mirrors frames row for row, so it is rebuilt as a whole:
+ingest.py does that after every run that changed frames once the table
+exists (or with --spatial), and --build here does it on demand, on a
+staging copy that is published over the DB when it is done.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import publish
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+PLAYER, BALL = 0, 1
+
+# (x_min, x_max, y_min, y_max). Soccer sources use a 105 x 68 m pitch, BDB a
+# 120 x 53.3 yd field normalized so the offense moves towards x = 120.
+REGIONS = {
+    "penalty_box_left": (0.0, 16.5, 13.84, 54.16),
+    "penalty_box_right": (88.5, 105.0, 13.84, 54.16),
+    "final_third": (70.0, 105.0, 0.0, 68.0),
+    "red_zone": (90.0, 110.0, 0.0, 53.3),
+    "end_zone": (110.0, 120.0, 0.0, 53.3),
+}
+
+RTREE_DDL = """
+    CREATE VIRTUAL TABLE frames_rtree USING rtree(
+        id,
+        min_x, max_x,
+        min_y, max_y,
+        min_frame, max_frame,
+        min_play, max_play,
+        min_kind, max_kind,
+        +game_id, +play_id, +frame_id, +nfl_id
+    );
+    CREATE TABLE frames_rtree_plays (
+        play INTEGER PRIMARY KEY,
+        game_id INTEGER NOT NULL,
+        play_id INTEGER NOT NULL,
+        UNIQUE (game_id, play_id)
+    );
+"""
+
+
+def build_spatial_index(conn: sqlite3.Connection) -> int:
+    """(Re)build frames_rtree from frames. Returns the number of indexed rows."""
+    print("Building spatial index...")
+    t0 = time.perf_counter()
+    conn.execute("DROP TABLE IF EXISTS frames_rtree")
+    conn.execute("DROP TABLE IF EXISTS frames_rtree_plays")
+    conn.executescript(RTREE_DDL)
+    conn.execute("INSERT INTO frames_rtree_plays (game_id, play_id) "
+                 "SELECT game_id, play_id FROM plays ORDER BY game_id, play_id")
+    # Inserting in (kind, play, frame) order keeps R*Tree nodes tight on those axes
+    kind = f"CASE WHEN f.nfl_id IS NULL OR f.nfl_id = -1 THEN {BALL} ELSE {PLAYER} END"
+    conn.execute(f"""
+        INSERT INTO frames_rtree
+        SELECT NULL, f.x, f.x, f.y, f.y, f.frame_id, f.frame_id, p.play, p.play, {kind}, {kind},
+               f.game_id, f.play_id, f.frame_id, f.nfl_id
+        FROM frames f
+        JOIN frames_rtree_plays p ON p.game_id = f.game_id AND p.play_id = f.play_id
+        ORDER BY 10, 8, 6
+    """)
+    conn.commit()
+    rows = conn.execute("SELECT COUNT(*) FROM frames_rtree").fetchone()[0]
+    print(f"  {rows:,} rows in {time.perf_counter() - t0:.1f}s")
+    return rows
+
+
+def play_number(conn: sqlite3.Connection, game_id: int, play_id: int):
+    row = conn.execute(
+        "SELECT play FROM frames_rtree_plays WHERE game_id = ? AND play_id = ?", (game_id, play_id)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def region_query(conn: sqlite3.Connection, x_min: float, x_max: float, y_min: float, y_max: float,
+                 frame_min: int = None, frame_max: int = None,
+                 game_id: int = None, play_id: int = None, kind: int = None) -> list:
+    """Frame rows inside the box, as (game_id, play_id, frame_id, nfl_id, x, y).
+
+    frame_min/frame_max bound frame_id (inclusive); game_id + play_id
+    restrict to one play; kind is PLAYER, BALL or None for both.
+    """
+    if (game_id is None) != (play_id is None):
+        raise ValueError("game_id and play_id go together")
+    play_lo, play_hi = -1e12, 1e12
+    if game_id is not None:
+        number = play_number(conn, game_id, play_id)
+        if number is None:
+            return []
+        play_lo = play_hi = number
+    kind_lo, kind_hi = (PLAYER, BALL) if kind is None else (kind, kind)
+    frame_lo = -1e12 if frame_min is None else frame_min
+    frame_hi = 1e12 if frame_max is None else frame_max
+
+    return conn.execute("""
+        SELECT f.game_id, f.play_id, f.frame_id, f.nfl_id, f.x, f.y
+        FROM frames_rtree r
+        JOIN frames f ON f.game_id = r.game_id AND f.play_id = r.play_id
+                     AND f.frame_id = r.frame_id AND f.nfl_id IS r.nfl_id
+        WHERE r.max_x >= ? AND r.min_x <= ?
+          AND r.max_y >= ? AND r.min_y <= ?
+          AND r.max_frame >= ? AND r.min_frame <= ?
+          AND r.max_play >= ? AND r.min_play <= ?
+          AND r.max_kind >= ? AND r.min_kind <= ?
+          AND f.x BETWEEN ? AND ? AND f.y BETWEEN ? AND ?
+        ORDER BY f.game_id, f.play_id, f.frame_id, f.nfl_id
+    """, (x_min, x_max, y_min, y_max, frame_lo, frame_hi, play_lo, play_hi, kind_lo, kind_hi,
+          x_min, x_max, y_min, y_max)).fetchall()
+
+
+def players_in_region(conn: sqlite3.Connection, region, frame_min: int = None, frame_max: int = None,
+                      game_id: int = None, play_id: int = None) -> list:
+    """Player rows inside `region` (a REGIONS name or an (x_min, x_max, y_min, y_max) box)."""
+    box = REGIONS[region] if isinstance(region, str) else region
+    return region_query(conn, *box, frame_min, frame_max, game_id, play_id, kind=PLAYER)
+
+
+def ball_in_region(conn: sqlite3.Connection, region, frame_min: int = None, frame_max: int = None,
+                   game_id: int = None, play_id: int = None) -> list:
+    """Ball rows inside `region`; one per (game_id, play_id, frame_id)."""
+    box = REGIONS[region] if isinstance(region, str) else region
+    return region_query(conn, *box, frame_min, frame_max, game_id, play_id, kind=BALL)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--build", action="store_true", help="(re)build frames_rtree")
+    parser.add_argument("--region", choices=sorted(REGIONS))
+    parser.add_argument("--box", type=float, nargs=4, metavar=("X_MIN", "X_MAX", "Y_MIN", "Y_MAX"))
+    parser.add_argument("--frames", type=int, nargs=2, metavar=("FIRST", "LAST"))
+    parser.add_argument("--game-id", type=int)
+    parser.add_argument("--play-id", type=int)
+    parser.add_argument("--ball", action="store_true", help="query the ball instead of players")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.build:
+        staging = publish.start_build(DB_PATH)
+        conn = sqlite3.connect(staging)
+        try:
+            build_spatial_index(conn)
+        finally:
+            conn.close()
+        publish.publish(staging, DB_PATH)
+    box = REGIONS[args.region] if args.region else args.box
+    if box is None:
+        return
+
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        first, last = args.frames or (None, None)
+        query = ball_in_region if args.ball else players_in_region
+        t0 = time.perf_counter()
+        rows = query(conn, tuple(box), first, last, args.game_id, args.play_id)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"{len(rows):,} {'ball' if args.ball else 'player'} rows in {ms:.1f} ms")
+        for row in rows[:20]:
+            print(f"  {row}")
+        if len(rows) > 20:
+            print(f"  ... {len(rows) - 20:,} more")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
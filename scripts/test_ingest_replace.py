@@ -0,0 +1,70 @@
+"""Tests for ingest.py replacing a changed tracking week.
+
+Usage: python -m pytest scripts/test_ingest_replace.py
+"""
+
+import sqlite3
+
+import pytest
+
+from play_payloads import decode_payload
+from test_ingest_resume import FRAMES, GAMES, PLAYS, dataset, run_ingest  # noqa: F401 (fixture)
+
+PLAY_TABLES = ("frames", "play_catalog", "events", "play_payloads")
+
+
+def drop_play(path, game, play):
+    """Rewrite a tracking CSV without one play's rows."""
+    with open(path) as f:
+        lines = f.readlines()
+    prefix = f"{game},{play},"
+    with open(path, "w") as f:
+        f.writelines(line for line in lines if not line.startswith(prefix))
+
+
+def play_counts(db_path, game):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {table: dict(conn.execute(
+            f"SELECT play_id, COUNT(*) FROM {table} WHERE game_id = ? GROUP BY play_id", (game,)))
+            for table in PLAY_TABLES}
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_play_removed_from_week_is_deleted(dataset, workers):
+    data_dir, db_path = dataset
+    args = ["--workers", str(workers)]
+    assert run_ingest(data_dir, db_path, args=args).returncode == 0
+    conn = sqlite3.connect(db_path)
+    try:
+        # Cache the payloads so the replace has to clear them too
+        conn.execute("CREATE TABLE play_payloads (game_id INTEGER, play_id INTEGER, payload BLOB, "
+                     "PRIMARY KEY (game_id, play_id))")
+        conn.executemany("INSERT INTO play_payloads VALUES (?, ?, x'00')",
+                         [(g, p) for g in GAMES.values() for p in PLAYS])
+        conn.commit()
+    finally:
+        conn.close()
+    week_1 = play_counts(db_path, GAMES[1])
+    before = play_counts(db_path, GAMES[2])
+    assert all(set(before[t]) == set(PLAYS) for t in PLAY_TABLES)
+
+    drop_play(data_dir / "tracking_week_2.csv", GAMES[2], PLAYS[1])
+    rerun = run_ingest(data_dir, db_path, args=args)
+    assert rerun.returncode == 0, rerun.stderr
+
+    after = play_counts(db_path, GAMES[2])
+    for table in ("frames", "play_catalog", "events"):
+        assert set(after[table]) == {PLAYS[0]}, table
+        assert after[table][PLAYS[0]] == before[table][PLAYS[0]], table
+    assert PLAYS[1] not in after["play_payloads"]
+    conn = sqlite3.connect(db_path)
+    try:
+        (blob,) = conn.execute("SELECT payload FROM play_payloads WHERE game_id = ? AND play_id = ?",
+                               (GAMES[2], PLAYS[0])).fetchone()
+    finally:
+        conn.close()
+    assert decode_payload(blob)["frameCount"] == FRAMES  # rebuilt, not left empty
+    assert play_counts(db_path, GAMES[1]) == week_1
@@ -0,0 +1,141 @@
+"""Crash-and-resume tests for ingest.py's staging file.
+
+Usage: python -m pytest scripts/test_ingest_resume.py
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+GAMES = {1: 2022090801, 2: 2022090802}
+PLAYERS = [1000, 1001, 1002]
+PLAYS = [50, 100]
+FRAMES = 30
+
+# ingest.main(*ARGS) on DATA_DIR/DB_PATH from the environment; CRASH_GAME kills
+# the process right after a chunk of that game's frames is written
+RUN = """
+import os, sys
+sys.path.insert(0, os.environ["SCRIPTS"])
+import ingest
+ingest.DATA_DIR, ingest.DB_PATH = os.environ["DATA"], os.environ["DB"]
+if "CRASH_GAME" in os.environ:
+    write_frames = ingest.write_frames
+    def crash(conn, out, *args):
+        write_frames(conn, out, *args)
+        if (out["game_id"] == int(os.environ["CRASH_GAME"])).any():
+            os._exit(9)  # killed mid-week: no commit, no cleanup
+    ingest.write_frames = crash
+sys.argv = ["ingest.py"] + os.environ.get("ARGS", "").split()
+ingest.main()
+"""
+
+
+def write_dataset(data_dir):
+    with open(os.path.join(data_dir, "games.csv"), "w") as f:
+        f.write("gameId,season,week,gameDate,gameTimeEastern,homeTeamAbbr,visitorTeamAbbr,"
+                "homeFinalScore,visitorFinalScore\n")
+        for week, game in GAMES.items():
+            f.write(f"{game},2022,{week},09/08/2022,20:20:00,LA,BUF,10,31\n")
+    with open(os.path.join(data_dir, "players.csv"), "w") as f:
+        f.write("nflId,height,weight,birthDate,collegeName,position,displayName\n")
+        for nfl_id in PLAYERS:
+            f.write(f"{nfl_id},6-2,200,1990-01-01,X,WR,Player {nfl_id}\n")
+    with open(os.path.join(data_dir, "plays.csv"), "w") as f:
+        f.write("gameId,playId,playDescription,quarter,down,yardsToGo,possessionTeam,defensiveTeam,"
+                "yardlineSide,yardlineNumber,yardsGained\n")
+        for game in GAMES.values():
+            for play in PLAYS:
+                f.write(f"{game},{play},synthetic play,1,1,10,BUF,LA,LA,25,5\n")
+    for week, game in GAMES.items():
+        with open(os.path.join(data_dir, f"tracking_week_{week}.csv"), "w") as f:
+            f.write("gameId,playId,nflId,displayName,frameId,frameType,time,jerseyNumber,club,"
+                    "playDirection,x,y,s,a,dis,o,dir,event\n")
+            for play in PLAYS:
+                for frame in range(1, FRAMES + 1):
+                    event = "ball_snap" if frame == 1 else ""
+                    for i, nfl_id in enumerate(PLAYERS):
+                        club = "LA" if i % 2 else "BUF"
+                        f.write(f"{game},{play},{nfl_id},Player {nfl_id},{frame},SNAP,"
+                                f"2022-09-08 20:24:{frame / 10:04.1f},{i + 1},{club},right,"
+                                f"{20 + frame * 0.5 + i},{10 + i},3.0,1.0,0.3,90.0,90.0,{event}\n")
+                    f.write(f"{game},{play},,football,{frame},SNAP,2022-09-08 20:24:{frame / 10:04.1f},"
+                            f",football,right,{20 + frame * 0.5},20.0,5.0,1.0,0.5,,,{event}\n")
+
+
+def run_ingest(data_dir, db_path, crash_game=None, args=()):
+    env = dict(os.environ, SCRIPTS=SCRIPTS, DATA=str(data_dir), DB=str(db_path), ARGS=" ".join(args))
+    if crash_game is not None:
+        env["CRASH_GAME"] = str(crash_game)
+    return subprocess.run([sys.executable, "-c", RUN], env=env, capture_output=True, text=True)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    write_dataset(data_dir)
+    return data_dir, tmp_path / "metapitch.db"
+
+
+def manifest(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute("SELECT path, status FROM ingest_manifest"))
+    finally:
+        conn.close()
+
+
+def test_killed_week_is_resumed(dataset):
+    data_dir, db_path = dataset
+    staging = str(db_path).replace(".db", ".staging.db")
+
+    killed = run_ingest(data_dir, db_path, crash_game=GAMES[2])
+    assert killed.returncode == 9, killed.stderr
+    assert not db_path.exists()
+    assert manifest(staging)["tracking_week_1.csv"] == "done"
+    assert manifest(staging)["tracking_week_2.csv"] == "pending"
+
+    resumed = run_ingest(data_dir, db_path)
+    assert resumed.returncode == 0, resumed.stderr
+    assert "Resuming the crashed run" in resumed.stdout
+    assert "tracking_week_1.csv unchanged, skipping" in resumed.stdout
+    assert "Loading tracking_week_2.csv" in resumed.stdout
+    assert not os.path.exists(staging)
+
+    assert set(manifest(db_path).values()) == {"done"}
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT game_id, COUNT(*) FROM frames GROUP BY game_id").fetchall()
+        counts = conn.execute("SELECT DISTINCT frame_count FROM plays").fetchall()
+    finally:
+        conn.close()
+    per_game = len(PLAYS) * FRAMES * (len(PLAYERS) + 1)
+    assert rows == [(GAMES[1], per_game), (GAMES[2], per_game)]
+    assert counts == [(FRAMES,)]
+
+
+def test_unchanged_run_keeps_refreshed_mtimes(dataset):
+    data_dir, db_path = dataset
+    assert run_ingest(data_dir, db_path).returncode == 0
+    inode = os.stat(db_path).st_ino
+
+    week_1 = data_dir / "tracking_week_1.csv"
+    os.utime(week_1, (1_700_000_000, 1_700_000_000))
+    touched = run_ingest(data_dir, db_path)
+    assert touched.returncode == 0, touched.stderr
+    assert "Nothing changed since the last run." in touched.stdout
+    assert os.stat(db_path).st_ino == inode  # nothing was published
+
+    conn = sqlite3.connect(db_path)
+    try:
+        mtime = conn.execute(
+            "SELECT mtime FROM ingest_manifest WHERE path = 'tracking_week_1.csv'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    assert mtime == os.stat(week_1).st_mtime
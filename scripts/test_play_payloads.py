@@ -0,0 +1,21 @@
+"""play_payloads.build_payload against the getPlayData fixture.
+
+Usage: python -m pytest scripts/test_play_payloads.py
+"""
+
+import json
+
+from play_payloads import FIXTURE_PATH, check_fixture
+
+
+def test_fixture_matches_get_play_data():
+    assert check_fixture()
+
+
+def test_fixture_catches_drift(tmp_path):
+    with open(FIXTURE_PATH) as f:
+        fixture = json.load(f)
+    fixture["payload"]["players"]["ball"]["name"] = "ball"  # getPlayData says "Ball"
+    path = tmp_path / "play-payload.json"
+    path.write_text(json.dumps(fixture))
+    assert not check_fixture(str(path))
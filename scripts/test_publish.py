@@ -0,0 +1,75 @@
+"""publish.py's clustering and query plans on a small staging DB.
+
+Usage: python -m pytest scripts/test_publish.py
+"""
+
+import sqlite3
+
+import publish
+from ingest import frames_ddl
+
+GAMES = [2022090801, 2022090802]
+PLAYS = 10
+FRAMES = 300
+PLAYERS = list(range(1000, 1022)) + [-1]  # 22 players and the ball
+
+
+def staging_db(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(frames_ddl(primary_key=False))
+        conn.execute("CREATE INDEX idx_frames_player ON frames(nfl_id, game_id)")
+        conn.executemany(
+            "INSERT INTO frames (game_id, play_id, frame_id, nfl_id, x, y) VALUES (?, ?, ?, ?, ?, ?)",
+            ((g, p, f, n, f * 0.1, 20.0) for g in GAMES for p in range(1, PLAYS + 1)
+             for f in range(1, FRAMES + 1) for n in PLAYERS))
+        conn.execute("""
+            CREATE TABLE ratings (
+                game_id INTEGER NOT NULL,
+                play_id INTEGER NOT NULL,
+                -- 0 to 5 stars
+                stars INTEGER NOT NULL DEFAULT 3 CHECK (stars BETWEEN 0 AND 5),
+                label TEXT UNIQUE,
+                PRIMARY KEY (game_id, play_id)
+            )""")
+        conn.executemany("INSERT INTO ratings (game_id, play_id, label) VALUES (?, ?, ?)",
+                         ((g, p, f"{g}-{p}") for g in GAMES for p in range(1, PLAYS + 1)))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_publish_clusters_and_keeps_constraints(tmp_path):
+    db_path = str(tmp_path / "metapitch.db")
+    staging = publish.start_build(db_path, fresh=True)
+    staging_db(staging)
+    publish.publish(staging, db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert publish.is_clustered(conn, "frames")
+        assert publish.table_key(conn, "frames") == list(publish.FRAMES_KEY)
+        assert publish.is_clustered(conn, "ratings")
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'ratings'").fetchone()[0]
+        assert "-- 0 to 5 stars" in sql
+        conn.execute("INSERT INTO ratings (game_id, play_id) VALUES (1, 1)")
+        assert conn.execute("SELECT stars FROM ratings WHERE game_id = 1").fetchone() == (3,)
+        for bad in ("INSERT INTO ratings VALUES (1, 2, 9, NULL)",
+                    f"INSERT INTO ratings VALUES (1, 3, 1, '{GAMES[0]}-1')"):
+            try:
+                conn.execute(bad)
+            except sqlite3.IntegrityError:
+                continue
+            raise AssertionError(f"constraint lost: {bad}")
+    finally:
+        conn.close()
+
+
+def test_play_frames_use_the_key_not_a_skip_scan(tmp_path):
+    # 23 nfl_ids over 138,000 rows: without noskipscan in sqlite_stat1 the
+    # planner reads a play through ANY(nfl_id) of idx_frames_player and sorts
+    db_path = str(tmp_path / "metapitch.db")
+    staging = publish.start_build(db_path, fresh=True)
+    staging_db(staging)
+    plans = {name: details for name, _, details in publish.publish(staging, db_path)["plans"]}
+    assert plans["play frames"] == ["SEARCH frames USING PRIMARY KEY (game_id=? AND play_id=?)"]
@@ -0,0 +1,100 @@
+"""Round-trip tests for track_codec.py.
+
+Usage: python -m pytest scripts/test_track_codec.py
+"""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+import track_codec
+from track_codec import MAX_ERROR, decode_track, encode_track
+
+
+def track(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * 0.1
+    return {
+        "frame_id": np.arange(1, n + 1, dtype=np.float64),
+        "x": 50 + 8 * t + rng.normal(0, 0.3, n),
+        "y": 26 + 5 * np.sin(t) + rng.normal(0, 0.3, n),
+        "vx": rng.normal(0, 4, n),
+        "vy": rng.normal(0, 4, n),
+    }
+
+
+def assert_round_trip(cols, decoded, tol=MAX_ERROR):
+    for name, values in cols.items():
+        values = np.asarray(values, dtype=np.float64)
+        assert np.array_equal(np.isnan(values), np.isnan(decoded[name])), name
+        ok = ~np.isnan(values)
+        assert np.abs(decoded[name][ok] - values[ok]).max(initial=0) <= tol + 1e-9, name
+
+
+def test_error_bound():
+    cols = track()
+    assert_round_trip(cols, decode_track(encode_track(cols)))
+
+
+def test_grid_values_are_exact():
+    cols = {name: np.round(values, 2) for name, values in track(seed=1).items()}
+    decoded = decode_track(encode_track(cols))
+    for name in cols:
+        assert decoded[name].tolist() == cols[name].tolist(), name
+
+
+def test_nulls_survive():
+    cols = track(50)
+    cols["vx"][:3] = np.nan
+    cols["vx"][20:25] = np.nan
+    cols["vy"][:] = np.nan
+    assert_round_trip(cols, decode_track(encode_track(cols)))
+
+
+def test_large_jumps_fall_back_to_int32_deltas():
+    cols = track(10)
+    cols["x"][5] = 5000.0  # 495 units, beyond int16 centimetre deltas
+    cols["frame_id"][6:] += 100_000  # gap in frames
+    blob = encode_track(cols)
+    assert_round_trip(cols, decode_track(blob))
+
+
+def test_single_frame_and_size():
+    one = {name: values[:1] for name, values in track().items()}
+    assert_round_trip(one, decode_track(encode_track(one)))
+    cols = track(1000)
+    # int16 deltas: about 2 bytes per value instead of 8
+    assert len(encode_track(cols)) < 1000 * len(cols) * 2 + 100
+
+
+def test_out_of_range_raises():
+    cols = track(5)
+    cols["x"][2] = 1e8
+    with pytest.raises(ValueError):
+        encode_track(cols)
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_table_round_trip(compression):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""CREATE TABLE frames (game_id, play_id, frame_id, nfl_id, x, y, vx, vy,
+                                         orientation, team, jersey_number, display_name, event)""")
+    cols = track(30)
+    rows = []
+    for i in range(30):
+        rows.append((1, 2, i + 1, 7, round(cols["x"][i], 2), round(cols["y"][i], 2),
+                     round(cols["vx"][i], 2), None if i == 4 else round(cols["vy"][i], 2),
+                     None, "home", 7, "P", None))
+        rows.append((1, 2, i + 1, None, 1.0 + i, 2.0, None, None, None, "ball", None, None, None))
+    conn.executemany("INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    stats = track_codec.build_track_blobs(conn, compression)
+    assert stats == {**stats, "tracks": 2, "rows": 60}
+    player = track_codec.load_track(conn, 1, 2, 7)
+    assert player["x"].tolist() == [r[4] for r in rows[::2]]
+    assert np.isnan(player["vy"][4]) and not np.isnan(player["vy"][5])
+    ball = track_codec.load_track(conn, 1, 2, -1)
+    assert ball["x"].tolist() == [1.0 + i for i in range(30)]
+    assert np.isnan(ball["vx"]).all()
+    assert track_codec.load_track(conn, 1, 2, 99) is None
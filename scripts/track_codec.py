@@ -0,0 +1,273 @@
+"""Quantized, delta-encoded per-track blobs of frame positions and velocities.
+
+Usage: python scripts/track_codec.py [--build] [--compression zlib|zstd|none] [--bench]
+
+Every (game, play, entity) track is stored as one track_blobs row instead of
+one frames row per frame. The blob holds COLUMNS, each quantized to
+1/SCALE field units (centimetres for Metrica, 0.01 yd for BDB, which
+ingest_tracking already rounds to) and delta-encoded:
+
+  header   b"TK", version, column count, frame count (uint32)
+  column   flags (uint8), first value (int32),
+           [null bitmap, ceil(n / 8) bytes, when some values are NULL],
+           n - 1 deltas as int16, or int32 if any delta overflows int16
+
+Round-trip bound: |decoded - stored| <= 0.5 / SCALE (0.005 units, up to
+float rounding), and values already on the 0.01 grid come back exactly.
+NULLs stay NULL.
+encode_track() raises ValueError for values outside the int32 range.
+
+The whole blob is then optionally compressed (zlib by default, zstd when
+the zstandard package is installed). --bench decodes every stored track
+and reports decode throughput over a read-only connection; --build
+prints the storage reduction against the 8-byte REAL columns of frames
+and, like the other builders, writes into a staging copy that is
+published over the DB (see publish.py).
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+import struct
+import time
+import zlib
+
+import numpy as np
+
+import publish
+from play_payloads import frame_rows
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+
+MAGIC = b"TK"
+VERSION = 1
+COLUMNS = ("frame_id", "x", "y", "vx", "vy")
+SCALE = {"frame_id": 1, "x": 100, "y": 100, "vx": 100, "vy": 100}
+MAX_ERROR = 0.5 / 100
+
+WIDE = 1      # deltas stored as int32
+SOME_NULL = 2  # null bitmap follows the first value
+ALL_NULL = 4   # no values stored
+
+HEADER = struct.Struct("<2sBBI")
+COLUMN = struct.Struct("<Bi")
+INT32 = np.iinfo(np.int32)
+INT16 = np.iinfo(np.int16)
+
+
+def _encode_column(values: np.ndarray, scale: int) -> bytes:
+    null = np.isnan(values)
+    if null.all():
+        return COLUMN.pack(ALL_NULL, 0)
+    flags = 0
+    if null.any():
+        flags |= SOME_NULL
+        # Carry the last value through gaps so they cost a zero delta
+        idx = np.where(~null, np.arange(len(values)), 0)
+        np.maximum.accumulate(idx, out=idx)
+        values = values[idx]
+        values[: np.argmax(~null)] = values[np.argmax(~null)]
+    q = np.rint(values * scale)
+    if q.min() < INT32.min or q.max() > INT32.max:
+        raise ValueError(f"value out of range for 1/{scale} int32 quantization")
+    q = q.astype(np.int64)
+    deltas = np.diff(q)
+    if len(deltas) and (deltas.min() < INT16.min or deltas.max() > INT16.max):
+        flags |= WIDE
+        deltas = deltas.astype("<i4")
+    else:
+        deltas = deltas.astype("<i2")
+    parts = [COLUMN.pack(flags, int(q[0]))]
+    if flags & SOME_NULL:
+        parts.append(np.packbits(null).tobytes())
+    parts.append(deltas.tobytes())
+    return b"".join(parts)
+
+
+def encode_track(cols: dict) -> bytes:
+    """Encode one track; cols maps every name in COLUMNS to a float array (NaN = NULL)."""
+    n = len(cols["frame_id"])
+    parts = [HEADER.pack(MAGIC, VERSION, len(COLUMNS), n)]
+    for name in COLUMNS:
+        values = np.asarray(cols[name], dtype=np.float64)
+        if len(values) != n:
+            raise ValueError(f"column {name} has {len(values)} values, expected {n}")
+        parts.append(_encode_column(values.copy(), SCALE[name]))
+    return b"".join(parts)
+
+
+def decode_track(blob: bytes) -> dict:
+    """Inverse of encode_track: {column: float64 array}, NaN where the value was NULL."""
+    magic, version, ncols, n = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION or ncols != len(COLUMNS):
+        raise ValueError("not a version 1 track blob")
+    pos = HEADER.size
+    out = {}
+    for name in COLUMNS:
+        flags, first = COLUMN.unpack_from(blob, pos)
+        pos += COLUMN.size
+        if flags & ALL_NULL:
+            out[name] = np.full(n, np.nan)
+            continue
+        null = None
+        if flags & SOME_NULL:
+            nbytes = (n + 7) // 8
+            null = np.unpackbits(np.frombuffer(blob, np.uint8, nbytes, pos), count=n).astype(bool)
+            pos += nbytes
+        dtype = np.dtype("<i4" if flags & WIDE else "<i2")
+        deltas = np.frombuffer(blob, dtype, max(n - 1, 0), pos)
+        pos += deltas.nbytes
+        q = np.empty(n, dtype=np.int64)
+        q[0] = first
+        np.cumsum(deltas, out=q[1:])
+        q[1:] += first
+        values = q / SCALE[name]
+        if null is not None:
+            values[null] = np.nan
+        out[name] = values
+    return out
+
+
+def compress(blob: bytes, compression: str) -> bytes:
+    if compression == "zlib":
+        return zlib.compress(blob, 6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=9).compress(blob)
+    return blob
+
+
+def decompress(data: bytes, compression: str) -> bytes:
+    if compression == "zlib":
+        return zlib.decompress(data)
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def create_track_table(conn: sqlite3.Connection):
+    conn.executescript("""
+        DROP TABLE IF EXISTS track_blobs;
+        CREATE TABLE track_blobs (
+            game_id INTEGER NOT NULL,
+            play_id INTEGER NOT NULL,
+            nfl_id INTEGER NOT NULL,  -- -1 for the ball
+            frames INTEGER NOT NULL,
+            compression TEXT NOT NULL,  -- none | zlib | zstd
+            data BLOB NOT NULL,
+            PRIMARY KEY (game_id, play_id, nfl_id)
+        );
+    """)
+
+
+def play_tracks(rows: list):
+    """(nfl_id, cols) per entity of one play's frame_rows, ordered by frame."""
+    cols = list(zip(*rows))
+    nfl_id = np.array([-1 if i is None else i for i in cols[3]], dtype=np.int64)
+    arrays = {
+        "frame_id": np.array(cols[2], dtype=np.float64),
+        "x": np.array(cols[4], dtype=np.float64),
+        "y": np.array(cols[5], dtype=np.float64),
+        "vx": np.array(cols[6], dtype=np.float64),  # None -> nan
+        "vy": np.array(cols[7], dtype=np.float64),
+    }
+    order = np.lexsort((arrays["frame_id"], nfl_id))
+    ids = nfl_id[order]
+    bounds = np.flatnonzero(np.diff(ids)) + 1
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(ids)]):
+        sel = order[lo:hi]
+        yield int(ids[lo]), {name: a[sel] for name, a in arrays.items()}
+
+
+def build_track_blobs(conn: sqlite3.Connection, compression: str = "zlib") -> dict:
+    """(Re)build track_blobs from frames. Returns row/byte counts."""
+    print(f"Encoding tracks ({compression})...")
+    t0 = time.perf_counter()
+    create_track_table(conn)
+    stats = {"tracks": 0, "rows": 0, "encoded_bytes": 0, "stored_bytes": 0}
+    for (game_id, play_id), rows in itertools.groupby(frame_rows(conn), key=lambda r: (r[0], r[1])):
+        batch = []
+        for nfl_id, cols in play_tracks(list(rows)):
+            blob = encode_track(cols)
+            data = compress(blob, compression)
+            stats["tracks"] += 1
+            stats["rows"] += len(cols["frame_id"])
+            stats["encoded_bytes"] += len(blob)
+            stats["stored_bytes"] += len(data)
+            batch.append((game_id, play_id, nfl_id, len(cols["frame_id"]), compression, data))
+        conn.executemany("INSERT INTO track_blobs VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+
+    # frames stores x, y, vx, vy as 8-byte REALs (plus frame_id)
+    real_bytes = stats["rows"] * 4 * 8
+    print(f"  {stats['tracks']:,} tracks, {stats['rows']:,} frame rows")
+    if stats["rows"]:
+        print(f"  x/y/vx/vy as REAL: {real_bytes / 2**20:,.1f} MB ({32:.1f} B/row)")
+        print(f"  quantized + delta: {stats['encoded_bytes'] / 2**20:,.1f} MB "
+              f"({stats['encoded_bytes'] / stats['rows']:.1f} B/row, incl. frame_id)")
+        print(f"  stored ({compression}): {stats['stored_bytes'] / 2**20:,.1f} MB "
+              f"({stats['stored_bytes'] / stats['rows']:.1f} B/row, "
+              f"{real_bytes / max(stats['stored_bytes'], 1):.1f}x smaller)")
+    print(f"  {time.perf_counter() - t0:.1f}s")
+    return stats
+
+
+def load_track(conn: sqlite3.Connection, game_id: int, play_id: int, nfl_id: int) -> dict:
+    """Decoded columns of one track, or None when it is not stored."""
+    row = conn.execute(
+        "SELECT compression, data FROM track_blobs WHERE game_id = ? AND play_id = ? AND nfl_id = ?",
+        (game_id, play_id, nfl_id),
+    ).fetchone()
+    return None if row is None else decode_track(decompress(row[1], row[0]))
+
+
+def bench_decode(conn: sqlite3.Connection) -> dict:
+    """Decompress and decode every stored track; reports track frames per second."""
+    print("Decoding all tracks...")
+    rows = conn.execute("SELECT compression, data FROM track_blobs").fetchall()
+    t0 = time.perf_counter()
+    frames = 0
+    for compression, data in rows:
+        frames += len(decode_track(decompress(data, compression))["frame_id"])
+    seconds = time.perf_counter() - t0
+    rate = frames / seconds if seconds else 0
+    print(f"  {len(rows):,} tracks, {frames:,} track frames in {seconds:.2f}s ({rate:,.0f} frames/s)")
+    return {"tracks": len(rows), "frames": frames, "seconds": seconds}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--build", action="store_true", help="(re)build track_blobs from frames")
+    parser.add_argument("--compression", choices=["zlib", "zstd", "none"], default="zlib")
+    parser.add_argument("--bench", action="store_true", help="time decoding every stored track")
+    args = parser.parse_args()
+    if args.compression == "zstd" and zstandard is None:
+        parser.error("--compression zstd needs the zstandard package")
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.build:
+        staging = publish.start_build(DB_PATH)
+        conn = sqlite3.connect(staging)
+        try:
+            build_track_blobs(conn, args.compression)
+        finally:
+            conn.close()
+        publish.publish(staging, DB_PATH)
+    if args.bench:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+        try:
+            bench_decode(conn)
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
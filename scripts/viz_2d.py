@@ -1,62 +1,143 @@
-"""Quick 2D top-down field viz — browse all plays in a single game.
+"""Quick 2D top-down field viz — browse all plays in a game from metapitch.db.
+
+Usage: python scripts/viz_2d.py [--game-id N]
 
 Controls:
-  Space       - play/pause
-  Left/Right  - prev/next play
-  Up/Down     - speed up/slow down
+  Space              - play/pause
+  Left/Right         - prev/next play
+  PageUp/PageDown    - prev/next game
+  Up/Down            - speed up/slow down
+
+For headless export of many plays to MP4/GIF see render_plays.py.
+
+Plays are read from the DB only when navigated to and decoded into NumPy
+arrays (frames x entities x 2). The last CACHE_PLAYS decoded plays are kept
+in an LRU, and a background thread prefetches the previous and next play
+so Left/Right is instant.
+
+Rendering keeps one scatter per team and one jersey label per player for
+the whole session and only moves them each frame (set_offsets /
+set_position), blitted over a cached field background. Up/Down step
+through SPEEDS; above 1000 / MIN_INTERVAL_MS frames per second frames are
+skipped instead of shortening the timer further.
 """
 
-import pandas as pd
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.animation import FuncAnimation
-import os
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "nfl-big-data-bowl-2025")
+from play_payloads import frame_rows
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "metapitch.db")
+CACHE_PLAYS = 16
+FRAME_INTERVAL_MS = 100  # tracking is 10 Hz
+MIN_INTERVAL_MS = 20
+SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0)
+
+COLORS = {"home": "#ff4444", "away": "#4488ff", "ball": "#cc8833"}
+
+
+def load_play(conn: sqlite3.Connection, game_id: int, play_id: int) -> dict:
+    """One play as arrays: xy (frames, entities, 2) with NaN where an entity is missing."""
+    rows = frame_rows(conn, game_id, play_id).fetchall()
+    meta = conn.execute("SELECT * FROM plays WHERE game_id = ? AND play_id = ?", (game_id, play_id))
+    names = [d[0] for d in meta.description]
+    info = dict(zip(names, meta.fetchone() or ()))
+    if not rows:
+        return {"frame_ids": np.array([], dtype=np.int64), "xy": np.empty((0, 0, 2)), "team": np.array([]),
+                "jersey": np.array([]), "events": {}, "info": info}
 
-# Load dimension tables
-games = pd.read_csv(os.path.join(DATA_DIR, "games.csv"))
-plays_df = pd.read_csv(os.path.join(DATA_DIR, "plays.csv"))
+    _, _, frame, nfl, x, y, _, _, _, team, jersey, _, event = zip(*rows)
+    frame_ids, fi = np.unique(np.array(frame), return_inverse=True)
+    nfl = np.array([-1 if n is None else n for n in nfl])
+    entity_ids, first, ei = np.unique(nfl, return_index=True, return_inverse=True)
 
-# Load week 1 tracking
-print("Loading tracking_week_1.csv...")
-tracking = pd.read_csv(os.path.join(DATA_DIR, "tracking_week_1.csv"))
+    xy = np.full((len(frame_ids), len(entity_ids), 2), np.nan)
+    xy[fi, ei, 0] = x
+    xy[fi, ei, 1] = y
 
-# Pick the first game in week 1
-game_id = tracking["gameId"].unique()[0]
-game_info = games[games["gameId"] == game_id].iloc[0]
-home_team = game_info["homeTeamAbbr"]
-away_team = game_info["visitorTeamAbbr"]
-print(f"Game: {away_team} @ {home_team} (gameId={game_id})")
+    events = {}
+    for f, e in zip(fi.tolist(), event):
+        if e:
+            events.setdefault(f, set()).add(e)
 
-# Filter tracking to this game
-game_tracking = tracking[tracking["gameId"] == game_id].copy()
-game_tracking.sort_values(["playId", "frameId"], inplace=True)
+    return {
+        "frame_ids": frame_ids,
+        "xy": xy,
+        "team": np.array(team, dtype=object)[first],
+        "jersey": np.array([-1 if j is None else j for j in jersey])[first],
+        "events": {f: ", ".join(sorted(e)) for f, e in events.items()},
+        "info": info,
+    }
 
-# Get ordered play list
-play_ids = sorted(game_tracking["playId"].unique())
-game_plays = plays_df[(plays_df["gameId"] == game_id)].set_index("playId")
-print(f"{len(play_ids)} plays in this game")
 
-# State
-state = {"play_idx": 0, "paused": False, "interval": 100}
+class PlayStore:
+    """Decoded plays on demand, with an LRU and a background prefetch thread.
 
-# Pre-group frames by play
-plays_data = {}
-for pid in play_ids:
-    pdf = game_tracking[game_tracking["playId"] == pid]
-    plays_data[pid] = {fid: fdf for fid, fdf in pdf.groupby("frameId")}
+    sqlite3 connections stay on the thread that opened them, so the
+    prefetcher has its own.
+    """
 
-def get_play():
-    pid = play_ids[state["play_idx"]]
-    frames = plays_data[pid]
-    return pid, sorted(frames.keys()), frames
+    def __init__(self, db_path: str, capacity: int = CACHE_PLAYS):
+        self.db_path = db_path
+        self.capacity = capacity
+        self.conn = sqlite3.connect(db_path)
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        threading.Thread(target=self._prefetch_loop, daemon=True).start()
 
-# Set up figure
-fig, ax = plt.subplots(figsize=(14, 6.5))
-fig.patch.set_facecolor("#1a1a1a")
+    def _cached(self, key):
+        with self.lock:
+            play = self.cache.get(key)
+            if play is not None:
+                self.cache.move_to_end(key)
+            return play
+
+    def _store(self, key, play):
+        with self.lock:
+            self.cache[key] = play
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+
+    def get(self, game_id: int, play_id: int) -> dict:
+        key = (game_id, play_id)
+        play = self._cached(key)
+        if play is None:
+            play = load_play(self.conn, game_id, play_id)
+            self._store(key, play)
+        return play
+
+    def prefetch(self, *keys):
+        for key in keys:
+            self.requests.put(key)
+
+    def _prefetch_loop(self):
+        conn = sqlite3.connect(self.db_path)
+        while True:
+            key = self.requests.get()
+            if self._cached(key) is None:
+                self._store(key, load_play(conn, *key))
+
+    def games(self) -> list:
+        return self.conn.execute(
+            "SELECT game_id, home_team, away_team FROM games ORDER BY game_id"
+        ).fetchall()
+
+    def play_ids(self, game_id: int) -> list:
+        return [r[0] for r in self.conn.execute(
+            "SELECT play_id FROM plays WHERE game_id = ? AND frame_count > 0 ORDER BY play_id", (game_id,)
+        )]
 
-COLORS = {home_team: "#ff4444", away_team: "#4488ff", "football": "#cc8833"}
 
 def draw_field(ax):
     ax.clear()
@@ -80,77 +161,161 @@ def draw_field(ax):
     ax.set_xticks([])
     ax.set_yticks([])
 
-artists = {"scatters": {}, "labels": [], "event_text": None, "info_text": None}
 
-def init_play():
+def create_artists(ax) -> dict:
+    """Animated artists reused for every play and frame; nothing is drawn until a play is bound."""
+    empty = np.empty((0, 2))
+    artists = {
+        "scatters": {
+            team: ax.scatter(empty[:, 0], empty[:, 1], c=COLORS[team], s=20 if team == "ball" else 40,
+                             marker="D" if team == "ball" else "o", edgecolors="white", linewidths=0.5,
+                             zorder=5, animated=True)
+            for team in ("home", "away", "ball")
+        },
+        "labels": [],
+        "event_text": ax.text(60, 56, "", color="yellow", fontsize=11, ha="center", fontweight="bold",
+                              animated=True),
+        "info_text": ax.text(2, 56, "", color="white", fontsize=9, animated=True),
+    }
+    return artists
+
+
+def bind_play(ax, artists: dict, play: dict):
+    """Point the persistent artists at a new play: per-team entity indices and jersey labels."""
+    artists["index"] = {team: np.flatnonzero(play["team"] == team) for team in artists["scatters"]}
+    players = np.flatnonzero((play["team"] == "home") | (play["team"] == "away"))
+    artists["players"] = players
+
+    labels = artists["labels"]
+    while len(labels) < len(players):
+        labels.append(ax.text(0, 0, "", fontsize=6, fontweight="bold", zorder=6, animated=True))
+    for lbl, i in zip(labels, players):
+        lbl.set_text(str(play["jersey"][i]))
+        lbl.set_color(COLORS[play["team"][i]])
+    for lbl in labels[len(players):]:
+        lbl.set_visible(False)
+
+
+def update_frame(artists: dict, play: dict, fi: int) -> list:
+    """Move the artists to frame `fi`; returns the artists to blit."""
+    xy = play["xy"][fi]
+    for team, sc in artists["scatters"].items():
+        sc.set_offsets(xy[artists["index"][team]])  # NaN (missing) points are not drawn
+
+    players = artists["players"]
+    visible = ~np.isnan(xy[players, 0])
+    for lbl, i, vis in zip(artists["labels"], players, visible):
+        lbl.set_visible(bool(vis))
+        if vis:
+            lbl.set_position((xy[i, 0] + 0.8, xy[i, 1] + 0.8))
+
+    artists["event_text"].set_text(play["events"].get(fi, ""))
+    return [*artists["scatters"].values(), *artists["labels"], artists["event_text"], artists["info_text"]]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--game-id", type=int, help="game to open (default: the first one)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    store = PlayStore(DB_PATH)
+    games = store.games()
+    if not games:
+        raise SystemExit(f"No games in {DB_PATH}")
+    game_idx = next((i for i, g in enumerate(games) if g[0] == args.game_id), 0)
+
+    # State
+    state = {"game_idx": game_idx, "play_ids": [], "play_idx": 0, "paused": False,
+             "speed_idx": SPEEDS.index(1.0), "frame": 0, "play": None}
+
+    fig, ax = plt.subplots(figsize=(14, 6.5))
+    fig.patch.set_facecolor("#1a1a1a")
     draw_field(ax)
-    artists["event_text"] = ax.text(60, 56, "", color="yellow", fontsize=11, ha="center", fontweight="bold")
-    artists["info_text"] = ax.text(2, 56, "", color="white", fontsize=9)
-    state["frame_counter"] = 0
-
-init_play()
-
-def animate(_):
-    pid, frame_ids, frames = get_play()
-
-    if state["paused"]:
-        return
-
-    fi = state["frame_counter"] % len(frame_ids)
-    frame_id = frame_ids[fi]
-    frame = frames[frame_id]
-
-    # Clear old
-    for lbl in artists["labels"]:
-        lbl.remove()
-    artists["labels"].clear()
-    for s in artists["scatters"].values():
-        s.remove()
-    artists["scatters"].clear()
-
-    for club in frame["club"].unique():
-        cd = frame[frame["club"] == club]
-        color = COLORS.get(club, "#ffffff")
-        size = 40 if club != "football" else 20
-        marker = "o" if club != "football" else "D"
-        sc = ax.scatter(cd["x"], cd["y"], c=color, s=size, marker=marker, edgecolors="white", linewidths=0.5, zorder=5)
-        artists["scatters"][club] = sc
-        if club != "football":
-            for _, row in cd.iterrows():
-                lbl = ax.text(row["x"] + 0.8, row["y"] + 0.8, str(int(row["jerseyNumber"])),
-                              color=color, fontsize=6, fontweight="bold", zorder=6)
-                artists["labels"].append(lbl)
-
-    events = frame[frame["event"].notna()]["event"].unique()
-    event_str = ", ".join(events) if len(events) > 0 else ""
-    artists["event_text"].set_text(event_str)
-
-    # Play info
-    desc = ""
-    if pid in game_plays.index:
-        pi = game_plays.loc[pid]
-        desc = f"Q{pi.get('quarter', '?')} {pi.get('down', '?')}&{pi.get('yardsToGo', '?')}"
-    artists["info_text"].set_text(f"Play {state['play_idx']+1}/{len(play_ids)} | frame {fi+1}/{len(frame_ids)} | {desc}")
-
-    title = f"{away_team} @ {home_team} | [Space] pause  [</>] prev/next play"
-    ax.set_title(title, color="white", fontsize=11)
-
-    state["frame_counter"] += 1
-
-def on_key(event):
-    if event.key == " ":
-        state["paused"] = not state["paused"]
-    elif event.key == "right":
-        state["play_idx"] = min(state["play_idx"] + 1, len(play_ids) - 1)
-        state["frame_counter"] = 0
-        init_play()
-    elif event.key == "left":
-        state["play_idx"] = max(state["play_idx"] - 1, 0)
-        state["frame_counter"] = 0
+    artists = create_artists(ax)
+
+    def current_key():
+        return games[state["game_idx"]][0], state["play_ids"][state["play_idx"]]
+
+    def init_play():
+        state["frame"] = 0
+        state["play"] = None
+        if not state["play_ids"]:
+            return
+        game_id, play_id = current_key()
+        state["play"] = store.get(game_id, play_id)
+        bind_play(ax, artists, state["play"])
+        i = state["play_idx"]
+        store.prefetch(*[(game_id, state["play_ids"][j]) for j in (i + 1, i - 1)
+                         if 0 <= j < len(state["play_ids"])])
+
+    def init_game():
+        game_id, home_team, away_team = games[state["game_idx"]]
+        state["play_ids"] = store.play_ids(game_id)
+        state["play_idx"] = 0
+        print(f"Game: {away_team} @ {home_team} (gameId={game_id}), {len(state['play_ids'])} plays")
+        title = f"{away_team} @ {home_team} | [Space] pause  [</>] prev/next play  [PgUp/PgDn] game  [Up/Down] speed"
+        ax.set_title(title, color="white", fontsize=11)
+        fig.canvas.draw_idle()  # the title sits outside the blitted axes area
         init_play()
 
-fig.canvas.mpl_connect("key_press_event", on_key)
+    def timing():
+        """(timer interval ms, frames advanced per tick) for the current speed."""
+        interval = FRAME_INTERVAL_MS / SPEEDS[state["speed_idx"]]
+        step = max(1, round(MIN_INTERVAL_MS / interval))
+        return max(interval, MIN_INTERVAL_MS), step
+
+    def animate(_):
+        play = state["play"]
+        if play is None or len(play["frame_ids"]) == 0:
+            return []
+        n_frames = len(play["frame_ids"])
+        fi = state["frame"] % n_frames
+        drawn = update_frame(artists, play, fi)
+
+        # Play info
+        pi = play["info"]
+        desc = f"Q{pi.get('quarter') or '?'} {pi.get('down') or '?'}&{pi.get('yards_to_go') or '?'}"
+        artists["info_text"].set_text(
+            f"Play {state['play_idx'] + 1}/{len(state['play_ids'])} | frame {fi + 1}/{n_frames} | "
+            f"{SPEEDS[state['speed_idx']]:g}x | {desc}"
+        )
+
+        if not state["paused"]:
+            state["frame"] += timing()[1]
+        return drawn
+
+    init_game()
+    anim = FuncAnimation(fig, animate, interval=timing()[0], blit=True, cache_frame_data=False)
+
+    def on_key(event):
+        if event.key == " ":
+            state["paused"] = not state["paused"]
+        elif event.key == "right" and state["play_idx"] < len(state["play_ids"]) - 1:
+            state["play_idx"] += 1
+            init_play()
+        elif event.key == "left" and state["play_idx"] > 0:
+            state["play_idx"] -= 1
+            init_play()
+        elif event.key == "pagedown" and state["game_idx"] < len(games) - 1:
+            state["game_idx"] += 1
+            init_game()
+        elif event.key == "pageup" and state["game_idx"] > 0:
+            state["game_idx"] -= 1
+            init_game()
+        elif event.key in ("up", "down"):
+            delta = 1 if event.key == "up" else -1
+            state["speed_idx"] = min(max(state["speed_idx"] + delta, 0), len(SPEEDS) - 1)
+            anim.event_source.interval = timing()[0]
+
+    fig.canvas.mpl_connect("key_press_event", on_key)
+
+    plt.tight_layout()
+    plt.show()
+    return anim
+
 
-anim = FuncAnimation(fig, animate, interval=state["interval"], cache_frame_data=False)
-plt.tight_layout()
-plt.show()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import { describe, it, expect } from 'vitest'
+import fs from 'fs'
+import path from 'path'
+import { fileURLToPath } from 'url'
+import { assemblePlay } from '../playPayload.js'
+
+// scripts/play_payloads.py caches what getPlayData would return, and is
+// tested against this same fixture (scripts/test_play_payloads.py). If the
+// assembly here changes on purpose, regenerate the fixture's payload from
+// assemblePlay and update build_payload to match.
+
+const FIXTURE = path.join(path.dirname(fileURLToPath(import.meta.url)), '../../../contracts/fixtures/play-payload.json')
+
+describe('assemblePlay', () => {
+  it('matches the play payload fixture', () => {
+    const fixture = JSON.parse(fs.readFileSync(FIXTURE, 'utf8'))
+    const payload = assemblePlay(fixture.gameId, fixture.playId, fixture.description, fixture.rows)
+    expect(JSON.parse(JSON.stringify(payload))).toEqual(fixture.payload)
+  })
+})
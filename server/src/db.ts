@@ -1,14 +1,35 @@
 import Database from 'better-sqlite3'
+import fs from 'fs'
 import path from 'path'
+import { inflateSync } from 'zlib'
 import { fileURLToPath } from 'url'
+import { assemblePlay } from './playPayload.js'
 
 const __dirname = path.dirname(fileURLToPath(import.meta.url))
 const DB_PATH = path.join(__dirname, '..', '..', 'data', 'metapitch.db')
 
-let db: Database.Database
+let db: Database.Database | undefined
+let dbInode: number | undefined
+let swapCheckedAt = 0
+const SWAP_CHECK_MS = 1000
 
 export function getDb(): Database.Database {
+  // scripts/publish.py renames a new file over DB_PATH; an open handle keeps
+  // reading the old one, so reopen (and drop cached statements) once it changes
+  const now = Date.now()
+  if (db && now - swapCheckedAt > SWAP_CHECK_MS) {
+    swapCheckedAt = now
+    const inode = fs.statSync(DB_PATH, { throwIfNoEntry: false })?.ino
+    if (inode !== undefined && inode !== dbInode) {
+      db.close()
+      db = undefined
+      compactFrames = undefined
+      payloadStmt = undefined
+      beliefStmts = undefined
+    }
+  }
   if (!db) {
+    dbInode = fs.statSync(DB_PATH).ino
     db = new Database(DB_PATH, { readonly: true })
     db.pragma('cache_size = -500000') // ~500MB
   }
@@ -32,6 +53,45 @@ export function getPlaysForGame(gameId: number) {
   ).all(gameId)
 }
 
+let compactFrames: boolean | undefined
+
+/** `ingest.py --compact` stores team/event/source as codes and names in lookup_players */
+function isCompact(): boolean {
+  if (compactFrames === undefined) {
+    const cols = getDb().prepare('PRAGMA table_info(frames)').all() as { name: string }[]
+    compactFrames = cols.some((c) => c.name === 'team_id')
+  }
+  return compactFrames
+}
+
+function getFrameRows(gameId: number, playId: number): any[] {
+  const db = getDb()
+  const rows = db.prepare(
+    'SELECT * FROM frames WHERE game_id = ? AND play_id = ? ORDER BY frame_id, nfl_id'
+  ).all(gameId, playId) as any[]
+
+  if (rows.length === 0 || !isCompact()) return rows
+
+  // Decode once per play: the lookup tables are tiny, names only for this play's players
+  const lookup = (sql: string, ...params: number[]) =>
+    new Map(db.prepare(sql).raw().all(...params) as [number, string][])
+  const teams = lookup('SELECT id, name FROM lookup_teams')
+  const events = lookup('SELECT id, name FROM lookup_events')
+  const names = lookup(
+    `SELECT nfl_id, display_name FROM lookup_players WHERE nfl_id IN (
+       SELECT nfl_id FROM frames WHERE game_id = ? AND play_id = ?
+     )`,
+    gameId, playId,
+  )
+
+  for (const row of rows) {
+    row.team = teams.get(row.team_id) ?? null
+    row.event = row.event_id == null ? null : events.get(row.event_id) ?? null
+    row.display_name = names.get(row.nfl_id) ?? null
+  }
+  return rows
+}
+
 export function getPlayData(gameId: number, playId: number) {
   const db = getDb()
 
@@ -41,67 +101,89 @@ export function getPlayData(gameId: number, playId: number) {
 
   if (!play) return null
 
-  const frameRows = db.prepare(
-    'SELECT * FROM frames WHERE game_id = ? AND play_id = ? ORDER BY frame_id, nfl_id'
-  ).all(gameId, playId) as any[]
+  const frameRows = getFrameRows(gameId, playId)
 
   if (frameRows.length === 0) return null
 
-  // Build players map and frames array
-  const players: Record<string, any> = {}
-  const eventsMap: Record<string, string> = {}
-  const framesMap = new Map<number, { positions: Record<string, [number, number]>; velocities: Record<string, [number, number]>; orientations: Record<string, number> }>()
-
-  for (const row of frameRows) {
-    const playerId = row.nfl_id == null || row.nfl_id === -1 ? 'ball' : String(row.nfl_id)
-
-    // Build player identity
-    if (!players[playerId]) {
-      players[playerId] = {
-        name: row.display_name || (row.team === 'ball' ? 'Ball' : 'Unknown'),
-        team: row.team === 'home' || row.team === 'away' || row.team === 'ball' ? row.team : 'home',
-        ...(row.jersey_number != null && { jersey: row.jersey_number }),
-      }
-    }
+  return assemblePlay(gameId, playId, play.description, frameRows)
+}
 
-    if (row.event) {
-      eventsMap[String(row.frame_id)] = row.event
-    }
+function hasTable(db: Database.Database, name: string): boolean {
+  return db.prepare("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?").get(name) !== undefined
+}
 
-    if (!framesMap.has(row.frame_id)) {
-      framesMap.set(row.frame_id, { positions: {}, velocities: {}, orientations: {} })
-    }
-    const frame = framesMap.get(row.frame_id)!
-    frame.positions[playerId] = [row.x, row.y]
+// Only cached once the table exists: a missing one is looked up again on the
+// next request, so a table built later is picked up without a restart
+let payloadStmt: Database.Statement | undefined
 
-    if (row.vx != null && row.vy != null) {
-      frame.velocities[playerId] = [row.vx, row.vy]
-    }
-    if (row.orientation != null) {
-      frame.orientations[playerId] = row.orientation
+/**
+ * Canonical play JSON precomputed by scripts/play_payloads.py, or null when
+ * the play (or the whole play_payloads table) has not been built.
+ */
+export function getCachedPlayJson(gameId: number, playId: number): string | null {
+  const db = getDb()
+  if (!payloadStmt && hasTable(db, 'play_payloads')) {
+    payloadStmt = db.prepare('SELECT payload FROM play_payloads WHERE game_id = ? AND play_id = ?')
+  }
+  const row = payloadStmt?.get(gameId, playId) as { payload: Buffer } | undefined
+  return row ? inflateSync(row.payload).toString('utf8') : null
+}
+
+let beliefStmts: { posteriors: Database.Statement; deltas: Database.Statement; pivotal: Database.Statement } | undefined
+
+/**
+ * PlayStats precomputed by scripts/belief_precompute.py, or null when the
+ * play (or the belief tables) has not been built. Same shape as
+ * computePlayStats without pause-frame trajectories.
+ */
+export function getCachedPlayStats(gameId: number, playId: number) {
+  const db = getDb()
+  if (!beliefStmts && hasTable(db, 'belief_posteriors')) {
+    beliefStmts = {
+      posteriors: db.prepare(
+        `SELECT frame_id, p_goal, p_turnover, expected_xg,
+                turnover, retention, progression, opportunity, goal
+         FROM belief_posteriors WHERE game_id = ? AND play_id = ? ORDER BY frame_id`
+      ),
+      deltas: db.prepare(
+        `SELECT frame_id, delta_p_goal, kl_divergence, is_pivotal
+         FROM belief_deltas WHERE game_id = ? AND play_id = ? ORDER BY frame_id`
+      ),
+      pivotal: db.prepare(
+        'SELECT frame_id FROM belief_pivotal WHERE game_id = ? AND play_id = ? ORDER BY rank'
+      ),
     }
   }
+  if (!beliefStmts) return null
 
-  const frames = Array.from(framesMap.entries())
-    .sort(([a], [b]) => a - b)
-    .map(([id, data]) => ({ id, ...data }))
+  const posteriors = beliefStmts.posteriors.all(gameId, playId) as any[]
+  if (posteriors.length === 0) return null
+  const deltas = beliefStmts.deltas.all(gameId, playId) as any[]
+  const pivotal = beliefStmts.pivotal.raw().all(gameId, playId) as [number][]
 
   return {
-    gameId,
-    playId,
-    meta: {
-      description: play.description,
-      quarter: 1, // Mock defaults
-      down: 1,
-      yardsToGo: 10,
-      offense: 'Home',
-      defense: 'Away'
-    },
-    frameCount: frames.length,
-    events: eventsMap,
-    players,
-    frames,
-    source: 'mock' as const,
+    posteriors: posteriors.map((r) => ({
+      frameId: r.frame_id,
+      pGoal: r.p_goal,
+      pTurnover: r.p_turnover,
+      expectedXG: r.expected_xg,
+      distribution: {
+        turnover: r.turnover,
+        retention: r.retention,
+        progression: r.progression,
+        opportunity: r.opportunity,
+        goal: r.goal,
+      },
+    })),
+    deltas: deltas.map((r) => ({
+      frameId: r.frame_id,
+      deltaPGoal: r.delta_p_goal,
+      klDivergence: r.kl_divergence,
+      isPivotal: r.is_pivotal === 1,
+    })),
+    attributions: [],
+    playerStats: [],
+    pivotalFrames: pivotal.map(([frameId]) => frameId),
   }
 }
 
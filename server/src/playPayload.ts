@@ -0,0 +1,78 @@
+// Canonical play JSON from decoded frame rows. Kept free of the DB so the
+// same function can be checked against contracts/fixtures/play-payload.json,
+// the fixture scripts/play_payloads.py is tested against too.
+
+/** A frames row as getPlayData reads it (compact codes already decoded) */
+export interface FrameRow {
+  frame_id: number
+  nfl_id: number | null
+  x: number
+  y: number
+  vx: number | null
+  vy: number | null
+  orientation: number | null
+  team: string | null
+  jersey_number: number | null
+  display_name: string | null
+  event: string | null
+}
+
+/** rows must be ordered by (frame_id, nfl_id) */
+export function assemblePlay(gameId: number, playId: number, description: string | null, frameRows: FrameRow[]) {
+  // Build players map and frames array
+  const players: Record<string, any> = {}
+  const eventsMap: Record<string, string> = {}
+  const framesMap = new Map<number, { positions: Record<string, [number, number]>; velocities: Record<string, [number, number]>; orientations: Record<string, number> }>()
+
+  for (const row of frameRows) {
+    const playerId = row.nfl_id == null || row.nfl_id === -1 ? 'ball' : String(row.nfl_id)
+
+    // Build player identity
+    if (!players[playerId]) {
+      players[playerId] = {
+        name: row.display_name || (row.team === 'ball' ? 'Ball' : 'Unknown'),
+        team: row.team === 'home' || row.team === 'away' || row.team === 'ball' ? row.team : 'home',
+        ...(row.jersey_number != null && { jersey: row.jersey_number }),
+      }
+    }
+
+    if (row.event) {
+      eventsMap[String(row.frame_id)] = row.event
+    }
+
+    if (!framesMap.has(row.frame_id)) {
+      framesMap.set(row.frame_id, { positions: {}, velocities: {}, orientations: {} })
+    }
+    const frame = framesMap.get(row.frame_id)!
+    frame.positions[playerId] = [row.x, row.y]
+
+    if (row.vx != null && row.vy != null) {
+      frame.velocities[playerId] = [row.vx, row.vy]
+    }
+    if (row.orientation != null) {
+      frame.orientations[playerId] = row.orientation
+    }
+  }
+
+  const frames = Array.from(framesMap.entries())
+    .sort(([a], [b]) => a - b)
+    .map(([id, data]) => ({ id, ...data }))
+
+  return {
+    gameId,
+    playId,
+    meta: {
+      description,
+      quarter: 1, // Mock defaults
+      down: 1,
+      yardsToGo: 10,
+      offense: 'Home',
+      defense: 'Away'
+    },
+    frameCount: frames.length,
+    events: eventsMap,
+    players,
+    frames,
+    source: 'mock' as const,
+  }
+}
@@ -1,5 +1,5 @@
 import { Router } from 'express'
-import { getPlaysForGame, getPlayData } from '../db.js'
+import { getPlaysForGame, getPlayData, getCachedPlayJson } from '../db.js'
 
 export const playsRouter = Router()
 
@@ -21,6 +21,11 @@ playsRouter.get('/plays/:gameId/:playId', (req, res) => {
     res.status(400).json({ error: 'gameId and playId must be numeric' })
     return
   }
+  const cached = getCachedPlayJson(gameId, playId)
+  if (cached) {
+    res.type('application/json').send(cached)
+    return
+  }
   const data = getPlayData(gameId, playId)
   if (!data) {
     res.status(404).json({ error: 'Play not found' })
@@ -1,6 +1,7 @@
 import { Router } from 'express'
 import { createForwardSimulator } from '../../../src/services/forward-sim/index.js'
 import { computePlayStats } from '../../../src/services/stats/index.js'
+import { getCachedPlayStats } from '../db.js'
 
 export const statsRouter = Router()
 
@@ -20,3 +21,19 @@ statsRouter.post('/', async (req, res) => {
     res.status(500).json({ error: err.message })
   }
 })
+
+// Stats precomputed offline by scripts/belief_precompute.py (mock simulator)
+statsRouter.get('/:gameId/:playId', (req, res) => {
+  const gameId = Number(req.params.gameId)
+  const playId = Number(req.params.playId)
+  if (Number.isNaN(gameId) || Number.isNaN(playId)) {
+    res.status(400).json({ error: 'gameId and playId must be numeric' })
+    return
+  }
+  const stats = getCachedPlayStats(gameId, playId)
+  if (!stats) {
+    res.status(404).json({ error: 'No precomputed stats for this play' })
+    return
+  }
+  res.json(stats)
+})
@@ -0,0 +1,95 @@
+import { describe, it, expect } from 'vitest'
+import { spawnSync } from 'child_process'
+import path from 'path'
+import { fileURLToPath } from 'url'
+import { MockForwardSimulator } from '../forward-sim/mock.js'
+import { computePlayStats } from '../stats/beliefEngine.js'
+import type { CanonicalPlay, ForwardSimulator, Frame } from '../types.js'
+
+// scripts/belief_precompute.py must reproduce computePlayStats + the mock
+// simulator exactly. Both sides read the same keyed streams: draw n of
+// stream k is a hash of (seed, k, n), so the vectorized port can look up the
+// value each sequential call gets here. Stream 0 feeds the jitter, predict
+// call k stream k.
+
+const SCRIPT = path.join(path.dirname(fileURLToPath(import.meta.url)), '../../../scripts/belief_precompute.py')
+const PYTHON = process.env.PYTHON ?? 'python3'
+const hasNumpy = spawnSync(PYTHON, ['-c', 'import numpy']).status === 0
+
+/** lowbias32, as belief_precompute.mix32 */
+function mix32(x: number): number {
+  x ^= x >>> 16
+  x = Math.imul(x, 0x7feb352d)
+  x ^= x >>> 15
+  x = Math.imul(x, 0x846ca68b)
+  x ^= x >>> 16
+  return x >>> 0
+}
+
+function keyedStream(seed: number, key: number): () => number {
+  let n = 0
+  return () => mix32(mix32(mix32(seed) ^ key) ^ n++) / 2 ** 32
+}
+
+/** Home attack down the right with a pass, a chasing defender and a keeper */
+function samplePlay(): CanonicalPlay {
+  const frames: Frame[] = []
+  for (let i = 0; i < 40; i++) {
+    const t = i * 0.1
+    const carrier: [number, number] = [70 + 6 * t, 30 + 1.5 * t]
+    const runner: [number, number] = [74 + 7 * t, 40 - 2 * t]
+    const defender: [number, number] = [78 + 5.5 * t, 33 + 0.8 * t]
+    const keeper: [number, number] = [103, 34 + Math.sin(t)]
+    const ball: [number, number] = i < 20
+      ? [carrier[0] + 0.6, carrier[1]]
+      : [carrier[0] + (runner[0] - carrier[0]) * Math.min(1, (i - 20) / 8), carrier[1] + (runner[1] - carrier[1]) * Math.min(1, (i - 20) / 8)]
+    frames.push({
+      id: i + 1,
+      positions: { '10': carrier, '11': runner, '7': [60 + 2 * t, 20], '22': defender, '1': keeper, ball },
+      velocities: { '10': [6, 1.5], '11': [7, -2], '22': [5.5, 0.8], '1': [0, Math.cos(t)] },
+      orientations: {},
+    })
+  }
+  return {
+    gameId: 1,
+    playId: 1,
+    meta: { quarter: 1, down: 1, yardsToGo: 10, offense: 'Home', defense: 'Away' },
+    frameCount: frames.length,
+    events: { '21': 'pass_forward' },
+    players: {
+      ball: { name: 'Ball', team: 'ball' },
+      '10': { name: 'Carrier', team: 'home', jersey: 10 },
+      '11': { name: 'Runner', team: 'home', jersey: 11 },
+      '7': { name: 'Support', team: 'home', jersey: 7 },
+      '22': { name: 'Defender', team: 'away', jersey: 22 },
+      '1': { name: 'Keeper', team: 'away', jersey: 1 },
+    },
+    frames,
+    source: 'mock',
+  }
+}
+
+describe.skipIf(!hasNumpy)('belief_precompute.py parity', () => {
+  for (const seed of [1, 7, 42, 2024]) {
+    it(`matches computePlayStats on the keyed streams of seed ${seed}`, async () => {
+      const play = samplePlay()
+      let calls = 0
+      const simulator: ForwardSimulator = {
+        predict: (input) => new MockForwardSimulator(keyedStream(seed, ++calls)).predict(input),
+      }
+      const expected = await computePlayStats(play, simulator, undefined, keyedStream(seed, 0))
+
+      // The sims must actually disagree, or the comparison proves little
+      const spread = expected.posteriors.filter(p => Object.values(p.distribution).filter(v => v > 0).length > 1)
+      expect(spread.length).toBeGreaterThan(10)
+
+      const run = spawnSync(PYTHON, [SCRIPT, '--parity', String(seed)], { input: JSON.stringify(play), encoding: 'utf8' })
+      expect(run.status, run.stderr).toBe(0)
+      const actual = JSON.parse(run.stdout)
+
+      expect(actual.posteriors).toEqual(expected.posteriors)
+      expect(actual.deltas).toEqual(expected.deltas)
+      expect(actual.pivotalFrames).toEqual(expected.pivotalFrames)
+    })
+  }
+})
@@ -18,9 +18,9 @@ function hashId(id) {
     return (Math.abs(h) % 10000) / 10000;
 }
 /** Box-Muller transform: returns a sample from N(0, 1) */
-function randn() {
-    const u1 = Math.random();
-    const u2 = Math.random();
+function randn(random) {
+    const u1 = random();
+    const u2 = random();
     return Math.sqrt(-2 * Math.log(u1 || 1e-10)) * Math.cos(2 * Math.PI * u2);
 }
 /** Find the closest player to the ball from a given team */
@@ -47,6 +47,11 @@ function findClosestPlayer(ball, current, state) {
     return closestId;
 }
 export class MockForwardSimulator {
+    random;
+    /** `random` defaults to Math.random; pass a fixed stream to make runs reproducible */
+    constructor(random = Math.random) {
+        this.random = random;
+    }
     async predict(input) {
         const { gameId, playId, frameId, horizon, state, players } = input;
         // Build mutable copy of state
@@ -70,9 +75,9 @@ export class MockForwardSimulator {
                 continue;
             const h = hashId(id);
             driftParams[id] = {
-                phase: h * Math.PI * 2 + Math.random() * Math.PI, // base + random phase jitter
-                freq: 1.5 + h * 2.0 + (Math.random() - 0.5) * 1.0, // freq jitter
-                frictionMul: FRICTION + (Math.random() - 0.5) * 2 * NOISE_FRICTION, // per-player friction variation
+                phase: h * Math.PI * 2 + this.random() * Math.PI, // base + random phase jitter
+                freq: 1.5 + h * 2.0 + (this.random() - 0.5) * 1.0, // freq jitter
+                frictionMul: FRICTION + (this.random() - 0.5) * 2 * NOISE_FRICTION, // per-player friction variation
             };
         }
         const frames = [];
@@ -98,8 +103,8 @@ export class MockForwardSimulator {
                     p.vx += nx * lateralAccel * DT;
                     p.vy += ny * lateralAccel * DT;
                     // Random velocity noise (Gaussian, scaled by current speed)
-                    p.vx += randn() * NOISE_VELOCITY * DT;
-                    p.vy += randn() * NOISE_VELOCITY * DT;
+                    p.vx += randn(this.random) * NOISE_VELOCITY * DT;
+                    p.vy += randn(this.random) * NOISE_VELOCITY * DT;
                 }
                 if (atBoundary) {
                     // Freeze players at the boundary
@@ -23,9 +23,9 @@ function hashId(id: string): number {
 }
 
 /** Box-Muller transform: returns a sample from N(0, 1) */
-function randn(): number {
-  const u1 = Math.random()
-  const u2 = Math.random()
+function randn(random: () => number): number {
+  const u1 = random()
+  const u2 = random()
   return Math.sqrt(-2 * Math.log(u1 || 1e-10)) * Math.cos(2 * Math.PI * u2)
 }
 
@@ -60,6 +60,9 @@ function findClosestPlayer(
 }
 
 export class MockForwardSimulator implements ForwardSimulator {
+  /** `random` defaults to Math.random; pass a fixed stream to make runs reproducible */
+  constructor(private readonly random: () => number = Math.random) {}
+
   async predict(input: SimulationInput): Promise<CanonicalPlay> {
     const { gameId, playId, frameId, horizon, state, players } = input
 
@@ -85,9 +88,9 @@ export class MockForwardSimulator implements ForwardSimulator {
       if (id === 'ball') continue
       const h = hashId(id)
       driftParams[id] = {
-        phase: h * Math.PI * 2 + Math.random() * Math.PI,  // base + random phase jitter
-        freq: 1.5 + h * 2.0 + (Math.random() - 0.5) * 1.0, // freq jitter
-        frictionMul: FRICTION + (Math.random() - 0.5) * 2 * NOISE_FRICTION, // per-player friction variation
+        phase: h * Math.PI * 2 + this.random() * Math.PI,  // base + random phase jitter
+        freq: 1.5 + h * 2.0 + (this.random() - 0.5) * 1.0, // freq jitter
+        frictionMul: FRICTION + (this.random() - 0.5) * 2 * NOISE_FRICTION, // per-player friction variation
       }
     }
 
@@ -119,8 +122,8 @@ export class MockForwardSimulator implements ForwardSimulator {
           p.vy += ny * lateralAccel * DT
 
           // Random velocity noise (Gaussian, scaled by current speed)
-          p.vx += randn() * NOISE_VELOCITY * DT
-          p.vy += randn() * NOISE_VELOCITY * DT
+          p.vx += randn(this.random) * NOISE_VELOCITY * DT
+          p.vy += randn(this.random) * NOISE_VELOCITY * DT
         }
 
         if (atBoundary) {
@@ -4,14 +4,14 @@ const HORIZON = 30; // 3 seconds forward
 const KL_PIVOT_THRESHOLD = 0.05;
 const TOP_PIVOTAL = 5;
 /** Add gaussian noise to a value */
-function jitter(val, scale) {
-    const u1 = Math.random();
-    const u2 = Math.random();
+function jitter(val, scale, random) {
+    const u1 = random();
+    const u2 = random();
     const z = Math.sqrt(-2 * Math.log(u1 + 1e-10)) * Math.cos(2 * Math.PI * u2);
     return val + z * scale;
 }
 /** Build SimulationInput from a CanonicalPlay at a given frame */
-function buildSimInput(play, frameIdx, noiseScale = 0) {
+function buildSimInput(play, frameIdx, noiseScale = 0, random = Math.random) {
     const frame = play.frames[frameIdx];
     const prevFrame = frameIdx > 0 ? play.frames[frameIdx - 1] : null;
     const DT = 0.1;
@@ -33,10 +33,10 @@ function buildSimInput(play, frameIdx, noiseScale = 0) {
         }
         state[id] = {
             pos: noiseScale > 0
-                ? [jitter(pos[0], noiseScale), jitter(pos[1], noiseScale)]
+                ? [jitter(pos[0], noiseScale, random), jitter(pos[1], noiseScale, random)]
                 : [...pos],
             vel: noiseScale > 0
-                ? [jitter(vel[0], noiseScale * 0.5), jitter(vel[1], noiseScale * 0.5)]
+                ? [jitter(vel[0], noiseScale * 0.5, random), jitter(vel[1], noiseScale * 0.5, random)]
                 : [...vel],
             ori: frame.orientations[id] ?? 0,
             team: info.team,
@@ -160,7 +160,7 @@ function computePosteriorTrajectories(results, playerIds) {
         return { playerId: pid, meanPath, variance };
     });
 }
-export async function computePlayStats(play, simulator, pauseFrame) {
+export async function computePlayStats(play, simulator, pauseFrame, random = Math.random) {
     const posteriors = [];
     const playerStats = [];
     let posteriorTrajectories;
@@ -176,7 +176,7 @@ export async function computePlayStats(play, simulator, pauseFrame) {
         const frame = play.frames[fi];
         const ballPos = frame.positions['ball'];
         const startBallX = ballPos ? ballPos[0] : (attackingTeam === 'home' ? 52.5 : 52.5);
-        const simInputs = Array.from({ length: NUM_SIMS }, () => buildSimInput(play, fi, 0.3));
+        const simInputs = Array.from({ length: NUM_SIMS }, () => buildSimInput(play, fi, 0.3, random));
         const results = await Promise.all(simInputs.map(input => simulator.predict(input)));
         for (const result of results) {
             const outcome = classifyOutcome(result, startBallX, attackingTeam);
@@ -17,9 +17,9 @@ const KL_PIVOT_THRESHOLD = 0.05
 const TOP_PIVOTAL = 5
 
 /** Add gaussian noise to a value */
-function jitter(val: number, scale: number): number {
-  const u1 = Math.random()
-  const u2 = Math.random()
+function jitter(val: number, scale: number, random: () => number): number {
+  const u1 = random()
+  const u2 = random()
   const z = Math.sqrt(-2 * Math.log(u1 + 1e-10)) * Math.cos(2 * Math.PI * u2)
   return val + z * scale
 }
@@ -29,6 +29,7 @@ function buildSimInput(
   play: CanonicalPlay,
   frameIdx: number,
   noiseScale: number = 0,
+  random: () => number = Math.random,
 ): SimulationInput {
   const frame = play.frames[frameIdx]
   const prevFrame = frameIdx > 0 ? play.frames[frameIdx - 1] : null
@@ -52,10 +53,10 @@ function buildSimInput(
 
     state[id] = {
       pos: noiseScale > 0
-        ? [jitter(pos[0], noiseScale), jitter(pos[1], noiseScale)]
+        ? [jitter(pos[0], noiseScale, random), jitter(pos[1], noiseScale, random)]
         : [...pos],
       vel: noiseScale > 0
-        ? [jitter(vel[0], noiseScale * 0.5), jitter(vel[1], noiseScale * 0.5)]
+        ? [jitter(vel[0], noiseScale * 0.5, random), jitter(vel[1], noiseScale * 0.5, random)]
         : [...vel],
       ori: frame.orientations[id] ?? 0,
       team: info.team,
@@ -209,6 +210,7 @@ export async function computePlayStats(
   play: CanonicalPlay,
   simulator: ForwardSimulator,
   pauseFrame?: number,
+  random: () => number = Math.random,
 ): Promise<PlayStats> {
   const posteriors: FramePosterior[] = []
   const playerStats: PlayerFrameStats[] = []
@@ -229,7 +231,7 @@ export async function computePlayStats(
     const ballPos = frame.positions['ball']
     const startBallX = ballPos ? ballPos[0] : (attackingTeam === 'home' ? 52.5 : 52.5)
 
-    const simInputs = Array.from({ length: NUM_SIMS }, () => buildSimInput(play, fi, 0.3))
+    const simInputs = Array.from({ length: NUM_SIMS }, () => buildSimInput(play, fi, 0.3, random))
     const results = await Promise.all(simInputs.map(input => simulator.predict(input)))
 
     for (const result of results) {
@@ -2,6 +2,6 @@ import { defineConfig } from 'vitest/config'
 
 export default defineConfig({
   test: {
-    include: ['src/**/*.test.ts', 'frontend/src/**/*.test.ts'],
+    include: ['src/**/*.test.ts', 'server/src/**/*.test.ts', 'frontend/src/**/*.test.ts'],
   },
 })